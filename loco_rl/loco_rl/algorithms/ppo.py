@@ -9,6 +9,7 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import warnings
+from torch.distributions import Normal
 
 from loco_rl.modules import ActorCritic
 from loco_rl.modules.rnd import RandomNetworkDistillation
@@ -39,6 +40,12 @@ class PPO:
         desired_kl=0.01,
         device="cpu",
         normalize_advantage_per_mini_batch=False,
+        gae_method="loop",
+        gae_chunk_size=32,
+        packed_storage=False,
+        storage_dtype="float32",
+        mixed_precision=False,
+        mixed_precision_dtype="bfloat16",
         # RND parameters
         rnd_cfg: dict | None = None,
         # Symmetry parameters
@@ -102,6 +109,32 @@ class PPO:
         self.lam = lam
         self.max_grad_norm = max_grad_norm
         self.use_clipped_value_loss = use_clipped_value_loss
+        # GAE implementation: "loop" (python loop), "scan" (TorchScript scan) or "chunked" (chunked discounted cumsum)
+        self.gae_method = gae_method
+        self.gae_chunk_size = gae_chunk_size
+        # packed rollout storage: one gather per mini-batch for all fields
+        self.packed_storage = packed_storage
+        # dtype of the stored observations and action distribution parameters (actions, returns, advantages are float32)
+        self.storage_dtype = storage_dtype
+
+        # Mixed precision: the forward passes of the update run under autocast, the losses are computed in float32
+        self.mixed_precision = mixed_precision
+        self.autocast_device_type = torch.device(self.device).type
+        if mixed_precision_dtype not in ("bfloat16", "float16"):
+            raise ValueError(
+                f"Unknown mixed precision dtype '{mixed_precision_dtype}'. Should be 'bfloat16' or 'float16'."
+            )
+        # autocast on the CPU only supports bfloat16
+        if self.autocast_device_type == "cpu":
+            mixed_precision_dtype = "bfloat16"
+        self.autocast_dtype = getattr(torch, mixed_precision_dtype)
+        # float16 gradients need loss scaling, bfloat16 has the range of float32
+        grad_scaler_enabled = mixed_precision and self.autocast_dtype == torch.float16
+        if hasattr(torch.amp, "GradScaler"):
+            self.grad_scaler = torch.amp.GradScaler(self.autocast_device_type, enabled=grad_scaler_enabled)
+        else:
+            # torch < 2.3: float16 autocast is only used on CUDA (see above)
+            self.grad_scaler = torch.cuda.amp.GradScaler(enabled=grad_scaler_enabled)
 
     def init_storage(self, num_envs, num_transitions_per_env, actor_obs_shape, critic_obs_shape, action_shape):
         # create memory for RND as well :)
@@ -118,6 +151,8 @@ class PPO:
             action_shape,
             rnd_state_shape,
             self.device,
+            packed=self.packed_storage,
+            storage_dtype=self.storage_dtype,
         )
 
     def test_mode(self):
@@ -173,8 +208,27 @@ class PPO:
         # compute value for the last step
         last_values = self.actor_critic.evaluate(last_critic_obs).detach()
         self.storage.compute_returns(
-            last_values, self.gamma, self.lam, normalize_advantage=not self.normalize_advantage_per_mini_batch
+            last_values,
+            self.gamma,
+            self.lam,
+            normalize_advantage=not self.normalize_advantage_per_mini_batch,
+            method=self.gae_method,
+            chunk_size=self.gae_chunk_size,
+        )
+
+    def _autocast(self):
+        return torch.autocast(self.autocast_device_type, dtype=self.autocast_dtype, enabled=self.mixed_precision)
+
+    @staticmethod
+    def _float_distribution(distribution):
+        # the Gaussian of the actor is rebuilt from its float32 parameters, other distributions are kept as they are
+        if isinstance(distribution, Normal):
+            return Normal(distribution.loc.float(), distribution.scale.float())
+        warnings.warn(
+            f"The action distribution {type(distribution).__name__} is not cast to float32 under mixed precision,"
+            " its log-probabilities are computed in the autocast dtype."
         )
+        return distribution
 
     def update(self):  # noqa: C901
         mean_value_loss = 0
@@ -247,13 +301,18 @@ class PPO:
 
             # Recompute actions log prob and entropy for current batch of transitions
             # Note: we need to do this because we updated the actor_critic with the new parameters
-            # -- actor
-            self.actor_critic.act(obs_batch, masks=masks_batch, hidden_states=hid_states_batch[0])
+            with self._autocast():
+                # -- actor
+                self.actor_critic.act(obs_batch, masks=masks_batch, hidden_states=hid_states_batch[0])
+                # -- critic
+                value_batch = self.actor_critic.evaluate(
+                    critic_obs_batch, masks=masks_batch, hidden_states=hid_states_batch[1]
+                )
+            if self.mixed_precision:
+                # the log-probabilities, the ratio and the KL are computed in float32
+                self.actor_critic.distribution = self._float_distribution(self.actor_critic.distribution)
+                value_batch = value_batch.float()
             actions_log_prob_batch = self.actor_critic.get_actions_log_prob(actions_batch)
-            # -- critic
-            value_batch = self.actor_critic.evaluate(
-                critic_obs_batch, masks=masks_batch, hidden_states=hid_states_batch[1]
-            )
             # -- entropy
             # we only keep the entropy of the first augmentation (the original one)
             mu_batch = self.actor_critic.action_mean[:original_batch_size]
@@ -303,18 +362,23 @@ class PPO:
 
             # Symmetry loss
             if self.symmetry:
-                # obtain the symmetric actions
-                # if we did augmentation before then we don't need to augment again
-                if not self.symmetry["use_data_augmentation"]:
+                # actions predicted by the actor for symmetrically-augmented observations
+                # if we did augmentation before then the actor already ran on the augmented batch: reuse its means
+                if self.symmetry["use_data_augmentation"]:
+                    mean_actions_batch = self.actor_critic.action_mean
+                else:
                     data_augmentation_func = self.symmetry["data_augmentation_func"]
                     obs_batch, _ = data_augmentation_func(
                         obs=obs_batch, actions=None, env=self.symmetry["_env"], is_critic=False
                     )
                     # compute number of augmentations per sample
                     num_aug = int(obs_batch.shape[0] / original_batch_size)
-
-                # actions predicted by the actor for symmetrically-augmented observations
-                mean_actions_batch = self.actor_critic.act_inference(obs_batch.detach().clone())
+                    # only the augmented observations need a forward pass
+                    with self._autocast():
+                        mean_actions_symm_obs_batch = self.actor_critic.act_inference(obs_batch[original_batch_size:])
+                    mean_actions_batch = torch.cat(
+                        (self.actor_critic.action_mean, mean_actions_symm_obs_batch.float()), dim=0
+                    )
 
                 # compute the symmetrically augmented actions
                 # note: we are assuming the first augmentation is the original one.
@@ -348,9 +412,12 @@ class PPO:
             # Gradient step
             # -- For PPO
             self.optimizer.zero_grad()
-            loss.backward()
+            # the scaler is a no-op without float16 mixed precision
+            self.grad_scaler.scale(loss).backward()
+            self.grad_scaler.unscale_(self.optimizer)
             nn.utils.clip_grad_norm_(self.actor_critic.parameters(), self.max_grad_norm)
-            self.optimizer.step()
+            self.grad_scaler.step(self.optimizer)
+            self.grad_scaler.update()
             # -- For RND
             if self.rnd_optimizer:
                 self.rnd_optimizer.zero_grad()
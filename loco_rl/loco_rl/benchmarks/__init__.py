@@ -0,0 +1,6 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Micro-benchmarks of the learning components, runnable as ``python -m loco_rl.benchmarks.<name>``."""
@@ -0,0 +1,90 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Benchmark of the GAE implementations of :meth:`RolloutStorage.compute_returns`.
+
+The computation of the returns is part of the learning phase (``Perf/learning_time``). For every combination of
+``num_steps_per_env`` and ``num_envs``, the storage is filled with random rewards, values and dones, and the time of
+``compute_returns`` is measured for every method together with its deviation from the reference loop.
+
+Example:
+
+    python -m loco_rl.benchmarks.gae --device cuda:0 --num_steps_per_env 24 48 96 --num_envs 1024 4096
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import torch
+
+from loco_rl.storage import RolloutStorage
+from loco_rl.storage.gae import GAE_METHODS
+
+
+def _synchronize(device: str):
+    if "cuda" in device:
+        torch.cuda.synchronize(device)
+
+
+def benchmark_gae(num_steps_per_env: int, num_envs: int, device: str, repeats: int, done_prob: float) -> dict:
+    storage = RolloutStorage(num_envs, num_steps_per_env, [1], None, [1], device=device)
+    storage.rewards.copy_(torch.randn_like(storage.rewards))
+    storage.values.copy_(torch.randn_like(storage.values))
+    storage.dones.copy_((torch.rand_like(storage.rewards) < done_prob).byte())
+    last_values = torch.randn(num_envs, 1, device=device)
+
+    results = {}
+    for method in GAE_METHODS:
+        # warm up (compiles the TorchScript scan)
+        storage.compute_returns(last_values, 0.99, 0.95, method=method)
+        _synchronize(device)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            storage.compute_returns(last_values, 0.99, 0.95, method=method)
+        _synchronize(device)
+        results[method] = dict(
+            time_ms=(time.perf_counter() - start) / repeats * 1e3,
+            returns=storage.returns.clone(),
+            advantages=storage.advantages.clone(),
+        )
+    for method in GAE_METHODS:
+        results[method]["max_return_error"] = (results[method].pop("returns") - results["loop"]["returns"]).abs().max().item()
+        results[method]["max_advantage_error"] = (
+            (results[method].pop("advantages") - results["loop"]["advantages"]).abs().max().item()
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the GAE implementations of the rollout storage.")
+    parser.add_argument("--device", type=str, default="cuda:0" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--num_steps_per_env", type=int, nargs="+", default=[24, 48, 96])
+    parser.add_argument("--num_envs", type=int, nargs="+", default=[1024, 4096, 8192])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--done_prob", type=float, default=0.01)
+    parser.add_argument("--output", type=str, default=None, help="Optional json file for the results.")
+    args = parser.parse_args()
+
+    all_results = []
+    print(f"{'steps':>6} {'envs':>6} " + " ".join(f"{method + ' [ms]':>14}" for method in GAE_METHODS) + f" {'max error':>10}")
+    for num_steps_per_env in args.num_steps_per_env:
+        for num_envs in args.num_envs:
+            results = benchmark_gae(num_steps_per_env, num_envs, args.device, args.repeats, args.done_prob)
+            max_error = max(result["max_advantage_error"] for result in results.values())
+            print(
+                f"{num_steps_per_env:>6} {num_envs:>6} "
+                + " ".join(f"{results[method]['time_ms']:>14.3f}" for method in GAE_METHODS)
+                + f" {max_error:>10.2e}"
+            )
+            all_results.append(dict(num_steps_per_env=num_steps_per_env, num_envs=num_envs, methods=results))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(dict(device=args.device, results=all_results), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Benchmark of the mini-batch generator of :class:`RolloutStorage` with the separate and the packed layout.
+
+For every number of environments, a storage of each layout is filled with the same random rollout and the time of a
+full pass over ``mini_batch_generator`` (all epochs and mini-batches) is measured. The mini-batches of both layouts
+are drawn with the same permutation and compared.
+
+Example:
+
+    python -m loco_rl.benchmarks.mini_batch --device cuda:0 --num_envs 4096
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import torch
+
+from loco_rl.storage import RolloutStorage
+
+LAYOUTS = {"separate": False, "packed": True}
+
+
+def _synchronize(device: str):
+    if "cuda" in device:
+        torch.cuda.synchronize(device)
+
+
+def _fill(storage: RolloutStorage, seed: int):
+    generator = torch.Generator(device=storage.device)
+    generator.manual_seed(seed)
+    fields = [storage.observations, storage.actions, storage.values, storage.returns, storage.actions_log_prob]
+    fields += [storage.advantages, storage.mu, storage.sigma]
+    if storage.privileged_observations is not None:
+        fields.append(storage.privileged_observations)
+    for field in fields:
+        field.copy_(torch.randn(field.shape, generator=generator, device=storage.device))
+
+
+def _generate(storage: RolloutStorage, num_mini_batches: int, num_epochs: int, seed: int) -> tuple:
+    # iterates over all mini-batches and returns the first one
+    torch.manual_seed(seed)
+    first_batch = None
+    for batch in storage.mini_batch_generator(num_mini_batches, num_epochs):
+        if first_batch is None:
+            first_batch = batch
+    return first_batch
+
+
+def benchmark_mini_batch(args, num_envs: int) -> dict:
+    results = {}
+    outputs = {}
+    for layout, packed in LAYOUTS.items():
+        storage = RolloutStorage(
+            num_envs,
+            args.num_steps_per_env,
+            [args.num_obs],
+            [args.num_critic_obs],
+            [args.num_actions],
+            device=args.device,
+            packed=packed,
+        )
+        _fill(storage, args.seed)
+        # warm up
+        _generate(storage, args.num_mini_batches, args.num_epochs, args.seed)
+        _synchronize(args.device)
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            _generate(storage, args.num_mini_batches, args.num_epochs, args.seed)
+        _synchronize(args.device)
+        results[layout] = dict(time_ms=(time.perf_counter() - start) / args.repeats * 1e3)
+        outputs[layout] = _generate(storage, args.num_mini_batches, args.num_epochs, args.seed)
+        del storage
+
+    # the packed mini-batches are views of the same data
+    max_error = 0.0
+    for separate, packed in zip(outputs["separate"], outputs["packed"]):
+        if isinstance(separate, torch.Tensor):
+            max_error = max(max_error, (separate - packed).abs().max().item())
+    results["max_error"] = max_error
+    results["speedup"] = results["separate"]["time_ms"] / results["packed"]["time_ms"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the separate and the packed layout of the rollout storage.")
+    parser.add_argument("--device", type=str, default="cuda:0" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--num_envs", type=int, nargs="+", default=[4096])
+    parser.add_argument("--num_steps_per_env", type=int, default=24)
+    parser.add_argument("--num_obs", type=int, default=348)
+    parser.add_argument("--num_critic_obs", type=int, default=368)
+    parser.add_argument("--num_actions", type=int, default=12)
+    parser.add_argument("--num_mini_batches", type=int, default=4)
+    parser.add_argument("--num_epochs", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Optional json file for the results.")
+    args = parser.parse_args()
+
+    all_results = []
+    print(f"{'envs':>6} " + " ".join(f"{layout + ' [ms]':>14}" for layout in LAYOUTS) + f" {'speedup':>8} {'max error':>10}")
+    for num_envs in args.num_envs:
+        results = benchmark_mini_batch(args, num_envs)
+        print(
+            f"{num_envs:>6} "
+            + " ".join(f"{results[layout]['time_ms']:>14.3f}" for layout in LAYOUTS)
+            + f" {results['speedup']:>8.2f} {results['max_error']:>10.2e}"
+        )
+        all_results.append(dict(num_envs=num_envs, **results))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(dict(args=vars(args), results=all_results), f, indent=2)
+        print(f"Results written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Equivalence check and benchmark of the packed-sequence path of :class:`RNN` against the padded/masked path.
+
+Padded trajectories of random lengths are passed through the same :class:`RNN` (memory and MLP head) twice: on the
+padded path (the RNN runs over all steps and the padded outputs are masked in the loss) and on the packed-sequence path
+(``lengths`` and ``masks``, the padded steps are skipped). The outputs of the valid steps and the gradients of the masked
+loss w.r.t. all parameters must match for GRU and LSTM memories; the script exits with an error otherwise. The time of
+a forward and backward pass of both paths is reported as well.
+
+Example:
+
+    python -m loco_rl.benchmarks.packed_sequence --device cpu
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import torch
+
+from loco_rl.models import RNN
+
+
+def _synchronize(device: str):
+    if "cuda" in device:
+        torch.cuda.synchronize(device)
+
+
+def _forward_backward(model: RNN, inputs: torch.Tensor, masks: torch.Tensor, lengths: torch.Tensor | None):
+    model.zero_grad(set_to_none=True)
+    if lengths is None:
+        outputs = model(inputs)
+    else:
+        outputs = model(inputs, lengths=lengths, masks=masks.bool())
+    # masked mean squared output, as the masked behavior cloning loss of the student
+    loss = (outputs.square().sum(dim=-1) * masks).sum() / masks.sum()
+    loss.backward()
+    gradients = {name: parameter.grad.detach().clone() for name, parameter in model.named_parameters()}
+    return outputs.detach(), gradients
+
+
+def check_packed_sequence(args, memory_type: str) -> dict:
+    torch.manual_seed(args.seed)
+    model = RNN(
+        args.input_dim, [128, 64], args.output_dim, rnn_memory_type=memory_type,
+        rnn_hidden_size=args.hidden_size, rnn_num_layers=args.num_layers).to(args.device)
+    lengths = torch.randint(1, args.max_length + 1, (args.num_trajs,))
+    masks = (torch.arange(args.max_length).unsqueeze(1) < lengths.unsqueeze(0)).float().to(args.device)  # (L, B)
+    inputs = torch.randn(args.max_length, args.num_trajs, args.input_dim, device=args.device) * masks.unsqueeze(-1)
+
+    padded_outputs, padded_gradients = _forward_backward(model, inputs, masks, None)
+    packed_outputs, packed_gradients = _forward_backward(model, inputs, masks, lengths)
+    valid = masks.bool()
+    output_error = (padded_outputs[valid] - packed_outputs[valid]).abs().max().item()
+    gradient_error = max((padded_gradients[name] - packed_gradients[name]).abs().max().item() for name in padded_gradients)
+
+    times = {}
+    for path, path_lengths in (("padded", None), ("packed", lengths)):
+        _forward_backward(model, inputs, masks, path_lengths)  # warm up
+        _synchronize(args.device)
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            _forward_backward(model, inputs, masks, path_lengths)
+        _synchronize(args.device)
+        times[path] = (time.perf_counter() - start) / args.repeats
+    return dict(
+        output_error=output_error,
+        gradient_error=gradient_error,
+        padded_ms=times["padded"] * 1e3,
+        packed_ms=times["packed"] * 1e3,
+        valid_fraction=masks.mean().item(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the packed-sequence path of the RNN against the padded path.")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--memory_types", type=str, nargs="+", default=["gru", "lstm"])
+    parser.add_argument("--num_trajs", type=int, default=64)
+    parser.add_argument("--max_length", type=int, default=200)
+    parser.add_argument("--input_dim", type=int, default=64)
+    parser.add_argument("--output_dim", type=int, default=12)
+    parser.add_argument("--hidden_size", type=int, default=128)
+    parser.add_argument("--num_layers", type=int, default=2)
+    parser.add_argument("--atol", type=float, default=1e-5, help="Tolerance of the outputs and the gradients.")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failed = []
+    print(f"{'memory':>8} {'output err.':>12} {'gradient err.':>14} {'padded [ms]':>12} {'packed [ms]':>12} {'valid':>6}")
+    for memory_type in args.memory_types:
+        results = check_packed_sequence(args, memory_type)
+        print(
+            f"{memory_type:>8} {results['output_error']:>12.2e} {results['gradient_error']:>14.2e} "
+            f"{results['padded_ms']:>12.2f} {results['packed_ms']:>12.2f} {results['valid_fraction']:>6.2f}"
+        )
+        if results["output_error"] > args.atol or results["gradient_error"] > args.atol:
+            failed.append(memory_type)
+    if failed:
+        sys.exit(f"The packed-sequence path differs from the padded path for: {', '.join(failed)} (atol: {args.atol:.0e}).")
+    print("The packed-sequence and the padded paths match.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Accuracy check of the reduced-precision storage dtypes of :class:`RolloutStorage`.
+
+A rollout is collected on the synthetic environment with a float32 storage. The same rollout is then copied into a
+storage of each dtype (the conversion happens when the fields are written), and one PPO update is run from identical
+network and optimizer states with the same mini-batch permutation. The mean PPO losses of the update and the storage
+size are compared to the float32 reference.
+
+Before the update, the PPO ratio is also evaluated over the mini-batches of the first epoch. The policy has not changed
+since the rollout, so the ratio is 1 with the float32 storage and its deviation is the bias caused by the rounding of
+the stored observations (the actions and their log-probabilities are always stored in float32).
+
+A reduced dtype is acceptable when the relative deviations of the losses stay well below the iteration-to-iteration
+variation of the losses in training and the ratio deviations stay well below the clipping parameter. float16 has the finer resolution but overflows above 65504, so observations with
+large magnitudes should use bfloat16.
+
+Example:
+
+    python -m loco_rl.benchmarks.storage_precision --device cuda:0 --num_envs 4096 --model ActorCritic
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import torch
+
+from loco_rl.benchmarks.synthetic_env import SyntheticVecEnv, SyntheticVecEnvCfg
+from loco_rl.benchmarks.throughput import POLICY_CFGS, make_runner
+from loco_rl.storage import RolloutStorage
+from loco_rl.storage.rollout_storage import STORAGE_DTYPES
+
+LOSSES = ("value_loss", "surrogate_loss", "entropy")
+COPIED_FIELDS = ("observations", "privileged_observations", "rewards", "actions", "dones", "actions_log_prob", "values")
+COPIED_FIELDS += ("returns", "advantages", "mu", "sigma")
+
+
+def _storage_bytes(storage: RolloutStorage) -> int:
+    tensors = [getattr(storage, name) for name in COPIED_FIELDS if getattr(storage, name) is not None]
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def _copy_rollout(source: RolloutStorage, storage_dtype: str) -> RolloutStorage:
+    storage = RolloutStorage(
+        source.num_envs,
+        source.num_transitions_per_env,
+        source.obs_shape,
+        source.privileged_obs_shape,
+        source.actions_shape,
+        source.rnd_state_shape,
+        source.device,
+        storage_dtype=storage_dtype,
+    )
+    for name in COPIED_FIELDS:
+        if getattr(source, name) is not None:
+            getattr(storage, name).copy_(getattr(source, name))
+    storage.saved_hidden_states_a = copy.deepcopy(source.saved_hidden_states_a)
+    storage.saved_hidden_states_c = copy.deepcopy(source.saved_hidden_states_c)
+    storage.trajectory_index = None
+    storage.step = source.step
+    return storage
+
+
+def _first_epoch_ratio(alg) -> tuple[float, float]:
+    """Mean and max. absolute deviation from 1 of the PPO ratio over the mini-batches of the first epoch."""
+    if alg.actor_critic.is_recurrent:
+        generator = alg.storage.recurrent_mini_batch_generator(alg.num_mini_batches, 1)
+    else:
+        generator = alg.storage.mini_batch_generator(alg.num_mini_batches, 1)
+    deviations = []
+    with torch.inference_mode():
+        for obs_batch, _, actions_batch, _, _, _, old_actions_log_prob_batch, _, _, hid_states_batch, masks_batch, _ in (
+            generator
+        ):
+            alg.actor_critic.act(obs_batch, masks=masks_batch, hidden_states=hid_states_batch[0])
+            actions_log_prob_batch = alg.actor_critic.get_actions_log_prob(actions_batch)
+            ratio = torch.exp(actions_log_prob_batch - torch.squeeze(old_actions_log_prob_batch))
+            deviations.append((ratio - 1.0).abs().flatten())
+    deviations = torch.cat(deviations)
+    return deviations.mean().item(), deviations.max().item()
+
+
+def check_storage_precision(args) -> dict:
+    torch.manual_seed(args.seed)
+    env = SyntheticVecEnv(SyntheticVecEnvCfg(num_envs=args.num_envs, device=args.device, seed=args.seed))
+    runner = make_runner(env, args.model, args.num_steps_per_env, args.device, {})
+    alg = runner.alg
+
+    # collect a rollout with the float32 storage
+    obs = env.get_observations()["policy"].to(runner.device)
+    critic_obs = env.get_observations()["critic"].to(runner.device)
+    runner.train_mode()
+    with torch.inference_mode():
+        for _ in range(runner.num_steps_per_env):
+            actions = alg.act(obs, critic_obs)
+            next_obs, rewards, dones, infos = env.step(actions)
+            obs, critic_obs = next_obs["policy"].to(runner.device), next_obs["critic"].to(runner.device)
+            alg.process_env_step(rewards.to(runner.device), dones.to(runner.device), infos)
+        alg.compute_returns(critic_obs)
+    reference_storage = alg.storage
+    initial_state = (
+        copy.deepcopy(alg.actor_critic.state_dict()),
+        copy.deepcopy(alg.optimizer.state_dict()),
+        alg.learning_rate,
+    )
+
+    results = {}
+    for storage_dtype in STORAGE_DTYPES:
+        # identical networks, optimizer and mini-batch permutation for every dtype
+        alg.actor_critic.load_state_dict(initial_state[0])
+        alg.optimizer.load_state_dict(initial_state[1])
+        alg.learning_rate = initial_state[2]
+        alg.storage = _copy_rollout(reference_storage, storage_dtype)
+        storage_bytes = _storage_bytes(alg.storage)
+        ratio_error_mean, ratio_error_max = _first_epoch_ratio(alg)
+        torch.manual_seed(args.seed)
+        losses = alg.update()
+        results[storage_dtype] = dict(
+            zip(LOSSES, losses[:3]),
+            storage_mb=storage_bytes / 2**20,
+            ratio_error_mean=ratio_error_mean,
+            ratio_error_max=ratio_error_max,
+        )
+
+    for storage_dtype in STORAGE_DTYPES:
+        for loss in LOSSES:
+            reference = results["float32"][loss]
+            results[storage_dtype][f"{loss}_rel_error"] = abs(results[storage_dtype][loss] - reference) / (
+                abs(reference) + 1e-8
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the PPO losses with the reduced-precision rollout storage.")
+    parser.add_argument("--device", type=str, default="cuda:0" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--num_envs", type=int, default=4096)
+    parser.add_argument("--num_steps_per_env", type=int, default=24)
+    parser.add_argument("--model", type=str, default="ActorCritic", choices=list(POLICY_CFGS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Optional json file for the results.")
+    args = parser.parse_args()
+
+    results = check_storage_precision(args)
+    print(
+        f"{'dtype':>9} {'storage [MB]':>13} "
+        + " ".join(f"{loss + ' rel. err.':>24}" for loss in LOSSES)
+        + f" {'|ratio - 1| mean':>17} {'|ratio - 1| max':>16}"
+    )
+    for storage_dtype, result in results.items():
+        print(
+            f"{storage_dtype:>9} {result['storage_mb']:>13.1f} "
+            + " ".join(f"{result[loss + '_rel_error']:>24.2e}" for loss in LOSSES)
+            + f" {result['ratio_error_mean']:>17.2e} {result['ratio_error_max']:>16.2e}"
+        )
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(dict(args=vars(args), results=results), f, indent=2)
+        print(f"Results written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
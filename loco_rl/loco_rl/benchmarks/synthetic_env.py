@@ -0,0 +1,121 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+from __future__ import annotations
+
+import torch
+from dataclasses import asdict, dataclass
+
+from loco_rl.env import VecEnv
+
+
+@dataclass
+class SyntheticVecEnvCfg:
+    """Configuration of :class:`SyntheticVecEnv`. The defaults follow the LocoTouch object transport task."""
+
+    num_envs: int = 4096
+    num_actions: int = 12
+    proprioception_dim: int = 45 * 6
+    """Dimension of the proprioceptive part of the ``policy`` observations."""
+    object_state_dim: int = 13
+    """Dimension of the ``object_state`` observations, appended to the ``policy`` observations."""
+    critic_extra_dim: int = 20
+    """Dimension of the privileged observations appended to the ``policy`` observations for the ``critic``."""
+    tactile_shape: tuple = (2, 17, 13)
+    """Shape of the ``tactile`` observations, which are flattened."""
+    binary_tactile: bool = True
+    """Whether the tactile observations are binary contact maps."""
+    max_episode_length: int = 1000
+    termination_prob: float = 0.002
+    """Probability of a (non-timeout) termination per environment and step."""
+    random_initial_episode_length: bool = True
+    """Whether the episodes start at random lengths, so that the timeouts are spread over the steps."""
+    step_dt: float = 0.02
+    device: str = "cpu"
+    seed: int = 0
+
+
+class SyntheticVecEnv(VecEnv):
+    """Synthetic vectorized environment for benchmarking the learning components without a simulator.
+
+    The observation groups have the layout of the LocoTouch environments: ``policy`` (proprioception and object state),
+    ``critic`` (policy observations and privileged information), ``tactile`` and ``object_state``. The observations
+    are random, the rewards depend on the actions, and episodes end by random terminations and by timeouts.
+    All buffers are preallocated and filled in place, so that the environment step is cheap compared to the learner.
+    """
+
+    def __init__(self, cfg: SyntheticVecEnvCfg):
+        self.cfg = cfg
+        self.num_envs = cfg.num_envs
+        self.num_actions = cfg.num_actions
+        self.max_episode_length = cfg.max_episode_length
+        self.device = torch.device(cfg.device)
+        self.step_dt = cfg.step_dt
+        self.generator = torch.Generator(device=self.device)
+        self.generator.manual_seed(cfg.seed)
+
+        self.num_policy_obs = cfg.proprioception_dim + cfg.object_state_dim
+        self.num_critic_obs = self.num_policy_obs + cfg.critic_extra_dim
+        self.num_tactile_obs = int(torch.Size(cfg.tactile_shape).numel())
+        # double-buffered observations: the learner may still reference the observations of the previous step
+        self._critic_obs_buffers = [torch.zeros(self.num_envs, self.num_critic_obs, device=self.device) for _ in range(2)]
+        self._tactile_obs_buffers = [torch.zeros(self.num_envs, self.num_tactile_obs, device=self.device) for _ in range(2)]
+        self._buffer_index = 0
+        self._rewards = torch.zeros(self.num_envs, device=self.device)
+        self._uniform = torch.zeros(self.num_envs, device=self.device)
+        self.episode_length_buf = torch.zeros(self.num_envs, dtype=torch.long, device=self.device)
+        self.reset()
+
+    @property
+    def unwrapped(self):
+        return self
+
+    def get_observations(self) -> dict[str, torch.Tensor]:
+        critic_obs = self._critic_obs_buffers[self._buffer_index]
+        policy_obs = critic_obs[:, : self.num_policy_obs]
+        return {
+            "policy": policy_obs,
+            "critic": critic_obs,
+            "tactile": self._tactile_obs_buffers[self._buffer_index],
+            "object_state": policy_obs[:, self.cfg.proprioception_dim :],
+        }
+
+    def reset(self) -> tuple[dict[str, torch.Tensor], dict]:
+        self._sample_observations()
+        if self.cfg.random_initial_episode_length:
+            self.episode_length_buf.random_(0, int(self.max_episode_length), generator=self.generator)
+        else:
+            self.episode_length_buf.zero_()
+        return self.get_observations(), {}
+
+    def step(self, actions: torch.Tensor) -> tuple[dict[str, torch.Tensor], torch.Tensor, torch.Tensor, dict]:
+        self._sample_observations()
+        # rewards: tracking term on the first observations and an action penalty
+        critic_obs = self._critic_obs_buffers[self._buffer_index]
+        self._rewards.copy_(
+            -(actions - critic_obs[:, : self.num_actions]).square().mean(dim=1) - 0.01 * actions.square().sum(dim=1)
+        )
+        # dones: random terminations and timeouts
+        self.episode_length_buf += 1
+        self._uniform.uniform_(generator=self.generator)
+        time_outs = self.episode_length_buf >= self.max_episode_length
+        dones = time_outs | (self._uniform < self.cfg.termination_prob)
+        self.episode_length_buf.masked_fill_(dones, 0)
+        extras = {
+            "time_outs": time_outs,
+            "log": {"/synthetic/termination_rate": dones.float().mean()},
+        }
+        return self.get_observations(), self._rewards.clone(), dones.long(), extras
+
+    def _sample_observations(self):
+        self._buffer_index = 1 - self._buffer_index
+        self._critic_obs_buffers[self._buffer_index].normal_(generator=self.generator)
+        tactile_obs = self._tactile_obs_buffers[self._buffer_index]
+        tactile_obs.uniform_(generator=self.generator)
+        if self.cfg.binary_tactile:
+            tactile_obs.copy_(tactile_obs > 0.8)
+
+    def to_dict(self) -> dict:
+        return asdict(self.cfg)
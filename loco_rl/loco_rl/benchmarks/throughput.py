@@ -0,0 +1,234 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Throughput benchmark of the learning pipeline on the synthetic environment.
+
+For every combination of device, number of environments and actor-critic class, an :class:`OnPolicyRunner` is
+created on a :class:`SyntheticVecEnv` and the following phases are timed over several iterations:
+
+* ``collection``: ``alg.act``, ``env.step``, observation normalization and ``alg.process_env_step``,
+* ``gae``: ``alg.compute_returns``,
+* ``minibatch``: one pass over the mini-batch generator used by ``PPO.update`` (without any computation),
+* ``update``: ``PPO.update``.
+
+The throughput of each phase is reported in environment steps per second (median over the iterations) and can be
+written to a json file, so that the results of different commits can be compared.
+
+Example:
+
+    python -m loco_rl.benchmarks.throughput --devices cuda:0 --num_envs 1024 4096 --models ActorCritic \
+        ActorCriticRecurrent --output results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import platform
+import statistics
+import subprocess
+import time
+import torch
+
+from loco_rl.benchmarks.synthetic_env import SyntheticVecEnv, SyntheticVecEnvCfg
+from loco_rl.runners import OnPolicyRunner
+
+ALGORITHM_CFG = dict(
+    class_name="PPO",
+    value_loss_coef=1.0,
+    use_clipped_value_loss=True,
+    clip_param=0.2,
+    entropy_coef=0.01,
+    num_learning_epochs=5,
+    num_mini_batches=4,
+    learning_rate=1.0e-3,
+    schedule="adaptive",
+    gamma=0.99,
+    lam=0.95,
+    desired_kl=0.01,
+    max_grad_norm=1.0,
+)
+
+_ENCODER_CFG = dict(
+    actor_hidden_dims=[512, 256, 128],
+    critic_hidden_dims=[512, 256, 128],
+    # the last observations (the object state for the actor) are encoded
+    actor_flatten_obs_end_idx=-13,
+    actor_encoder_obs_start_idx=-13,
+    actor_encoder_hidden_dims=[256, 128, 64],
+    actor_encoder_embedding_dim=64,
+    critic_flatten_obs_end_idx=-13,
+    critic_encoder_obs_start_idx=-13,
+    critic_encoder_hidden_dims=[256, 128, 64],
+    critic_encoder_embedding_dim=64,
+)
+
+POLICY_CFGS = {
+    "ActorCritic": dict(actor_hidden_dims=[512, 256, 128], critic_hidden_dims=[512, 256, 128]),
+    "ActorCriticRecurrent": dict(
+        actor_hidden_dims=[512, 256, 128], critic_hidden_dims=[512, 256, 128], rnn_type="gru", rnn_hidden_size=256
+    ),
+    "ActorCriticEncoder": _ENCODER_CFG,
+    "ActorCriticRNNEncoder": dict(_ENCODER_CFG, encoder_rnn_type="gru", encoder_rnn_hidden_size=256),
+    "ActorCriticPreEncoderRNNEncoder": dict(
+        _ENCODER_CFG,
+        actor_pre_encoder_hidden_dims=[128, 64],
+        actor_pre_encoder_embedding_dim=64,
+        critic_pre_encoder_hidden_dims=[128, 64],
+        critic_pre_encoder_embedding_dim=64,
+        encoder_rnn_type="gru",
+        encoder_rnn_hidden_size=256,
+    ),
+}
+
+
+def _synchronize(device: str):
+    if "cuda" in device:
+        torch.cuda.synchronize(device)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_runner(env: SyntheticVecEnv, model: str, num_steps_per_env: int, device: str, alg_overrides: dict):
+    train_cfg = dict(
+        num_steps_per_env=num_steps_per_env,
+        save_interval=1000,
+        empirical_normalization=False,
+        algorithm=dict(ALGORITHM_CFG, **alg_overrides),
+        policy=dict(copy.deepcopy(POLICY_CFGS[model]), class_name=model, activation="elu", init_noise_std=1.0),
+    )
+    return OnPolicyRunner(env, train_cfg, log_dir=None, device=device)
+
+
+def benchmark_runner(runner: OnPolicyRunner, num_iterations: int, warmup_iterations: int) -> dict:
+    """Times the phases of the learning iterations of the runner (without any logging)."""
+    env, alg, device = runner.env, runner.alg, runner.device
+    obs = env.get_observations()["policy"].to(device)
+    critic_obs = env.get_observations()["critic"].to(device)
+    runner.train_mode()
+    steps_per_iteration = runner.num_steps_per_env * env.num_envs
+    times = {"collection": [], "gae": [], "minibatch": [], "update": []}
+    for iteration in range(warmup_iterations + num_iterations):
+        phase_times = {}
+        _synchronize(device)
+        start = time.perf_counter()
+        with torch.inference_mode():
+            for _ in range(runner.num_steps_per_env):
+                actions = alg.act(obs, critic_obs)
+                next_obs, rewards, dones, infos = env.step(actions.to(env.device))
+                infos["observations"] = next_obs
+                obs, rewards, dones = next_obs["policy"].to(device), rewards.to(device), dones.to(device)
+                obs = runner.obs_normalizer(obs)
+                critic_obs = runner.critic_obs_normalizer(next_obs["critic"].to(device))
+                alg.process_env_step(rewards, dones, infos)
+            _synchronize(device)
+            phase_times["collection"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            alg.compute_returns(critic_obs)
+            _synchronize(device)
+            phase_times["gae"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if alg.actor_critic.is_recurrent:
+            generator = alg.storage.recurrent_mini_batch_generator(alg.num_mini_batches, 1)
+        else:
+            generator = alg.storage.mini_batch_generator(alg.num_mini_batches, 1)
+        for _ in generator:
+            pass
+        _synchronize(device)
+        phase_times["minibatch"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        alg.update()
+        _synchronize(device)
+        phase_times["update"] = time.perf_counter() - start
+
+        if iteration >= warmup_iterations:
+            for phase, phase_time in phase_times.items():
+                times[phase].append(phase_time)
+
+    results = {}
+    for phase, phase_times in times.items():
+        median_time = statistics.median(phase_times)
+        results[phase] = dict(time_s=median_time, steps_per_s=steps_per_iteration / median_time)
+    total_time = sum(result["time_s"] for result in results.values())
+    results["total"] = dict(time_s=total_time, steps_per_s=steps_per_iteration / total_time)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the throughput of loco_rl on a synthetic environment.")
+    parser.add_argument("--devices", type=str, nargs="+", default=["cuda:0" if torch.cuda.is_available() else "cpu"])
+    parser.add_argument("--num_envs", type=int, nargs="+", default=[1024, 4096])
+    parser.add_argument("--models", type=str, nargs="+", default=list(POLICY_CFGS.keys()), choices=list(POLICY_CFGS))
+    parser.add_argument("--num_steps_per_env", type=int, default=24)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup_iterations", type=int, default=2)
+    parser.add_argument("--gae_method", type=str, default="loop", help="GAE implementation of the PPO.")
+    parser.add_argument("--packed_storage", action="store_true", help="Use the packed rollout storage.")
+    parser.add_argument("--storage_dtype", type=str, default="float32", help="Storage dtype of the rollout storage.")
+    parser.add_argument("--mixed_precision", type=str, default=None, help="Autocast dtype of the update (disabled if unset).")
+    parser.add_argument("--termination_prob", type=float, default=0.002)
+    parser.add_argument("--max_episode_length", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Optional json file for the results.")
+    args = parser.parse_args()
+
+    report = dict(
+        meta=dict(
+            git_commit=_git_commit(),
+            torch_version=torch.__version__,
+            python_version=platform.python_version(),
+            cuda_devices=[torch.cuda.get_device_name(i) for i in range(torch.cuda.device_count())],
+            args=vars(args),
+        ),
+        results=[],
+    )
+    alg_overrides = dict(
+        gae_method=args.gae_method, packed_storage=args.packed_storage, storage_dtype=args.storage_dtype
+    )
+    if args.mixed_precision is not None:
+        alg_overrides.update(mixed_precision=True, mixed_precision_dtype=args.mixed_precision)
+    phases = ["collection", "gae", "minibatch", "update", "total"]
+    print(f"{'device':>8} {'envs':>6} {'model':>32} " + " ".join(f"{phase + ' [st/s]':>18}" for phase in phases))
+    for device in args.devices:
+        for num_envs in args.num_envs:
+            for model in args.models:
+                torch.manual_seed(args.seed)
+                env = SyntheticVecEnv(
+                    SyntheticVecEnvCfg(
+                        num_envs=num_envs,
+                        termination_prob=args.termination_prob,
+                        max_episode_length=args.max_episode_length,
+                        device=device,
+                        seed=args.seed,
+                    )
+                )
+                runner = make_runner(env, model, args.num_steps_per_env, device, alg_overrides)
+                results = benchmark_runner(runner, args.iterations, args.warmup_iterations)
+                print(
+                    f"{device:>8} {num_envs:>6} {model:>32} "
+                    + " ".join(f"{results[phase]['steps_per_s']:>18.0f}" for phase in phases)
+                )
+                report["results"].append(dict(device=device, num_envs=num_envs, model=model, phases=results))
+                del runner, env
+                if "cuda" in device:
+                    torch.cuda.empty_cache()
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
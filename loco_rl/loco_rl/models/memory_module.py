@@ -1,4 +1,5 @@
 import torch.nn as nn
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
 
 class Memory(nn.Module):
     def __init__(self, memory_type, input_dim, hidden_size, num_layers):
@@ -7,8 +8,15 @@ class Memory(nn.Module):
         self.rnn = rnn_cls(input_size=input_dim, hidden_size=hidden_size, num_layers=num_layers)
         self.hidden_states = None
     
-    def forward(self, input, hidden_states=None):
-        if len(input.shape) == 3:
+    def forward(self, input, hidden_states=None, lengths=None):
+        # under CPU autocast, the inputs may be bfloat16 outputs of a preceding layer while the RNN is not autocast
+        input = input.to(self.rnn.weight_ih_l0.dtype)
+        if len(input.shape) == 3 and lengths is not None:
+            # Batch mode with padded trajectories (L, B, D): only run the RNN on the valid steps, padded outputs are zeros
+            packed_input = pack_padded_sequence(input, lengths.cpu(), enforce_sorted=False)
+            packed_out, _ = self.rnn(packed_input, hidden_states)
+            out, _ = pad_packed_sequence(packed_out, total_length=input.shape[0])
+        elif len(input.shape) == 3:
             # Batch mode during training
             out, _ = self.rnn(input, hidden_states)
         else:
@@ -1,6 +1,7 @@
 import torch.nn as nn
 from .memory_module import Memory
 from .mlp import MLP
+from loco_rl.utils import apply_on_valid_steps
 
 
 class RNN(nn.Module):
@@ -11,8 +12,11 @@ class RNN(nn.Module):
         self.memory = Memory(rnn_memory_type, input_dim, rnn_hidden_size, rnn_num_layers)
         self.mlp = MLP(rnn_hidden_size, hidden_dims, output_dim, activation)
     
-    def forward(self, x, hidden_states=None):
-        rnn_out = self.memory(x, hidden_states=hidden_states)
+    def forward(self, x, hidden_states=None, lengths=None, masks=None):
+        # lengths: packed-sequence mode for padded trajectories, masks: run the MLP head on the valid steps only
+        rnn_out = self.memory(x, hidden_states=hidden_states, lengths=lengths)
+        if masks is not None:
+            return apply_on_valid_steps(self.mlp, rnn_out, masks)
         return self.mlp(rnn_out)
     
     def reset(self, dones=None):
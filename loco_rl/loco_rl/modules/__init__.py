@@ -6,6 +6,7 @@ from .actor_critic_encoder import ActorCriticEncoder
 from .actor_critic_rnn_encoder import ActorCriticRNNEncoder
 from .actor_critic_pre_encoder_rnn_encoder import ActorCriticPreEncoderRNNEncoder
 from .normalizer import EmpiricalNormalization
+from .normalization_folding import fold_empirical_normalization
 from .rnd import RandomNetworkDistillation
 
 __all__ = [
@@ -15,4 +16,5 @@ __all__ = [
     "ActorCriticRNNEncoder",
     "ActorCriticPreEncoderRNNEncoder",
     "EmpiricalNormalization",
+    "fold_empirical_normalization",
     "RandomNetworkDistillation"]
@@ -74,6 +74,8 @@ class Memory(torch.nn.Module):
         self.hidden_states = None
 
     def forward(self, input, masks=None, hidden_states=None):
+        # under CPU autocast, the inputs may be bfloat16 outputs of a preceding layer while the RNN is not autocast
+        input = input.to(self.rnn.weight_ih_l0.dtype)
         batch_mode = masks is not None
         if batch_mode:
             # batch mode (policy update): need saved hidden states
@@ -0,0 +1,126 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+from __future__ import annotations
+
+import copy
+import torch
+from torch import nn
+
+from loco_rl.modules.normalizer import EmpiricalNormalization
+
+
+def fold_normalization_into_layer(
+    layer: nn.Module, scale: torch.Tensor, shift: torch.Tensor, input_start: int = 0, weight_name: str = "weight"
+):
+    """Folds an affine input normalization ``(x - shift) * scale`` into the input weights of a layer (in place).
+
+    The normalized inputs are the columns ``[input_start, input_start + len(scale))`` of the layer input, the other
+    columns (e.g. an embedding concatenated to the observations) are left untouched. Since
+    ``W ((x - shift) * scale) + b = (W * scale) x + (b - W (shift * scale))``, the scaled columns of the weight and the
+    corrected bias give the same outputs for the raw inputs.
+
+    Args:
+        layer: An ``nn.Linear`` (``weight_name="weight"``) or an ``nn.GRU``/``nn.LSTM`` (``weight_name="weight_ih_l0"``).
+        scale: The scale of the normalization with shape (num_normalized_inputs,).
+        shift: The shift of the normalization with shape (num_normalized_inputs,).
+        input_start: The first input column of the layer that is normalized.
+        weight_name: The name of the input weight of the layer.
+    """
+    weight = getattr(layer, weight_name)
+    bias_name = weight_name.replace("weight", "bias")
+    bias = getattr(layer, bias_name)
+    input_end = input_start + scale.shape[0]
+    with torch.no_grad():
+        normalized_weight = weight[:, input_start:input_end]
+        bias_correction = normalized_weight @ (shift * scale)
+        normalized_weight.mul_(scale)
+        if bias is None:
+            # the layer gets a bias to absorb the shift
+            setattr(layer, bias_name, nn.Parameter(-bias_correction))
+        else:
+            bias.sub_(bias_correction)
+
+
+def _first_linear(module: nn.Module) -> nn.Linear:
+    return next(layer for layer in module.modules() if isinstance(layer, nn.Linear))
+
+
+def fold_empirical_normalization(
+    actor_critic: nn.Module,
+    normalizer: EmpiricalNormalization,
+    check_samples: int = 256,
+    atol: float = 1e-4,
+) -> nn.Module:
+    """Returns a copy of the actor-critic whose actor consumes raw observations.
+
+    The frozen statistics of the observation normalizer are folded into the input layers of the actor: the first
+    ``nn.Linear`` of the actor MLP for the flattened observations, and the first layer of the encoder path (the
+    pre-encoder, the recurrent memory or the encoder MLP) for the encoder observations. The critic is not folded.
+    ``act_inference``, ``act_encoder_inference`` and ``act_backbone_inference`` of the copy give the outputs of the
+    original module on normalized observations, without the normalization step.
+
+    Args:
+        actor_critic: The actor-critic module.
+        normalizer: The observation normalizer of the actor.
+        check_samples: The number of random observations on which the folded and the unfolded actor are compared.
+            No check is done if zero.
+        atol: The absolute tolerance of the check.
+
+    Raises:
+        ValueError: When the outputs of the folded actor differ from the unfolded actor.
+
+    Returns:
+        The folded actor-critic in evaluation mode.
+    """
+    folded = copy.deepcopy(actor_critic).eval()
+    eps = normalizer.eps
+    mean = normalizer._mean.squeeze(0).detach()
+    scale = 1.0 / (normalizer._std.squeeze(0).detach() + eps)
+    num_obs = mean.shape[0]
+
+    if hasattr(folded, "actor_flatten_obs_dim"):
+        # encoder models: the flattened observations are the first inputs of the actor MLP
+        flatten_dim = folded.actor_flatten_obs_dim
+        fold_normalization_into_layer(_first_linear(folded.actor), scale[:flatten_dim], mean[:flatten_dim])
+        encoder_start = num_obs - folded.actor_encoder_obs_dim
+        encoder_scale, encoder_shift = scale[encoder_start:], mean[encoder_start:]
+        if hasattr(folded, "actor_pre_encoder"):
+            fold_normalization_into_layer(_first_linear(folded.actor_pre_encoder), encoder_scale, encoder_shift)
+        elif hasattr(folded, "memory_a"):
+            fold_normalization_into_layer(folded.memory_a.rnn, encoder_scale, encoder_shift, weight_name="weight_ih_l0")
+        else:
+            fold_normalization_into_layer(_first_linear(folded.actor_encoder), encoder_scale, encoder_shift)
+    elif hasattr(folded, "memory_a"):
+        fold_normalization_into_layer(folded.memory_a.rnn, scale, mean, weight_name="weight_ih_l0")
+    else:
+        fold_normalization_into_layer(_first_linear(folded.actor), scale, mean)
+
+    if check_samples > 0:
+        _check_folding(actor_critic, folded, normalizer, check_samples, atol)
+    return folded
+
+
+@torch.no_grad()
+def _check_folding(
+    actor_critic: nn.Module, folded: nn.Module, normalizer: EmpiricalNormalization, num_samples: int, atol: float
+):
+    reference = copy.deepcopy(actor_critic).eval()
+    mean, std = normalizer._mean, normalizer._std
+    obs = mean + std * torch.randn(num_samples, mean.shape[-1], device=mean.device, dtype=mean.dtype)
+    normalized_obs = (obs - mean) / (std + normalizer.eps)
+    # recurrent modules start from empty hidden states
+    _clear_hidden_states(reference)
+    _clear_hidden_states(folded)
+    error = (folded.act_inference(obs) - reference.act_inference(normalized_obs)).abs().max().item()
+    _clear_hidden_states(folded)
+    if error > atol:
+        raise ValueError(f"Folding the observation normalization changed the actions (max error: {error:.2e}).")
+
+
+def _clear_hidden_states(actor_critic: nn.Module):
+    for memory in (getattr(actor_critic, "memory_a", None), getattr(actor_critic, "memory_c", None)):
+        if memory is not None:
+            memory.hidden_states = None
@@ -9,13 +9,12 @@ import os
 import statistics
 import time
 import torch
-from collections import deque
 
 import loco_rl
 from loco_rl.algorithms import PPO
 from loco_rl.env import VecEnv
 from loco_rl.modules import *
-from loco_rl.utils import store_code_state
+from loco_rl.utils import CheckpointWriter, EpisodeStatistics, PhaseTimer, ProfilerWindow, store_code_state
 
 
 class OnPolicyRunner:
@@ -76,6 +75,8 @@ class OnPolicyRunner:
         else:
             self.obs_normalizer = torch.nn.Identity().to(self.device)  # no normalization
             self.critic_obs_normalizer = torch.nn.Identity().to(self.device)  # no normalization
+        # actor-critic with the normalization folded in for inference, made on the first request
+        self._folded_actor_critic = None
         # init storage and model
         self.alg.init_storage(
             self.env.num_envs,
@@ -93,7 +94,30 @@ class OnPolicyRunner:
         self.current_learning_iteration = 0
         self.git_status_repos = [loco_rl.__file__]
 
+        # Opt-in profiling: per-phase timers logged as Perf/* and a torch.profiler trace of an iteration window
+        self.phase_timer = PhaseTimer(
+            enabled=self.cfg.get("profile_phases", False),
+            device=self.device,
+            mode=self.cfg.get("profile_timer", "cuda_event"),
+        )
+        self.profiler_window = ProfilerWindow(
+            log_dir,
+            start_iteration=self.cfg.get("profiler_start_iteration"),
+            num_iterations=self.cfg.get("profiler_num_iterations", 3),
+        )
+
+        # Checkpoints are written in a background thread started with the first save, then uploaded and pruned by the
+        # retention policy on the main thread (checkpoints not written by this runner are never removed)
+        self.checkpoint_writer = CheckpointWriter(
+            async_write=self.cfg.get("async_checkpoint", True),
+            keep_last=self.cfg.get("keep_last_checkpoints", 0),
+            keep_every=self.cfg.get("keep_every_checkpoints", 0),
+            upload_fn=self._upload_checkpoint,
+        )
+
     def learn(self, num_learning_iterations: int, init_at_random_ep_len: bool = False):  # noqa: C901
+        # the weights change, so the folded inference actor-critic is made again on the next request
+        self._folded_actor_critic = None
         # initialize writer
         if self.log_dir is not None and self.writer is None:
             # Launch either Tensorboard or Neptune & Tensorboard summary writer(s), default: Tensorboard.
@@ -134,115 +158,134 @@ class OnPolicyRunner:
 
         # Book keeping
         ep_infos = []
-        rewbuffer = deque(maxlen=100)
-        lenbuffer = deque(maxlen=100)
-        cur_reward_sum = torch.zeros(self.env.num_envs, dtype=torch.float, device=self.device)
-        cur_episode_length = torch.zeros(self.env.num_envs, dtype=torch.float, device=self.device)
-        # create buffers for logging extrinsic and intrinsic rewards
+        rewbuffer = []
+        lenbuffer = []
+        # episode returns and lengths are accumulated on the device and copied to the host once per iteration
+        # (with separate logging of extrinsic and intrinsic rewards for RND)
+        episode_statistics = EpisodeStatistics(
+            self.env.num_envs,
+            ["reward", "extrinsic_reward", "intrinsic_reward"] if self.alg.rnd else ["reward"],
+            buffer_size=100,
+            device=self.device,
+        )
         if self.alg.rnd:
-            erewbuffer = deque(maxlen=100)
-            irewbuffer = deque(maxlen=100)
-            cur_ereward_sum = torch.zeros(self.env.num_envs, dtype=torch.float, device=self.device)
-            cur_ireward_sum = torch.zeros(self.env.num_envs, dtype=torch.float, device=self.device)
+            erewbuffer = []
+            irewbuffer = []
 
         start_iter = self.current_learning_iteration
         tot_iter = start_iter + num_learning_iterations
-        for it in range(start_iter, tot_iter):
-            start = time.time()
-            # Rollout
-            with torch.inference_mode():
-                for _ in range(self.num_steps_per_env):
-                    # Sample actions from policy
-                    actions = self.alg.act(obs, critic_obs)
-                    # Step environment
-                    # obs, rewards, dones, infos = self.env.step(actions.to(self.env.device))
-                    next_obs, rewards, dones, infos = self.env.step(actions.to(self.env.device))
-                    obs = next_obs["policy"]
-                    infos["observations"] = {k: v for k, v in next_obs.items()}
-
-                    # Move to the agent device
-                    obs, rewards, dones = obs.to(self.device), rewards.to(self.device), dones.to(self.device)
-
-                    # Normalize observations
-                    obs = self.obs_normalizer(obs)
-                    # Extract critic observations and normalize
-                    if "critic" in infos["observations"]:
-                        critic_obs = self.critic_obs_normalizer(infos["observations"]["critic"].to(self.device))
-                    else:
-                        critic_obs = obs
-
-                    # Process env step and store in buffer
-                    self.alg.process_env_step(rewards, dones, infos)
-
-                    # Intrinsic rewards (extracted here only for logging)!
-                    intrinsic_rewards = self.alg.intrinsic_rewards if self.alg.rnd else None
+        timer = self.phase_timer
+        # the profiler trace and the pending checkpoints are written even if training is interrupted
+        try:
+            for it in range(start_iter, tot_iter):
+                self.profiler_window.step(it)
+                start = time.time()
+                # Rollout
+                with torch.inference_mode():
+                    for _ in range(self.num_steps_per_env):
+                        # Sample actions from policy
+                        with timer.phase("act"):
+                            actions = self.alg.act(obs, critic_obs)
+                        # Step environment
+                        # obs, rewards, dones, infos = self.env.step(actions.to(self.env.device))
+                        with timer.phase("env_step"):
+                            next_obs, rewards, dones, infos = self.env.step(actions.to(self.env.device))
+                        obs = next_obs["policy"]
+                        infos["observations"] = {k: v for k, v in next_obs.items()}
+
+                        with timer.phase("normalization"):
+                            # Move to the agent device
+                            obs, rewards, dones = obs.to(self.device), rewards.to(self.device), dones.to(self.device)
+
+                            # Normalize observations
+                            obs = self.obs_normalizer(obs)
+                            # Extract critic observations and normalize
+                            if "critic" in infos["observations"]:
+                                critic_obs = self.critic_obs_normalizer(infos["observations"]["critic"].to(self.device))
+                            else:
+                                critic_obs = obs
+
+                        # Process env step and store in buffer
+                        with timer.phase("process_env_step"):
+                            self.alg.process_env_step(rewards, dones, infos)
+
+                        # Intrinsic rewards (extracted here only for logging)!
+                        intrinsic_rewards = self.alg.intrinsic_rewards if self.alg.rnd else None
+
+                        if self.log_dir is not None:
+                            with timer.phase("bookkeeping"):
+                                # Book keeping
+                                if "episode" in infos:
+                                    ep_infos.append(infos["episode"])
+                                elif "log" in infos:
+                                    ep_infos.append(infos["log"])
+                                # Update rewards and episode lengths, record completed episodes (without host sync)
+                                if self.alg.rnd:
+                                    episode_statistics.step(
+                                        {
+                                            "reward": rewards + intrinsic_rewards,
+                                            "extrinsic_reward": rewards,
+                                            "intrinsic_reward": intrinsic_rewards,
+                                        },
+                                        dones,
+                                    )
+                                else:
+                                    episode_statistics.step({"reward": rewards}, dones)
 
                     if self.log_dir is not None:
-                        # Book keeping
-                        if "episode" in infos:
-                            ep_infos.append(infos["episode"])
-                        elif "log" in infos:
-                            ep_infos.append(infos["log"])
-                        # Update rewards
-                        if self.alg.rnd:
-                            cur_ereward_sum += rewards
-                            cur_ireward_sum += intrinsic_rewards  # type: ignore
-                            cur_reward_sum += rewards + intrinsic_rewards
-                        else:
-                            cur_reward_sum += rewards
-                        # Update episode length
-                        cur_episode_length += 1
-                        # Clear data for completed episodes
-                        # -- common
-                        new_ids = (dones > 0).nonzero(as_tuple=False)
-                        rewbuffer.extend(cur_reward_sum[new_ids][:, 0].cpu().numpy().tolist())
-                        lenbuffer.extend(cur_episode_length[new_ids][:, 0].cpu().numpy().tolist())
-                        cur_reward_sum[new_ids] = 0
-                        cur_episode_length[new_ids] = 0
-                        # -- intrinsic and extrinsic rewards
+                        # Copy the statistics of the completed episodes to the host once per iteration
+                        with timer.phase("bookkeeping"):
+                            episode_buffers = episode_statistics.flush()
+                        rewbuffer, lenbuffer = episode_buffers["reward"], episode_buffers["length"]
                         if self.alg.rnd:
-                            erewbuffer.extend(cur_ereward_sum[new_ids][:, 0].cpu().numpy().tolist())
-                            irewbuffer.extend(cur_ireward_sum[new_ids][:, 0].cpu().numpy().tolist())
-                            cur_ereward_sum[new_ids] = 0
-                            cur_ireward_sum[new_ids] = 0
-
+                            erewbuffer = episode_buffers["extrinsic_reward"]
+                            irewbuffer = episode_buffers["intrinsic_reward"]
+
+                    stop = time.time()
+                    collection_time = stop - start
+
+                    # Learning step
+                    start = stop
+                    with timer.phase("compute_returns"):
+                        self.alg.compute_returns(critic_obs)
+
+                # Update policy
+                # Note: we keep arguments here since locals() loads them
+                with timer.phase("update"):
+                    mean_value_loss, mean_surrogate_loss, mean_entropy, mean_rnd_loss, mean_symmetry_loss = (
+                        self.alg.update()
+                    )
                 stop = time.time()
-                collection_time = stop - start
-
-                # Learning step
-                start = stop
-                self.alg.compute_returns(critic_obs)
-
-            # Update policy
-            # Note: we keep arguments here since locals() loads them
-            mean_value_loss, mean_surrogate_loss, mean_entropy, mean_rnd_loss, mean_symmetry_loss = self.alg.update()
-            stop = time.time()
-            learn_time = stop - start
-            self.current_learning_iteration = it
-
-            # Logging info and save checkpoint
+                learn_time = stop - start
+                phase_times = timer.summary()
+                self.current_learning_iteration = it
+
+                # Logging info and save checkpoint
+                if self.log_dir is not None:
+                    # Log information
+                    self.log(locals())
+                    # Save model
+                    if it % self.save_interval == 0:
+                        self.save(os.path.join(self.log_dir, f"model_{it}.pt"))
+
+                # Clear episode infos
+                ep_infos.clear()
+
+                # Save code state
+                if it == start_iter:
+                    # obtain all the diff files
+                    git_file_paths = store_code_state(self.log_dir, self.git_status_repos)
+                    # if possible store them to wandb
+                    if self.logger_type in ["wandb", "neptune"] and git_file_paths:
+                        for path in git_file_paths:
+                            self.writer.save_file(path)
+
+            # Save the final model after training
             if self.log_dir is not None:
-                # Log information
-                self.log(locals())
-                # Save model
-                if it % self.save_interval == 0:
-                    self.save(os.path.join(self.log_dir, f"model_{it}.pt"))
-
-            # Clear episode infos
-            ep_infos.clear()
-
-            # Save code state
-            if it == start_iter:
-                # obtain all the diff files
-                git_file_paths = store_code_state(self.log_dir, self.git_status_repos)
-                # if possible store them to wandb
-                if self.logger_type in ["wandb", "neptune"] and git_file_paths:
-                    for path in git_file_paths:
-                        self.writer.save_file(path)
-
-        # Save the final model after training
-        if self.log_dir is not None:
-            self.save(os.path.join(self.log_dir, f"model_{self.current_learning_iteration}.pt"))
+                self.save(os.path.join(self.log_dir, f"model_{self.current_learning_iteration}.pt"))
+        finally:
+            self.profiler_window.stop()
+            self.checkpoint_writer.wait()
 
     def log(self, locs: dict, width: int = 80, pad: int = 35):
         self.tot_timesteps += self.num_steps_per_env * self.env.num_envs
@@ -291,6 +334,8 @@ class OnPolicyRunner:
         self.writer.add_scalar("Perf/total_fps", fps, locs["it"])
         self.writer.add_scalar("Perf/collection time", locs["collection_time"], locs["it"])
         self.writer.add_scalar("Perf/learning_time", locs["learn_time"], locs["it"])
+        for phase, phase_time in locs["phase_times"].items():
+            self.writer.add_scalar(f"Perf/{phase}_time", phase_time, locs["it"])
 
         # -- Training
         if len(locs["rewbuffer"]) > 0:
@@ -382,14 +427,17 @@ class OnPolicyRunner:
         if self.empirical_normalization:
             saved_dict["obs_norm_state_dict"] = self.obs_normalizer.state_dict()
             saved_dict["critic_obs_norm_state_dict"] = self.critic_obs_normalizer.state_dict()
-        torch.save(saved_dict, path)
+        self.checkpoint_writer.save(saved_dict, path, self.current_learning_iteration)
 
+    def _upload_checkpoint(self, path: str, iteration: int):
         # Upload model to external logging service
-        if self.logger_type in ["neptune", "wandb"]:
-            self.writer.save_model(path, self.current_learning_iteration)
+        if getattr(self, "logger_type", None) in ["neptune", "wandb"]:
+            self.writer.save_model(path, iteration)
 
     def load(self, path: str, load_optimizer: bool = True, pretrained: bool = False):
         loaded_dict = torch.load(path, weights_only=False)
+        # the folded inference actor-critic is made again from the loaded weights
+        self._folded_actor_critic = None
         # print("model_state_dict", loaded_dict["model_state_dict"].keys())
         # -- Load PPO model
         if not pretrained:
@@ -421,47 +469,51 @@ class OnPolicyRunner:
             self.current_learning_iteration = loaded_dict["iter"]
         return loaded_dict["infos"]
 
-    def get_inference_policy(self, device=None):
+    def get_inference_actor_critic(self, device=None):
+        """Returns the actor-critic for inference on raw observations.
+
+        With empirical normalization, the frozen statistics of the observation normalizer are folded into the input
+        layers of a copy of the actor (see :func:`fold_empirical_normalization`), so the inference does not need a
+        separate normalization step. The copy is made once and shared by all the inference getters until the weights
+        change with :meth:`load` or :meth:`learn`; it does not follow the updates of the training actor-critic.
+        """
         self.eval_mode()  # switch to evaluation mode (dropout for example)
+        return self._get_folded_actor_critic(device)
+
+    def _get_folded_actor_critic(self, device=None):
         if device is not None:
             self.alg.actor_critic.to(device)
-        policy = self.alg.actor_critic.act_inference
-        if self.cfg["empirical_normalization"]:
-            if device is not None:
-                self.obs_normalizer.to(device)
-            policy = lambda x: self.alg.actor_critic.act_inference(self.obs_normalizer(x))  # noqa: E731
-        return policy
+        if not self.empirical_normalization:
+            return self.alg.actor_critic
+        if device is not None:
+            self.obs_normalizer.to(device)
+        if self._folded_actor_critic is None:
+            self._folded_actor_critic = fold_empirical_normalization(self.alg.actor_critic, self.obs_normalizer)
+        elif device is not None:
+            self._folded_actor_critic.to(device)
+        return self._folded_actor_critic
+
+    def get_inference_policy(self, device=None):
+        return self.get_inference_actor_critic(device).act_inference
 
     def get_inference_encoder(self, device=None):
-        self.eval_mode()  # switch to evaluation mode (dropout for example)
-        if device is not None:
-            self.alg.actor_critic.to(device)
-        if hasattr(self.alg.actor_critic, 'act_encoder_inference') and callable(getattr(self.alg.actor_critic, 'act_encoder_inference')):
-            encoder = self.alg.actor_critic.act_encoder_inference
-            if self.cfg["empirical_normalization"]:
-                if device is not None:
-                    self.obs_normalizer.to(device)
-                encoder = lambda x: self.alg.actor_critic.act_encoder_inference(self.obs_normalizer(x))  # noqa: E731
-            return encoder
+        actor_critic = self.get_inference_actor_critic(device)
+        if hasattr(actor_critic, 'act_encoder_inference') and callable(getattr(actor_critic, 'act_encoder_inference')):
+            return actor_critic.act_encoder_inference
         else:
             return None
 
     def get_inference_backbone(self, device=None):
-        self.eval_mode()
-        if device is not None:
-            self.alg.actor_critic.to(device)
-        if hasattr(self.alg.actor_critic, 'act_backbone_inference') and callable(getattr(self.alg.actor_critic, 'act_backbone_inference')):
-            backbone = self.alg.actor_critic.act_backbone_inference
-            if self.cfg["empirical_normalization"]:
-                if device is not None:
-                    self.obs_normalizer.to(device)
-                backbone = lambda x, y: self.alg.actor_critic.act_backbone_inference(self.obs_normalizer(x), y)  # noqa: E731
-            return backbone
+        actor_critic = self.get_inference_actor_critic(device)
+        if hasattr(actor_critic, 'act_backbone_inference') and callable(getattr(actor_critic, 'act_backbone_inference')):
+            return actor_critic.act_backbone_inference
         else:
             return None
 
     def get_backbone_weights(self):
-        return self.alg.actor_critic.actor.state_dict()
+        # the backbone consumes raw observations, with the normalization folded into its first layer if used
+        # (without switching the runner to evaluation mode)
+        return self._get_folded_actor_critic().actor.state_dict()
 
     def train_mode(self):
         # -- PPO
@@ -0,0 +1,90 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Vectorized implementations of the generalized advantage estimation (GAE).
+
+GAE is the reverse recursion ``A_t = delta_t + c_t * A_{t+1}`` with the TD errors
+``delta_t = r_t + gamma * (1 - d_t) * V_{t+1} - V_t`` and the discounts ``c_t = gamma * lam * (1 - d_t)``.
+The TD errors and discounts are computed for all steps at once, only the recursion itself differs:
+
+* ``"scan"``: a TorchScript reverse scan with a single fused multiply-add per step.
+* ``"chunked"``: a discounted cumulative sum, evaluated for chunks of steps with a transfer matrix.
+"""
+
+from __future__ import annotations
+
+import torch
+
+GAE_METHODS = ("loop", "scan", "chunked")
+
+
+def compute_gae(
+    rewards: torch.Tensor,
+    values: torch.Tensor,
+    dones: torch.Tensor,
+    last_values: torch.Tensor,
+    gamma: float,
+    lam: float,
+    method: str = "scan",
+    chunk_size: int = 32,
+) -> torch.Tensor:
+    """Computes the advantages of a rollout.
+
+    Args:
+        rewards: The rewards with shape (num_steps, num_envs, 1).
+        values: The value estimates with shape (num_steps, num_envs, 1).
+        dones: The done flags with shape (num_steps, num_envs, 1).
+        last_values: The value estimates of the observations after the last step with shape (num_envs, 1).
+        gamma: The discount factor.
+        lam: The GAE lambda.
+        method: The recursion, either "scan" or "chunked".
+        chunk_size: The number of steps evaluated together by the "chunked" method.
+
+    Raises:
+        ValueError: When the method is unknown.
+
+    Returns:
+        The advantages with shape (num_steps, num_envs, 1).
+    """
+    next_is_not_terminal = 1.0 - dones.float()
+    next_values = torch.cat((values[1:], last_values.unsqueeze(0)), dim=0)
+    deltas = rewards + next_is_not_terminal * gamma * next_values - values
+    discounts = next_is_not_terminal * gamma * lam
+    if method == "scan":
+        return _reverse_scan(deltas, discounts)
+    elif method == "chunked":
+        return _chunked_discounted_cumsum(deltas, discounts, chunk_size)
+    raise ValueError(f"Unknown GAE method '{method}'. Should be one of {GAE_METHODS}.")
+
+
+@torch.jit.script
+def _reverse_scan(deltas: torch.Tensor, discounts: torch.Tensor) -> torch.Tensor:
+    advantages = torch.empty_like(deltas)
+    advantage = torch.zeros_like(deltas[0])
+    for step in range(deltas.shape[0] - 1, -1, -1):
+        advantage = deltas[step] + discounts[step] * advantage
+        advantages[step] = advantage
+    return advantages
+
+
+def _chunked_discounted_cumsum(deltas: torch.Tensor, discounts: torch.Tensor, chunk_size: int) -> torch.Tensor:
+    # within a chunk, A_t = sum_{j >= t} T[t, j] * delta_j + T[t, K-1] * c_{K-1} * A_K with the transfer matrix
+    # T[t, j] = prod_{i=t}^{j-1} c_i for j >= t (and 0 for j < t). The chunks are processed from the last one.
+    num_steps = deltas.shape[0]
+    advantages = torch.empty_like(deltas)
+    carry = torch.zeros_like(deltas[0])
+    for end in range(num_steps, 0, -chunk_size):
+        start = max(end - chunk_size, 0)
+        chunk_length = end - start
+        chunk_deltas, chunk_discounts = deltas[start:end], discounts[start:end]
+        step_idx = torch.arange(chunk_length, device=deltas.device)
+        upper = (step_idx.unsqueeze(1) < step_idx.unsqueeze(0)).view(chunk_length, chunk_length, *([1] * (deltas.dim() - 1)))
+        # factors[t, j] = c_{j-1} for j > t and 1 otherwise, their cumulative product over j gives T[t, j] for j >= t
+        shifted_discounts = torch.cat((torch.ones_like(chunk_discounts[:1]), chunk_discounts[:-1]), dim=0)
+        factors = torch.where(upper, shifted_discounts.unsqueeze(0), torch.ones_like(shifted_discounts).unsqueeze(0))
+        transfer = torch.cumprod(factors, dim=1) * (~upper).transpose(0, 1)
+        advantages[start:end] = (transfer * chunk_deltas.unsqueeze(0)).sum(dim=1) + transfer[:, -1] * chunk_discounts[-1] * carry
+        carry = advantages[start]
+    return advantages
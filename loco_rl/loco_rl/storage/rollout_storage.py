@@ -5,10 +5,19 @@
 
 from __future__ import annotations
 
+import math
 import torch
 
 from loco_rl.utils import split_and_pad_trajectories
 
+from .gae import compute_gae
+
+# storage dtypes of the observations and action distribution parameters, the other fields are float32
+# the actions stay float32: their old log-probabilities are computed from the unrounded actions, so rounding the stored
+# actions would bias the PPO ratio (by about 2% on average with bfloat16 at an action std of 0.1)
+STORAGE_DTYPES = {"float32": torch.float32, "bfloat16": torch.bfloat16, "float16": torch.float16}
+REDUCED_PRECISION_FIELDS = ("observations", "privileged_observations", "mu", "sigma")
+
 
 class RolloutStorage:
     class Transition:
@@ -28,6 +37,20 @@ class RolloutStorage:
         def clear(self):
             self.__init__()
 
+    class TrajectoryIndex:
+        """Split trajectories of a rollout, shared by all epochs of the recurrent mini-batch generator."""
+
+        def __init__(self):
+            self.observations = None
+            self.critic_observations = None
+            self.rnd_state = None
+            self.masks = None
+            # offsets of the first trajectory of each environment, with shape (num_envs + 1,)
+            self.env_trajectory_offsets = None
+            # hidden states at the start of each trajectory, with shape [num trajectories, num layers, hidden dim]
+            self.hidden_states_a = None
+            self.hidden_states_c = None
+
     def __init__(
         self,
         num_envs,
@@ -37,6 +60,8 @@ class RolloutStorage:
         actions_shape,
         rnd_state_shape=None,
         device="cpu",
+        packed=False,
+        storage_dtype="float32",
     ):
         # store inputs
         self.device = device
@@ -47,36 +72,89 @@ class RolloutStorage:
         self.rnd_state_shape = rnd_state_shape
         self.actions_shape = actions_shape
 
+        # Storage dtype policy: the fields are converted when they are written and when mini-batches are read
+        if storage_dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown storage dtype '{storage_dtype}'. Should be one of {list(STORAGE_DTYPES)}.")
+        self.storage_dtype = STORAGE_DTYPES[storage_dtype]
+
+        # Packed layout: the fields sampled by the mini-batch generator are column ranges of a single buffer per dtype
+        self.packed = packed
+        self.packed_fields: dict[str, tuple[torch.dtype, slice, tuple]] = {}
+        self.packed_transitions: dict[torch.dtype, torch.Tensor] = {}
+        if packed:
+            self._init_packed_buffer()
+
         # Core
-        self.observations = torch.zeros(num_transitions_per_env, num_envs, *obs_shape, device=self.device)
+        self.observations = self._zeros("observations", obs_shape)
         if privileged_obs_shape is not None:
-            self.privileged_observations = torch.zeros(
-                num_transitions_per_env, num_envs, *privileged_obs_shape, device=self.device
-            )
+            self.privileged_observations = self._zeros("privileged_observations", privileged_obs_shape)
         else:
             self.privileged_observations = None
         self.rewards = torch.zeros(num_transitions_per_env, num_envs, 1, device=self.device)
-        self.actions = torch.zeros(num_transitions_per_env, num_envs, *actions_shape, device=self.device)
+        self.actions = self._zeros("actions", actions_shape)
         self.dones = torch.zeros(num_transitions_per_env, num_envs, 1, device=self.device).byte()
 
         # For PPO
-        self.actions_log_prob = torch.zeros(num_transitions_per_env, num_envs, 1, device=self.device)
-        self.values = torch.zeros(num_transitions_per_env, num_envs, 1, device=self.device)
-        self.returns = torch.zeros(num_transitions_per_env, num_envs, 1, device=self.device)
-        self.advantages = torch.zeros(num_transitions_per_env, num_envs, 1, device=self.device)
-        self.mu = torch.zeros(num_transitions_per_env, num_envs, *actions_shape, device=self.device)
-        self.sigma = torch.zeros(num_transitions_per_env, num_envs, *actions_shape, device=self.device)
+        self.actions_log_prob = self._zeros("actions_log_prob", [1])
+        self.values = self._zeros("values", [1])
+        self.returns = self._zeros("returns", [1])
+        self.advantages = self._zeros("advantages", [1])
+        self.mu = self._zeros("mu", actions_shape)
+        self.sigma = self._zeros("sigma", actions_shape)
 
         # For RND
         if rnd_state_shape is not None:
-            self.rnd_state = torch.zeros(num_transitions_per_env, num_envs, *rnd_state_shape, device=self.device)
+            self.rnd_state = self._zeros("rnd_state", rnd_state_shape)
 
         # For RNN networks
         self.saved_hidden_states_a = None
         self.saved_hidden_states_c = None
+        self.trajectory_index = None
         # counter for the number of transitions stored
         self.step = 0
 
+    def _init_packed_buffer(self):
+        fields = [("observations", self.obs_shape)]
+        if self.privileged_obs_shape is not None:
+            fields.append(("privileged_observations", self.privileged_obs_shape))
+        fields += [
+            ("actions", self.actions_shape),
+            ("values", [1]),
+            ("returns", [1]),
+            ("actions_log_prob", [1]),
+            ("advantages", [1]),
+            ("mu", self.actions_shape),
+            ("sigma", self.actions_shape),
+        ]
+        if self.rnd_state_shape is not None:
+            fields.append(("rnd_state", self.rnd_state_shape))
+        offsets = {}
+        for name, shape in fields:
+            dtype = self._field_dtype(name)
+            offset, size = offsets.get(dtype, 0), math.prod(shape)
+            self.packed_fields[name] = (dtype, slice(offset, offset + size), tuple(shape))
+            offsets[dtype] = offset + size
+        for dtype, num_columns in offsets.items():
+            self.packed_transitions[dtype] = torch.zeros(
+                self.num_transitions_per_env, self.num_envs, num_columns, dtype=dtype, device=self.device
+            )
+
+    def _field_dtype(self, name):
+        return self.storage_dtype if name in REDUCED_PRECISION_FIELDS else torch.float32
+
+    def _zeros(self, name, shape):
+        if name in self.packed_fields:
+            # view of the packed buffer with shape [time, num_envs, *shape]
+            dtype, columns, shape = self.packed_fields[name]
+            return self.packed_transitions[dtype][..., columns].unflatten(-1, shape)
+        return torch.zeros(
+            self.num_transitions_per_env, self.num_envs, *shape, dtype=self._field_dtype(name), device=self.device
+        )
+
+    def _unpack(self, packed_batches, name):
+        dtype, columns, shape = self.packed_fields[name]
+        return packed_batches[dtype][:, columns].unflatten(-1, shape).float()
+
     def add_transitions(self, transition: Transition):
         # check if the transition is valid
         if self.step >= self.num_transitions_per_env:
@@ -148,8 +226,21 @@ class RolloutStorage:
 
     def clear(self):
         self.step = 0
+        self.trajectory_index = None
+
+    def compute_returns(
+        self, last_values, gamma, lam, normalize_advantage: bool = True, method: str = "loop", chunk_size: int = 32
+    ):
+        # vectorized GAE, numerically equivalent to the loop below up to floating point rounding
+        if method != "loop":
+            advantages = compute_gae(
+                self.rewards, self.values, self.dones, last_values, gamma, lam, method=method, chunk_size=chunk_size
+            )
+            self.returns.copy_(advantages + self.values)
+            self._normalize_advantages(normalize_advantage)
+            self._build_trajectory_index_if_recurrent()
+            return
 
-    def compute_returns(self, last_values, gamma, lam, normalize_advantage: bool = True):
         advantage = 0
         for step in reversed(range(self.num_transitions_per_env)):
             # if we are at the last step, bootstrap the return value
@@ -166,12 +257,56 @@ class RolloutStorage:
             # Return: R_t = A(s_t, a_t) + V(s_t)
             self.returns[step] = advantage + self.values[step]
 
-        # Compute the advantages
-        self.advantages = self.returns - self.values
+        self._normalize_advantages(normalize_advantage)
+        self._build_trajectory_index_if_recurrent()
+
+    def _normalize_advantages(self, normalize_advantage: bool):
+        # Compute the advantages (in place, the advantages may be a view of the packed buffer)
+        torch.sub(self.returns, self.values, out=self.advantages)
         # Normalize the advantages if flag is set
         # This is to prevent double normalization (i.e. if per minibatch normalization is used)
         if normalize_advantage:
-            self.advantages = (self.advantages - self.advantages.mean()) / (self.advantages.std() + 1e-8)
+            self.advantages.sub_(self.advantages.mean()).div_(self.advantages.std() + 1e-8)
+
+    def _build_trajectory_index_if_recurrent(self):
+        if self.saved_hidden_states_a is not None:
+            self.build_trajectory_index()
+
+    def build_trajectory_index(self):
+        """Splits the trajectories of the rollout once, so that all epochs of the recurrent updates reuse them."""
+        index = RolloutStorage.TrajectoryIndex()
+        index.observations, index.masks = split_and_pad_trajectories(self.observations.float(), self.dones)
+        if self.privileged_observations is not None:
+            index.critic_observations, _ = split_and_pad_trajectories(
+                self.privileged_observations.float(), self.dones
+            )
+        else:
+            index.critic_observations = index.observations
+        if self.rnd_state_shape is not None:
+            index.rnd_state, _ = split_and_pad_trajectories(self.rnd_state, self.dones)
+
+        # a trajectory starts at the first step and after each done
+        last_was_done = torch.zeros_like(self.dones.squeeze(-1), dtype=torch.bool)
+        last_was_done[1:] = self.dones[:-1].squeeze(-1)
+        last_was_done[0] = True
+        num_trajectories_per_env = last_was_done.sum(dim=0)
+        index.env_trajectory_offsets = torch.cat(
+            (num_trajectories_per_env.new_zeros(1), torch.cumsum(num_trajectories_per_env, dim=0))
+        ).tolist()
+
+        # reshape to [num_envs, time, num layers, hidden dim] (original shape: [time, num_layers, num_envs, hidden_dim])
+        # then take only time steps after dones (flattens num envs and time dimensions)
+        last_was_done = last_was_done.permute(1, 0)
+        index.hidden_states_a = [
+            saved_hidden_states.permute(2, 0, 1, 3)[last_was_done] for saved_hidden_states in self.saved_hidden_states_a
+        ]
+        if self.saved_hidden_states_c is not None:
+            index.hidden_states_c = [
+                saved_hidden_states.permute(2, 0, 1, 3)[last_was_done]
+                for saved_hidden_states in self.saved_hidden_states_c
+            ]
+        self.trajectory_index = index
+        return index
 
     def get_statistics(self):
         done = self.dones
@@ -209,6 +344,9 @@ class RolloutStorage:
         if self.rnd_state_shape is not None:
             rnd_state = self.rnd_state.flatten(0, 1)
 
+        if self.packed:
+            packed_transitions = {dtype: buffer.flatten(0, 1) for dtype, buffer in self.packed_transitions.items()}
+
         for epoch in range(num_epochs):
             for i in range(num_mini_batches):
                 # Select the indices for the mini-batch
@@ -216,19 +354,47 @@ class RolloutStorage:
                 end = (i + 1) * mini_batch_size
                 batch_idx = indices[start:end]
 
+                if self.packed:
+                    # a single gather for all fields (per storage dtype), the fields of the mini-batch are views of it
+                    packed_batch = {
+                        dtype: buffer.index_select(0, batch_idx) for dtype, buffer in packed_transitions.items()
+                    }
+                    obs_batch = self._unpack(packed_batch, "observations")
+                    if self.privileged_observations is not None:
+                        critic_observations_batch = self._unpack(packed_batch, "privileged_observations")
+                    else:
+                        critic_observations_batch = obs_batch
+                    actions_batch = self._unpack(packed_batch, "actions")
+                    target_values_batch = self._unpack(packed_batch, "values")
+                    returns_batch = self._unpack(packed_batch, "returns")
+                    old_actions_log_prob_batch = self._unpack(packed_batch, "actions_log_prob")
+                    advantages_batch = self._unpack(packed_batch, "advantages")
+                    old_mu_batch = self._unpack(packed_batch, "mu")
+                    old_sigma_batch = self._unpack(packed_batch, "sigma")
+                    if self.rnd_state_shape is not None:
+                        rnd_state_batch = self._unpack(packed_batch, "rnd_state")
+                    else:
+                        rnd_state_batch = None
+
+                    yield obs_batch, critic_observations_batch, actions_batch, target_values_batch, advantages_batch, returns_batch, old_actions_log_prob_batch, old_mu_batch, old_sigma_batch, (
+                        None,
+                        None,
+                    ), None, rnd_state_batch
+                    continue
+
                 # Create the mini-batch
                 # -- Core
-                obs_batch = observations[batch_idx]
-                critic_observations_batch = critic_observations[batch_idx]
-                actions_batch = actions[batch_idx]
+                obs_batch = observations[batch_idx].float()
+                critic_observations_batch = critic_observations[batch_idx].float()
+                actions_batch = actions[batch_idx].float()
 
                 # -- For PPO
                 target_values_batch = values[batch_idx]
                 returns_batch = returns[batch_idx]
                 old_actions_log_prob_batch = old_actions_log_prob[batch_idx]
                 advantages_batch = advantages[batch_idx]
-                old_mu_batch = old_mu[batch_idx]
-                old_sigma_batch = old_sigma[batch_idx]
+                old_mu_batch = old_mu[batch_idx].float()
+                old_sigma_batch = old_sigma[batch_idx].float()
 
                 # -- For RND
                 if self.rnd_state_shape is not None:
@@ -244,69 +410,48 @@ class RolloutStorage:
 
     # for RNNs only
     def recurrent_mini_batch_generator(self, num_mini_batches, num_epochs=8):
-        padded_obs_trajectories, trajectory_masks = split_and_pad_trajectories(self.observations, self.dones)
-        if self.privileged_observations is not None:
-            padded_critic_obs_trajectories, _ = split_and_pad_trajectories(self.privileged_observations, self.dones)
-        else:
-            padded_critic_obs_trajectories = padded_obs_trajectories
-
-        if self.rnd_state_shape is not None:
-            padded_rnd_state_trajectories, _ = split_and_pad_trajectories(self.rnd_state, self.dones)
-        else:
-            padded_rnd_state_trajectories = None
+        # the trajectories only depend on the rollout, they are split once after computing the returns
+        index = self.trajectory_index if self.trajectory_index is not None else self.build_trajectory_index()
 
         mini_batch_size = self.num_envs // num_mini_batches
         for ep in range(num_epochs):
-            first_traj = 0
             for i in range(num_mini_batches):
                 start = i * mini_batch_size
                 stop = (i + 1) * mini_batch_size
+                first_traj = index.env_trajectory_offsets[start]
+                last_traj = index.env_trajectory_offsets[stop]
 
-                dones = self.dones.squeeze(-1)
-                last_was_done = torch.zeros_like(dones, dtype=torch.bool)
-                last_was_done[1:] = dones[:-1]
-                last_was_done[0] = True
-                trajectories_batch_size = torch.sum(last_was_done[:, start:stop])
-                last_traj = first_traj + trajectories_batch_size
+                masks_batch = index.masks[:, first_traj:last_traj]
+                obs_batch = index.observations[:, first_traj:last_traj]
+                critic_obs_batch = index.critic_observations[:, first_traj:last_traj]
 
-                masks_batch = trajectory_masks[:, first_traj:last_traj]
-                obs_batch = padded_obs_trajectories[:, first_traj:last_traj]
-                critic_obs_batch = padded_critic_obs_trajectories[:, first_traj:last_traj]
-
-                if padded_rnd_state_trajectories is not None:
-                    rnd_state_batch = padded_rnd_state_trajectories[:, first_traj:last_traj]
+                if index.rnd_state is not None:
+                    rnd_state_batch = index.rnd_state[:, first_traj:last_traj]
                 else:
                     rnd_state_batch = None
 
-                actions_batch = self.actions[:, start:stop]
-                old_mu_batch = self.mu[:, start:stop]
-                old_sigma_batch = self.sigma[:, start:stop]
+                actions_batch = self.actions[:, start:stop].float()
+                old_mu_batch = self.mu[:, start:stop].float()
+                old_sigma_batch = self.sigma[:, start:stop].float()
                 returns_batch = self.returns[:, start:stop]
                 advantages_batch = self.advantages[:, start:stop]
                 values_batch = self.values[:, start:stop]
                 old_actions_log_prob_batch = self.actions_log_prob[:, start:stop]
 
-                # reshape to [num_envs, time, num layers, hidden dim] (original shape: [time, num_layers, num_envs, hidden_dim])
-                # then take only time steps after dones (flattens num envs and time dimensions),
-                # take a batch of trajectories and finally reshape back to [num_layers, batch, hidden_dim]
-                last_was_done = last_was_done.permute(1, 0)
+                # take a batch of trajectories and reshape back to [num_layers, batch, hidden_dim]
                 hid_a_batch = [
-                    saved_hidden_states.permute(2, 0, 1, 3)[last_was_done][first_traj:last_traj]
-                    .transpose(1, 0)
-                    .contiguous()
-                    for saved_hidden_states in self.saved_hidden_states_a
+                    hidden_states[first_traj:last_traj].transpose(1, 0).contiguous()
+                    for hidden_states in index.hidden_states_a
                 ]
                 # remove the tuple for GRU
                 hid_a_batch = hid_a_batch[0] if len(hid_a_batch) == 1 else hid_a_batch
 
-                if self.saved_hidden_states_c is None:
+                if index.hidden_states_c is None:
                     hid_c_batch = None
                 else:
                     hid_c_batch = [
-                        saved_hidden_states.permute(2, 0, 1, 3)[last_was_done][first_traj:last_traj]
-                        .transpose(1, 0)
-                        .contiguous()
-                        for saved_hidden_states in self.saved_hidden_states_c
+                        hidden_states[first_traj:last_traj].transpose(1, 0).contiguous()
+                        for hidden_states in index.hidden_states_c
                     ]
                     hid_c_batch = hid_c_batch[0] if len(hid_c_batch) == 1 else hid_c_batch
 
@@ -314,5 +459,3 @@ class RolloutStorage:
                     hid_a_batch,
                     hid_c_batch,
                 ), masks_batch, rnd_state_batch
-
-                first_traj = last_traj
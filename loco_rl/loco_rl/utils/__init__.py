@@ -5,7 +5,11 @@
 
 """Helper functions."""
 
+from .checkpoint_writer import CheckpointWriter
+from .episode_statistics import EpisodeStatistics
+from .profiling import PhaseTimer, ProfilerWindow
 from .utils import (
+    apply_on_valid_steps,
     resolve_nn_activation,
     split_and_pad_trajectories,
     store_code_state,
@@ -0,0 +1,126 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import torch
+from typing import Any, Callable
+
+
+class CheckpointWriter:
+    """Writes checkpoints in a background thread and applies a retention policy.
+
+    :meth:`save` only snapshots the tensors of the checkpoint to (pinned) CPU memory; the serialization runs in a worker
+    thread. Files are written to a temporary path and renamed, so a checkpoint on disk is always complete. The optional
+    upload and the retention of the checkpoints whose write has completed run in the calling thread, at the next
+    :meth:`save` or :meth:`wait`.
+
+    Retention: with ``keep_last > 0``, only the ``keep_last`` most recent checkpoints written by this writer are kept,
+    besides those whose iteration is a multiple of ``keep_every`` (if ``keep_every > 0``). Files not written by this
+    writer (e.g. the checkpoints of a resumed run) are never deleted.
+
+    The worker thread is only started with the first :meth:`save`, so runners that never save (e.g. to load a policy
+    for inference) do not start a thread.
+    """
+
+    def __init__(
+        self,
+        async_write: bool = True,
+        keep_last: int = 0,
+        keep_every: int = 0,
+        upload_fn: Callable[[str, int], None] | None = None,
+    ):
+        self.async_write = async_write
+        self.keep_last = keep_last
+        self.keep_every = keep_every
+        self.upload_fn = upload_fn
+        self._pin_memory = torch.cuda.is_available()
+        self._saved: list[tuple[int, str]] = []
+        self._errors: list[BaseException] = []
+        self._queue: queue.Queue = queue.Queue()
+        # (path, iteration) of the checkpoints written by the worker, not yet uploaded
+        self._written: queue.Queue = queue.Queue()
+        self._worker = None
+
+    def save(self, checkpoint: dict, path: str, iteration: int):
+        """Snapshots the checkpoint and writes it to ``path`` (in the background if asynchronous)."""
+        self._raise_errors()
+        self._finish_written()
+        if not self.async_write:
+            self._write(checkpoint, path, iteration)
+            self._finish_written()
+            return
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, name="checkpoint_writer", daemon=True)
+            self._worker.start()
+        snapshot = self._snapshot(checkpoint)
+        # the copies to pinned memory are asynchronous
+        if self._pin_memory:
+            torch.cuda.synchronize()
+        self._queue.put((snapshot, path, iteration))
+
+    def wait(self):
+        """Blocks until all pending checkpoints are written, then uploads them and applies the retention."""
+        if self.async_write:
+            self._queue.join()
+        self._raise_errors()
+        self._finish_written()
+
+    def _work(self):
+        while True:
+            checkpoint, path, iteration = self._queue.get()
+            try:
+                self._write(checkpoint, path, iteration)
+            except BaseException as error:
+                self._errors.append(error)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, checkpoint: dict, path: str, iteration: int):
+        tmp_path = path + ".tmp"
+        torch.save(checkpoint, tmp_path)
+        os.replace(tmp_path, path)
+        self._written.put((path, iteration))
+
+    def _finish_written(self):
+        # uploads the completed checkpoints in the order they were written, then applies the retention
+        while not self._written.empty():
+            path, iteration = self._written.get()
+            if self.upload_fn is not None:
+                self.upload_fn(path, iteration)
+            self._apply_retention(path, iteration)
+
+    def _apply_retention(self, path: str, iteration: int):
+        self._saved = [(it, p) for it, p in self._saved if p != path] + [(iteration, path)]
+        if self.keep_last <= 0:
+            return
+        kept = []
+        for index, (it, p) in enumerate(self._saved):
+            recent = index >= len(self._saved) - self.keep_last
+            milestone = self.keep_every > 0 and it % self.keep_every == 0
+            if recent or milestone:
+                kept.append((it, p))
+            elif os.path.exists(p):
+                os.remove(p)
+        self._saved = kept
+
+    def _snapshot(self, obj: Any) -> Any:
+        if isinstance(obj, torch.Tensor):
+            copy = torch.empty(obj.shape, dtype=obj.dtype, pin_memory=self._pin_memory)
+            copy.copy_(obj.detach(), non_blocking=self._pin_memory)
+            return copy
+        elif isinstance(obj, dict):
+            return type(obj)((key, self._snapshot(value)) for key, value in obj.items())
+        elif isinstance(obj, (list, tuple)):
+            return type(obj)(self._snapshot(value) for value in obj)
+        return obj
+
+    def _raise_errors(self):
+        if self._errors:
+            error = self._errors.pop(0)
+            raise RuntimeError("Writing a checkpoint failed.") from error
@@ -0,0 +1,68 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+from __future__ import annotations
+
+import torch
+
+
+class EpisodeStatistics:
+    """Device-side accumulator of the returns and lengths of the completed episodes.
+
+    The running sums of each quantity and the episode lengths are kept per environment. When episodes end, their sums
+    and lengths are scattered into fixed-size rings of the most recent ``buffer_size`` episodes (like a
+    ``deque(maxlen=buffer_size)``). The environments that are not done, and the finished episodes beyond the last
+    ``buffer_size`` ones of a step, write into an extra trash slot, so that :meth:`step` needs no data-dependent shapes
+    and never synchronizes with the host. :meth:`flush` copies the rings to the host once per iteration.
+    """
+
+    def __init__(self, num_envs: int, names: list[str], buffer_size: int = 100, device: str = "cpu"):
+        self.names = list(names)
+        self.buffer_size = buffer_size
+        self.device = device
+        self.sums = {name: torch.zeros(num_envs, dtype=torch.float, device=device) for name in self.names}
+        self.lengths = torch.zeros(num_envs, dtype=torch.float, device=device)
+        # the last slot of each ring is the trash slot
+        self.rings = {name: torch.zeros(buffer_size + 1, dtype=torch.float, device=device) for name in self.names}
+        self.length_ring = torch.zeros(buffer_size + 1, dtype=torch.float, device=device)
+        self.num_completed = torch.zeros((), dtype=torch.long, device=device)
+
+    def step(self, values: dict[str, torch.Tensor], dones: torch.Tensor):
+        """Adds the values of one environment step and records the episodes that end with it.
+
+        Args:
+            values: The value of each quantity per environment, e.g. the rewards, with shape (num_envs,).
+            dones: The done flags with shape (num_envs,).
+        """
+        for name in self.names:
+            self.sums[name] += values[name].view(-1)
+        self.lengths += 1
+        done_mask = dones.view(-1) > 0
+        done_count = done_mask.long()
+        # consecutive ring positions for the finished episodes, the trash slot for the others. When more than
+        # buffer_size episodes end at once, only the last buffer_size of them are kept, so that each ring slot has a
+        # single writer (scatter_ does not define which of several writers to the same index wins)
+        ranks = torch.cumsum(done_count, dim=0) - 1
+        kept = done_mask & (ranks >= ranks[-1] + 1 - self.buffer_size)
+        positions = torch.where(kept, (self.num_completed + ranks) % self.buffer_size, self.buffer_size)
+        for name in self.names:
+            self.rings[name].scatter_(0, positions, self.sums[name])
+            self.sums[name].masked_fill_(done_mask, 0.0)
+        self.length_ring.scatter_(0, positions, self.lengths)
+        self.lengths.masked_fill_(done_mask, 0.0)
+        self.num_completed += done_count.sum()
+
+    def flush(self) -> dict[str, list[float]]:
+        """Copies the rings to the host.
+
+        Returns:
+            The values of the most recent completed episodes for each quantity and for ``"length"``. The lists are
+            empty as long as no episode has been completed.
+        """
+        rings = torch.stack([self.rings[name] for name in self.names] + [self.length_ring])[:, : self.buffer_size]
+        rings, num_completed = rings.cpu(), int(self.num_completed.item())
+        num_valid = min(num_completed, self.buffer_size)
+        values = rings[:, :num_valid].tolist()
+        return dict(zip(self.names + ["length"], values))
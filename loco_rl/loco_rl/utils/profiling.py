@@ -0,0 +1,119 @@
+# Copyright (c) 2021-2025, ETH Zurich and NVIDIA CORPORATION
+# All rights reserved.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+from __future__ import annotations
+
+import contextlib
+import os
+import time
+import torch
+from collections import defaultdict
+
+
+class PhaseTimer:
+    """Accumulates the time spent in named phases of a training iteration.
+
+    Two timing modes are supported:
+
+    * ``"cuda_event"``: CUDA events are recorded around each phase and resolved once per iteration in
+      :meth:`summary`, so the phases themselves do not synchronize the device.
+    * ``"perf_counter"``: the device is synchronized at both ends of each phase and the wall-clock time is measured.
+      This attributes asynchronous GPU work exactly to its phase at the cost of the synchronizations.
+
+    When disabled, :meth:`phase` returns a shared no-op context manager.
+    """
+
+    def __init__(self, enabled: bool = False, device: str = "cpu", mode: str = "cuda_event"):
+        if mode not in ("cuda_event", "perf_counter"):
+            raise ValueError(f"Unknown timer mode '{mode}'. Should be 'cuda_event' or 'perf_counter'.")
+        self.enabled = enabled
+        self.device = device
+        self.use_cuda = "cuda" in str(device) and torch.cuda.is_available()
+        # CUDA events only measure the device when it is used
+        self.mode = mode if self.use_cuda else "perf_counter"
+        self._null_context = contextlib.nullcontext()
+        self._events: dict[str, list[tuple[torch.cuda.Event, torch.cuda.Event]]] = defaultdict(list)
+        self._times: dict[str, float] = defaultdict(float)
+
+    def phase(self, name: str):
+        """Returns a context manager timing the enclosed code as the phase ``name``."""
+        if not self.enabled:
+            return self._null_context
+        return self._cuda_event_phase(name) if self.mode == "cuda_event" else self._perf_counter_phase(name)
+
+    @contextlib.contextmanager
+    def _cuda_event_phase(self, name: str):
+        start, end = torch.cuda.Event(enable_timing=True), torch.cuda.Event(enable_timing=True)
+        start.record()
+        yield
+        end.record()
+        self._events[name].append((start, end))
+
+    @contextlib.contextmanager
+    def _perf_counter_phase(self, name: str):
+        self._synchronize()
+        start = time.perf_counter()
+        yield
+        self._synchronize()
+        self._times[name] += time.perf_counter() - start
+
+    def summary(self) -> dict[str, float]:
+        """Returns the accumulated time of each phase in seconds and resets the timer."""
+        if not self.enabled:
+            return {}
+        if self._events:
+            self._synchronize()
+            for name, events in self._events.items():
+                self._times[name] += sum(start.elapsed_time(end) for start, end in events) * 1e-3
+        times = dict(self._times)
+        self._events.clear()
+        self._times.clear()
+        return times
+
+    def _synchronize(self):
+        if self.use_cuda:
+            torch.cuda.synchronize(self.device)
+
+
+class ProfilerWindow:
+    """Captures a :mod:`torch.profiler` trace for a window of training iterations.
+
+    The trace of the iterations ``[start_iteration, start_iteration + num_iterations)`` is written to ``log_dir`` in the
+    TensorBoard format. :meth:`step` has to be called at the start of every iteration, before it begins, and
+    :meth:`stop` when training ends (also if it is interrupted) to write the trace of a window that is still open.
+    """
+
+    def __init__(self, log_dir: str | None, start_iteration: int | None = None, num_iterations: int = 3):
+        self.enabled = start_iteration is not None and log_dir is not None
+        self.start_iteration = start_iteration
+        self.stop_iteration = start_iteration + num_iterations if start_iteration is not None else None
+        self.log_dir = log_dir
+        self._profiler = None
+
+    def step(self, iteration: int):
+        """Starts or stops the capture after the iteration ``iteration - 1``, before ``iteration`` begins."""
+        if not self.enabled:
+            return
+        if iteration == self.start_iteration and self._profiler is None:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self._profiler = torch.profiler.profile(
+                activities=activities,
+                on_trace_ready=torch.profiler.tensorboard_trace_handler(os.path.join(self.log_dir, "profiler")),
+                record_shapes=True,
+                with_stack=True,
+            )
+            self._profiler.start()
+            print(f"[INFO] Profiling iterations {self.start_iteration} to {self.stop_iteration - 1}.")
+        elif iteration == self.stop_iteration and self._profiler is not None:
+            self.stop()
+
+    def stop(self):
+        """Stops the capture and writes the trace."""
+        if self._profiler is not None:
+            self._profiler.stop()
+            self._profiler = None
+            print(f"[INFO] Profiler trace saved in: {os.path.join(self.log_dir, 'profiler')}")
@@ -83,6 +83,18 @@ def unpad_trajectories(trajectories, masks):
     )
 
 
+def apply_on_valid_steps(func: Callable, padded_input: torch.Tensor, masks: torch.Tensor) -> torch.Tensor:
+    """Applies a step-wise function only to the valid steps of padded trajectories.
+
+    The input has the dimension order [time, number of trajectories, additional dimensions] and ``masks`` marks the
+    valid steps with shape [time, number of trajectories]. The outputs of the padded steps are filled with zeros.
+    """
+    valid_output = func(padded_input[masks])
+    output = valid_output.new_zeros(*masks.shape, *valid_output.shape[1:])
+    output[masks] = valid_output
+    return output
+
+
 def store_code_state(logdir, repositories) -> list:
     git_log_dir = os.path.join(logdir, "git")
     os.makedirs(git_log_dir, exist_ok=True)
@@ -39,6 +39,7 @@ class DistillationCfg:
     log_root_path: str = "logs/distillation"
     experiment_name: str = "object"
     log_dir: str = "specify_log_dir"
+    resume_distill: bool = False  # continue the run in log_dir_distill (reusing its on-disk dataset, requires dataset_on_disk)
     log_dir_distill: str = "specify_log_dir_distill"
     checkpoint_distill: str = "specify_checkpoint_distill"
     logger = "wandb"
@@ -53,6 +54,15 @@ class DistillationCfg:
     incremental_epoches: int = 500
     final_epoches: int = 0
     batch_steps: int = 20000
+    length_bucketing: bool = False  # group trajectories of similar lengths into the same batch to reduce padding
+    bucket_window: int = 32  # number of batches whose trajectories are sorted by length together
+    packed_sequence: bool = False  # skip the padded steps of the trajectories in the student networks during training
+    dataset_on_disk: bool = False  # store the aggregated dataset as memory-mapped shards in the log dir
+    dataset_capacity_steps: int = 0  # maximum number of steps kept in the on-disk dataset, 0: keep all
+    dataset_eviction: str = "fifo"  # "fifo", "keep_bc" or "disagreement", applied when the capacity is exceeded
+    pipelined: bool = False  # collect the data of the next iteration while the student is trained on the current one
+    pipeline_staleness: int = 1  # iterations the collection student may lag behind, 0: wait for the latest student
+    pipeline_queue_size: int = 1  # collected shards waiting for the trainer before the collection blocks
     distill_lr = 5.0e-4
     # final_lr = 5.0e-4
     # fix_lr_steps = 30000
@@ -67,6 +77,17 @@ class DistillationCfg:
     # tactile signal
     min_delay: int = 1
     max_delay: int = 2
+    # storage of the tactile signals in the replay buffer, must match the tactile observation (checked on the first signals):
+    # "binary_shared": bit-packed binary maps with identical channels (BinaryTactileSignals), "binary": bit-packed binary maps,
+    # "levels": uint8 levels of maps discretized into tactile_storage_levels levels (DiscreteTactileSignals), "float": verbatim
+    tactile_storage: str = "binary_shared"
+    tactile_storage_levels: int = 20  # total_levels of DiscreteTactileSignals
+
+    # play: record the maps of the per-taxel contact sensors (tasks with tactile sensors) to tactile_maps.pt in log_dir_distill,
+    # the recording is read by locotouch/scripts/evaluate_tactile_surrogate.py
+    record_tactile_maps: bool = False
+    tactile_maps_steps: int = 500
+    tactile_maps_envs: int = 16
 
     # ros topics for visualization
     policy_tactile_topic: str = "/policy_tactile_signal"
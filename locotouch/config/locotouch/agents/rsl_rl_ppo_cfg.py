@@ -1,5 +1,25 @@
 from isaaclab.utils import configclass
-from isaaclab_rl.rsl_rl import RslRlOnPolicyRunnerCfg, RslRlPpoActorCriticCfg, RslRlPpoAlgorithmCfg
+from isaaclab_rl.rsl_rl import RslRlOnPolicyRunnerCfg, RslRlPpoActorCriticCfg, RslRlPpoAlgorithmCfg, RslRlSymmetryCfg
+
+
+@configclass
+class LocoRlPpoAlgorithmCfg(RslRlPpoAlgorithmCfg):
+    # options of the loco_rl PPO that are not part of the rsl_rl configuration
+    gae_method: str = "loop"  # "loop", "scan" (TorchScript reverse scan) or "chunked" (chunked discounted cumsum)
+    gae_chunk_size: int = 32  # steps per chunk of the "chunked" GAE
+    packed_storage: bool = False  # rollout fields in one buffer, gathered with a single index_select per mini-batch
+    storage_dtype: str = "float32"  # "float32", "bfloat16" or "float16" for the stored observations and mu/sigma
+    mixed_precision: bool = False  # autocast the forward passes of the update
+    mixed_precision_dtype: str = "bfloat16"  # "bfloat16" or "float16" (with loss scaling), always bfloat16 on the CPU
+
+
+@configclass
+class LocoTouchSymmetryCfg(RslRlSymmetryCfg):
+    # left-right mirroring of the observations and actions, set algorithm.symmetry_cfg = LocoTouchSymmetryCfg() to use it
+    use_data_augmentation: bool = True  # doubles the samples of each mini-batch with their mirrored copies
+    use_mirror_loss: bool = False
+    data_augmentation_func: str = "locotouch.mdp.symmetry:compute_symmetric_states"
+    mirror_loss_coeff: float = 0.0
 
 
 @configclass
@@ -8,13 +28,22 @@ class LocomotionPPORunnerCfg(RslRlOnPolicyRunnerCfg):
     max_iterations = 30000
     save_interval = 50
     empirical_normalization = False
+    # opt-in profiling of the runner: Perf/<phase>_time scalars and a torch.profiler trace of an iteration window
+    profile_phases = False
+    profile_timer = "cuda_event"  # "cuda_event" or "perf_counter" (synchronizes the device around every phase)
+    profiler_start_iteration = None
+    profiler_num_iterations = 3
+    # checkpoints are written in a background thread, keep_last_checkpoints=0 keeps all of them
+    async_checkpoint = True
+    keep_last_checkpoints = 0
+    keep_every_checkpoints = 0  # checkpoints of iterations that are multiples of this are never removed
     policy = RslRlPpoActorCriticCfg(
         actor_hidden_dims=[512, 256, 128],
         critic_hidden_dims=[512, 256, 128],
         activation="elu",
         init_noise_std=1.0,
     )
-    algorithm = RslRlPpoAlgorithmCfg(
+    algorithm = LocoRlPpoAlgorithmCfg(
         value_loss_coef=1.0,
         use_clipped_value_loss=True,
         clip_param=0.2,
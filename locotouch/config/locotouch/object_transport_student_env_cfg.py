@@ -34,6 +34,7 @@ class NoisyTactileCfg(ObservationGroupCfg):
         "add_level_noise": True,
         "level_n_min": -1,
         "level_n_max": 1,
+        "single_rotation": True,
         },
         scale=1.0,
         )
@@ -171,13 +172,39 @@ class RandCylinderTransportStudentSingleBinaryTacEnvCfg_PLAY(RandCylinderTranspo
         self.observations.processed_tactile = NoisyProcessedTactileCfg()
 
 
-def teacher_env_from_train_to_play_for_distillation(env_cfg: ObjectTransportTeacherEnvCfg) -> None:
+# the tactile-free robot with the analytic tactile surrogate, which allows more envs for student training
+# EXPERIMENTAL, not registered as a task: the surrogate only passes the geometry checks (locotouch/scripts/check_tactile_surrogate.py),
+# it is not validated against the contact sensors yet. Record maps with 'record_tactile_maps' on the SingleBinaryTac play task and
+# compare them with locotouch/scripts/evaluate_tactile_surrogate.py (contact IoU, force MAE) before registering these configs
+@configclass
+class RandCylinderTransportStudentSingleBinaryAnalyticTacEnvCfg(RandCylinderTransportTeacherEnvCfg):
+    def __post_init__(self):
+        super().__post_init__()
+        self.observations.tactile = NoisyBinaryTactileCfg()
+        use_analytic_tactile_surrogate(self.observations.tactile.tactile_signals)
+        self.observations.object_state = NoisyObjectStateCfg()
+        teacher_env_from_train_to_play_for_distillation(self, tactile_sensors=False)
+
+
+@configclass
+class RandCylinderTransportStudentSingleBinaryAnalyticTacEnvCfg_PLAY(RandCylinderTransportStudentSingleBinaryAnalyticTacEnvCfg):
+    def __post_init__(self):
+        self.scene.num_envs = 20
+        super().__post_init__()
+        self.observations.original_tactile = NoisyTactileCfg()
+        self.observations.processed_tactile = NoisyProcessedTactileCfg()
+        use_analytic_tactile_surrogate(self.observations.original_tactile.tactile_signals)
+        use_analytic_tactile_surrogate(self.observations.processed_tactile.tactile_signals)
+
+
+def teacher_env_from_train_to_play_for_distillation(env_cfg: ObjectTransportTeacherEnvCfg, tactile_sensors: bool = True) -> None:
     # shorter episode length
     env_cfg.episode_length_s = 10.0
 
-    # enable tactile sensors
-    env_cfg.scene.robot = LocoTouch_CFG.replace(prim_path="{ENV_REGEX_NS}/Robot")
-    create_tactile_contact_sensor(env_cfg)
+    # enable tactile sensors (not needed with the analytic tactile surrogate)
+    if tactile_sensors:
+        env_cfg.scene.robot = LocoTouch_CFG.replace(prim_path="{ENV_REGEX_NS}/Robot")
+        create_tactile_contact_sensor(env_cfg)
 
     # use full range of commands and final setups
     velocity_commands_ranges = env_cfg.curriculum.velocity_commands.params["command_maximum_ranges"]
@@ -201,8 +228,10 @@ def create_tactile_contact_sensor(env_cfg: ObjectTransportTeacherEnvCfg) -> None
     )
 
 
-
-
-
-
-
+def use_analytic_tactile_surrogate(tactile_term: ObservationTermCfg) -> None:
+    # the normal forces are computed from the object and the object contact sensor, the trunk carries the sensor plate
+    tactile_term.params["analytic_surrogate"] = True
+    tactile_term.params["single_rotation"] = False
+    tactile_term.params["asset_cfg"] = SceneEntityCfg("robot", body_names="trunk")
+    tactile_term.params["sensor_cfg"] = SceneEntityCfg("object_contact_sensor", body_names="Object")
+    tactile_term.params["object_cfg"] = SceneEntityCfg("object")
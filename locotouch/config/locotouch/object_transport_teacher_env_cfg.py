@@ -12,7 +12,7 @@ from .locomotion_vel_cur_env_cfg import LocomotionVelCurEnvCfg, locotouch_locomo
 @configclass
 class NoisyObjectStateCfg(ObservationGroupCfg):
     object_state = ObservationTermCfg(
-        func=mdp.object_state_in_robot_frame,
+        func=mdp.ObjectStateInRobotFrame,
         scale=1.0,
         history_length=6,
         params={
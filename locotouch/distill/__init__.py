@@ -1,3 +1,5 @@
 from .tactile_recorder import TactileRecorder
+from .tactile_map_recorder import TactileMapRecorder
+from .tactile_codec import TactileCodec
 from .replay_buffer import ReplayBuffer
 from .student import Student
@@ -0,0 +1,198 @@
+import json
+import os
+import shutil
+import numpy as np
+import torch
+
+
+class DiskTrajectoryStore:
+    # sharded on-disk storage of variable-length trajectories with the same interface as TrajectoryStore:
+    # - every collection (one dagger iteration) is written as one shard: a directory with one .npy file per field
+    #   plus the lengths and the eviction scores of its trajectories
+    # - index.json lists the shards and the evicted trajectories, so a run can be resumed without re-collecting
+    # - the shards are memory-mapped for training, only the steps of a batch are read from disk
+    # - when more than capacity steps are stored, trajectories are evicted by the eviction policy:
+    #   "fifo": oldest first, "keep_bc": oldest first but the bc data is never evicted,
+    #   "disagreement": smallest student-teacher action disagreement (measured at collection) first, bc data last
+    eviction_policies = ("fifo", "keep_bc", "disagreement")
+
+    def __init__(self, device, root_dir: str, capacity: int = 0, eviction: str = "fifo"):
+        assert eviction in self.eviction_policies, f"Unknown eviction policy: {eviction}. Should be one of {self.eviction_policies}"
+        self._device = device
+        self._root_dir = root_dir
+        self._index_path = os.path.join(root_dir, "index.json")
+        self._capacity = capacity  # maximum number of stored steps, 0 means unlimited
+        self._eviction = eviction
+        self.metadata = {}  # extra information saved with the index, e.g. the tactile codec
+
+        # trajectory table over all shards (evicted trajectories included)
+        self._traj_shards = np.zeros(0, dtype=np.int64)
+        self._traj_starts = np.zeros(0, dtype=np.int64)  # offset within the shard
+        self._traj_lengths = np.zeros(0, dtype=np.int64)
+        self._traj_scores = np.zeros(0, dtype=np.float64)
+        self._traj_active = np.zeros(0, dtype=bool)
+        self._active_ids = np.zeros(0, dtype=np.int64)
+        self._shards: list[dict] = []
+        self._shard_data: dict[int, dict[str, np.ndarray]] = {}
+        self._pending: list[tuple[dict[str, np.ndarray], np.ndarray]] = []
+
+        os.makedirs(root_dir, exist_ok=True)
+        if os.path.exists(self._index_path):
+            self._load_index()
+
+    def append(self, fields: dict[str, torch.Tensor], lengths: np.ndarray, traj_scores: np.ndarray = None):
+        # new trajectories are kept in memory until the shard of the current collection is written by flush()
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if lengths.sum() == 0:
+            return
+        traj_scores = np.zeros(len(lengths)) if traj_scores is None else np.asarray(traj_scores, dtype=np.float64)
+        self._pending.append(({name: data.cpu().numpy() for name, data in fields.items()}, lengths))
+        shard_offset = sum(int(pending_lengths.sum()) for _, pending_lengths in self._pending[:-1])
+        self._add_trajs(len(self._shards), shard_offset + np.cumsum(lengths) - lengths, lengths, traj_scores)
+
+    def flush(self, is_bc: bool = False):
+        # write the pending trajectories as a new shard, update the index and evict trajectories beyond the capacity
+        if not self._pending:
+            return
+        shard_id = len(self._shards)
+        shard_name = f"shard_{shard_id:04d}"
+        shard_dir = os.path.join(self._root_dir, shard_name)
+        tmp_dir = shard_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name in self._pending[0][0].keys():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.concatenate([fields[name] for fields, _ in self._pending]))
+        shard_trajs = self._traj_shards == shard_id
+        np.save(os.path.join(tmp_dir, "lengths.npy"), self._traj_lengths[shard_trajs])
+        np.save(os.path.join(tmp_dir, "scores.npy"), self._traj_scores[shard_trajs])
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        os.replace(tmp_dir, shard_dir)
+        self._pending = []
+        self._shards.append(dict(name=shard_name, is_bc=is_bc, num_trajs=int(shard_trajs.sum()), evicted=[], deleted=False))
+        self._open_shard(shard_id)
+        self._evict()
+        self._save_index()
+
+    def gather(self, traj_indices: np.ndarray):
+        # returns padded fields of shape (max_length, num_trajs, *field_shape), valid-step masks and the lengths (on cpu)
+        assert not self._pending, "Call flush() before reading the trajectories."
+        traj_ids = self._active_ids[traj_indices]
+        lengths = self._traj_lengths[traj_ids]
+        max_length = int(lengths.max())
+        time_idx = np.arange(max_length)[:, None]
+        # padded steps read the last valid step of the trajectory and are zeroed afterwards
+        step_idx = self._traj_starts[traj_ids][None, :] + np.minimum(time_idx, lengths[None, :] - 1)  # (max_length, num_trajs)
+        traj_shards = self._traj_shards[traj_ids]
+        padded_fields = {}
+        for name in self.field_names:
+            padded = None
+            for shard_id in np.unique(traj_shards):
+                columns = np.flatnonzero(traj_shards == shard_id)
+                data = self._shard_data[shard_id][name][step_idx[:, columns]]  # only these steps are read from disk
+                if padded is None:
+                    padded = np.empty((max_length, len(traj_ids), *data.shape[2:]), dtype=data.dtype)
+                padded[:, columns] = data
+            padded_fields[name] = torch.from_numpy(padded).to(self._device)
+        lengths_device = torch.as_tensor(lengths, device=self._device)
+        masks = torch.arange(max_length, device=self._device).unsqueeze(1) < lengths_device.unsqueeze(0)
+        for padded in padded_fields.values():
+            padded.masked_fill_(~masks.view(*masks.shape, *([1] * (padded.dim() - 2))), 0)
+        return padded_fields, masks, torch.from_numpy(lengths)
+
+    def clear(self):
+        # only forget the data in this process, the shards and the index stay on disk for resuming
+        self._traj_shards = np.zeros(0, dtype=np.int64)
+        self._traj_starts = np.zeros(0, dtype=np.int64)
+        self._traj_lengths = np.zeros(0, dtype=np.int64)
+        self._traj_scores = np.zeros(0, dtype=np.float64)
+        self._traj_active = np.zeros(0, dtype=bool)
+        self._active_ids = np.zeros(0, dtype=np.int64)
+        self._shard_data = {}
+        self._pending = []
+
+    def _add_trajs(self, shard_id: int, starts: np.ndarray, lengths: np.ndarray, scores: np.ndarray, active: np.ndarray = None):
+        self._traj_shards = np.concatenate([self._traj_shards, np.full(len(lengths), shard_id, dtype=np.int64)])
+        self._traj_starts = np.concatenate([self._traj_starts, starts])
+        self._traj_lengths = np.concatenate([self._traj_lengths, lengths])
+        self._traj_scores = np.concatenate([self._traj_scores, scores])
+        self._traj_active = np.concatenate([self._traj_active, np.ones(len(lengths), dtype=bool) if active is None else active])
+        self._active_ids = np.flatnonzero(self._traj_active)
+
+    def _open_shard(self, shard_id: int):
+        shard_dir = os.path.join(self._root_dir, self._shards[shard_id]["name"])
+        self._shard_data[shard_id] = {
+            os.path.splitext(file_name)[0]: np.load(os.path.join(shard_dir, file_name), mmap_mode="r")
+            for file_name in sorted(os.listdir(shard_dir)) if file_name not in ("lengths.npy", "scores.npy")}
+
+    def _evict(self):
+        num_evict_steps = self.num_steps - self._capacity
+        if self._capacity <= 0 or num_evict_steps <= 0:
+            return
+        candidates = self._active_ids
+        if self._eviction == "keep_bc":
+            shard_is_bc = np.array([shard["is_bc"] for shard in self._shards])
+            candidates = candidates[~shard_is_bc[self._traj_shards[candidates]]]
+        elif self._eviction == "disagreement":
+            candidates = candidates[np.argsort(self._traj_scores[candidates], kind="stable")]
+        num_evict_trajs = int(np.searchsorted(np.cumsum(self._traj_lengths[candidates]), num_evict_steps)) + 1
+        evicted = candidates[:num_evict_trajs]
+        self._traj_active[evicted] = False
+        self._active_ids = np.flatnonzero(self._traj_active)
+        for shard_id, shard in enumerate(self._shards):
+            shard_trajs = np.flatnonzero(self._traj_shards == shard_id)
+            if len(shard_trajs) == 0:
+                continue
+            shard["evicted"] = (shard_trajs[~self._traj_active[shard_trajs]] - shard_trajs[0]).tolist()
+            # delete the shards without any remaining trajectory
+            if not shard["deleted"] and len(shard["evicted"]) == shard["num_trajs"]:
+                self._shard_data.pop(shard_id, None)
+                shutil.rmtree(os.path.join(self._root_dir, shard["name"]), ignore_errors=True)
+                shard["deleted"] = True
+        print(f"[INFO] Evicted {len(evicted)} trajectories ({self._eviction}), {self.num_steps} steps are kept.")
+
+    def _save_index(self):
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(dict(shards=self._shards, capacity=self._capacity, eviction=self._eviction, metadata=self.metadata), f, indent=2)
+        os.replace(tmp_path, self._index_path)
+
+    def _load_index(self):
+        with open(self._index_path) as f:
+            index = json.load(f)
+        self.metadata = index["metadata"]
+        for shard in index["shards"]:
+            shard_id = len(self._shards)
+            self._shards.append(shard)
+            if shard["deleted"]:
+                continue
+            shard_dir = os.path.join(self._root_dir, shard["name"])
+            lengths = np.load(os.path.join(shard_dir, "lengths.npy"))
+            active = np.ones(len(lengths), dtype=bool)
+            active[shard["evicted"]] = False
+            self._add_trajs(shard_id, np.cumsum(lengths) - lengths, lengths, np.load(os.path.join(shard_dir, "scores.npy")), active)
+            self._open_shard(shard_id)
+        print(f"[INFO] Loaded {self.num_trajs} trajectories ({self.num_steps} steps) of {self.num_shards} collections from: {self._root_dir}")
+        # the capacity or the eviction policy may differ from the previous run
+        self._evict()
+        self._save_index()
+
+    @property
+    def traj_lengths(self):
+        return self._traj_lengths[self._active_ids]
+
+    @property
+    def field_names(self):
+        return list(next(iter(self._shard_data.values())).keys()) if self._shard_data else []
+
+    @property
+    def num_trajs(self):
+        return len(self._active_ids)
+
+    @property
+    def num_steps(self):
+        return int(self._traj_lengths[self._active_ids].sum())
+
+    @property
+    def num_shards(self):
+        # number of finished collections, including the ones whose trajectories are all evicted
+        return len(self._shards)
@@ -1,5 +1,8 @@
 import gymnasium as gym
 import os
+import queue
+import threading
+import time
 import cli_args
 from datetime import datetime
 import numpy as np
@@ -65,8 +68,12 @@ class Distillation:
 
         # training mode
         if self.training:
-            # create distillation log dir
-            distillation_log_dir = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            # the resumed run skips the iterations that were already trained, their data only survives in the on-disk dataset
+            if distillation_cfg.resume_distill and not distillation_cfg.dataset_on_disk:
+                raise ValueError("Resuming the distillation ('resume_distill') requires the on-disk dataset ('dataset_on_disk'), "
+                                 "the data collected before the resumed iteration would be lost otherwise.")
+            # create distillation log dir, or reuse the one of the run to resume
+            distillation_log_dir = distillation_cfg.log_dir_distill if distillation_cfg.resume_distill else datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
             distillation_cfg.log_dir = os.path.join(distillation_log_root, distillation_log_dir)
             if not os.path.exists(distillation_cfg.log_dir):
                 os.makedirs(distillation_cfg.log_dir)
@@ -76,6 +83,8 @@ class Distillation:
             self.use_wandb = distillation_cfg.logger == "wandb"
             self.use_tensorboard = distillation_cfg.logger == "tensorboard"
             self.logger = None
+            # the logger and its step counter are shared by the collection and the trainer threads of the pipelined mode
+            self.logger_lock = threading.Lock()
             if self.use_wandb:
                 import wandb
                 self.logger = wandb.init(project=distillation_cfg.wandb_project, config=distillation_cfg.to_dict(), name=distillation_cfg.log_dir.split("/")[-1])
@@ -107,14 +116,35 @@ class Distillation:
                 teacher_encoder_inference=self.teacher_encoder_inference,
                 teacher_backbone_weights=self.teacher_backbone_weights,
                 logger=self.logger,
+                logger_lock=self.logger_lock,
             )
-            self.replay_buffer = ReplayBuffer(self.env, self.tactile_recorder, proprioception_dim)
+            # preallocate the aggregated dataset of all dagger iterations (each collection may overshoot by one episode)
+            replay_buffer_capacity = distillation_cfg.bc_data_steps + distillation_cfg.dagger_data_steps * (distillation_cfg.num_iterations - 1) \
+                + int(self.env.max_episode_length) * distillation_cfg.num_iterations
+            tactile_codec = TactileCodec(num_channels=distillation_cfg.pre_encoder.img_shape[0], scheme=distillation_cfg.tactile_storage,
+                                         num_levels=distillation_cfg.tactile_storage_levels)
+            if distillation_cfg.dataset_on_disk:
+                self.replay_buffer = ReplayBuffer(self.env, self.tactile_recorder, proprioception_dim, distillation_cfg.dataset_capacity_steps,
+                                                  tactile_codec, os.path.join(distillation_cfg.log_dir, "dataset"), distillation_cfg.dataset_eviction)
+            else:
+                self.replay_buffer = ReplayBuffer(self.env, self.tactile_recorder, proprioception_dim, replay_buffer_capacity, tactile_codec)
+
+            # pipelined mode: a collection student and replay buffer run the simulator while the student is trained in a thread
+            self.pipelined = distillation_cfg.pipelined
+            if self.pipelined:
+                self.pipeline_staleness = distillation_cfg.pipeline_staleness
+                self.pipeline_queue_size = distillation_cfg.pipeline_queue_size
+                self.collection_student = Student(distillation_cfg, proprioception_dim, tactile_signal_dim, self.env.num_actions)
+                self.collection_student.eval()
+                collection_buffer_capacity = max(distillation_cfg.bc_data_steps, distillation_cfg.dagger_data_steps) + int(self.env.max_episode_length)
+                self.collection_buffer = ReplayBuffer(self.env, self.tactile_recorder, proprioception_dim, collection_buffer_capacity, tactile_codec)
 
             # dagger training parameters
             self.max_iterations = distillation_cfg.num_iterations
             self.bc_data_steps = distillation_cfg.bc_data_steps
             self.dagger_data_steps = distillation_cfg.dagger_data_steps
             self.evaluation_trajs_num = distillation_cfg.evaluation_trajs_num
+            self.start_iteration = self.resume(distillation_cfg.log_dir) if distillation_cfg.resume_distill else 0
 
         # play mode
         else:
@@ -129,6 +159,16 @@ class Distillation:
             self.student.load_checkpoint(resume_path)
             print(f"[INFO] Loading student policy checkpoint from: {resume_path}")
 
+            # record the tactile maps of the contact sensors for the evaluation of the analytic tactile surrogate
+            self.tactile_map_recorder = None
+            if distillation_cfg.record_tactile_maps:
+                self.tactile_map_recorder = TactileMapRecorder(
+                    self.env,
+                    os.path.join(distillation_log_root, distillation_cfg.log_dir_distill, "tactile_maps.pt"),
+                    num_steps=distillation_cfg.tactile_maps_steps,
+                    num_envs=distillation_cfg.tactile_maps_envs,
+                    tactile_signal_shape=distillation_cfg.pre_encoder.img_shape[1:])
+
             # use ROS to publish the tactile signals
             self.publish_tactile_ros_topic = False
             if self.publish_tactile_ros_topic:
@@ -146,27 +186,138 @@ class Distillation:
         self.train() if self.training else self.play()
         self.env.close()
 
+    def resume(self, log_dir: str):
+        # continue after the last saved student, the collections kept in the on-disk dataset are not collected again
+        saved_iterations = [int(file_name[len("model_"):-len(".pt")]) for file_name in os.listdir(log_dir)
+                            if file_name.startswith("model_") and file_name.endswith(".pt")]
+        start_iteration = max(saved_iterations) + 1 if saved_iterations else 0
+        if saved_iterations:
+            self.student.load_checkpoint(os.path.join(log_dir, f"model_{start_iteration - 1}.pt"))
+        print(f"[INFO] Resuming distillation from iteration {start_iteration} in: {log_dir}, "
+              f"{self.replay_buffer.num_collections} collections are loaded from disk")
+        return start_iteration
+
     def train(self):
-        for iter in range(self.max_iterations):
+        if self.pipelined:
+            self.train_pipelined()
+            return
+        for iter in range(self.start_iteration, self.max_iterations):
             print("-" * 100)
 
             # collect data
-            rewards, lengths = self.replay_buffer.collect_data(
-                teacher_policy=self.teacher_policy_inference,
-                student_policy=self.student if iter else None,
-                num_steps=self.dagger_data_steps if iter else self.bc_data_steps)
-            self.log_trajectory_rewards_and_lengths(rewards, lengths)
+            if iter < self.replay_buffer.num_collections:
+                print(f"[INFO] Reusing the data collected in iteration {iter}")
+            else:
+                rewards, lengths = self.replay_buffer.collect_data(
+                    teacher_policy=self.teacher_policy_inference,
+                    student_policy=self.student if iter else None,
+                    num_steps=self.dagger_data_steps if iter else self.bc_data_steps,
+                    teacher_encoder=self.teacher_encoder_inference)
+                self.log_trajectory_rewards_and_lengths(rewards, lengths)
 
             # train student policy
             self.student.train_on_data(self.replay_buffer, iter)
 
             # evaluate student policy at the end
             if iter == self.max_iterations - 1:
-                self.replay_buffer.clear_buffer()
-                rewards, lengths = self.replay_buffer.evaluate(self.student, self.evaluation_trajs_num)
-                self.log_trajectory_rewards_and_lengths(rewards, lengths)
-                print("Log dir: ", self.student.log_dir)
-        
+                self.evaluate_student()
+
+        self.close_logger()
+
+    def train_pipelined(self):
+        # the main thread (which owns the simulator) collects the data of iteration k+1 with a snapshot of the student,
+        # while the trainer thread trains the student on the aggregate of iteration k, so that an iteration takes about
+        # max(collect, train) instead of their sum. The collection of iteration k uses a student trained on the data of
+        # iteration k-1-pipeline_staleness or later (pipeline_staleness=0 is equivalent to the sequential mode).
+        shard_queue = queue.Queue(maxsize=self.pipeline_queue_size)
+        snapshot_condition = threading.Condition()
+        snapshot = dict(iteration=self.start_iteration - 1, state_dict=self._student_state_dict())
+        trainer_errors = []
+        num_reused_collections = self.replay_buffer.num_collections
+
+        def train_worker():
+            # a separate cuda stream, so that the training kernels are not serialized with the simulation and collection
+            stream = torch.cuda.Stream(self.env.device) if "cuda" in str(self.env.device) else None
+            try:
+                with torch.cuda.stream(stream):
+                    for iter in range(self.start_iteration, self.max_iterations):
+                        shard = shard_queue.get()
+                        train_start = time.perf_counter()
+                        if shard is not None:
+                            self.replay_buffer.add_shard(shard)
+                        self.student.train_on_data(self.replay_buffer, iter)
+                        state_dict = self._student_state_dict()
+                        if stream is not None:
+                            stream.synchronize()
+                        with snapshot_condition:
+                            snapshot.update(iteration=iter, state_dict=state_dict)
+                            snapshot_condition.notify_all()
+                        print(f"[INFO] Trained iteration {iter} in {time.perf_counter() - train_start:.1f}s")
+            except BaseException as error:
+                trainer_errors.append(error)
+                with snapshot_condition:
+                    snapshot_condition.notify_all()
+
+        trainer = threading.Thread(target=train_worker, name="distillation_trainer", daemon=True)
+        trainer.start()
+        for iter in range(self.start_iteration, self.max_iterations):
+            print("-" * 100)
+            if iter < num_reused_collections:
+                print(f"[INFO] Reusing the data collected in iteration {iter}")
+                shard_queue.put(None)
+                continue
+
+            # load the latest student snapshot that is recent enough
+            if iter:
+                required_iteration = max(iter - 1 - self.pipeline_staleness, 0)
+                with snapshot_condition:
+                    snapshot_condition.wait_for(lambda: snapshot["iteration"] >= required_iteration or trainer_errors)
+                    snapshot_iteration, state_dict = snapshot["iteration"], snapshot["state_dict"]
+                self._raise_trainer_error(trainer_errors)
+                self.collection_student.load_state_dict(state_dict)
+                print(f"[INFO] Collecting iteration {iter} with the student trained in iteration {snapshot_iteration}")
+
+            # collect data and hand it over to the trainer, blocks while the queue is full
+            collect_start = time.perf_counter()
+            rewards, lengths = self.collection_buffer.collect_data(
+                teacher_policy=self.teacher_policy_inference,
+                student_policy=self.collection_student if iter else None,
+                num_steps=self.dagger_data_steps if iter else self.bc_data_steps,
+                teacher_encoder=self.teacher_encoder_inference)
+            self.log_trajectory_rewards_and_lengths(rewards, lengths)
+            shard = self.collection_buffer.export_shard()
+            if "cuda" in str(self.env.device):
+                torch.cuda.synchronize(self.env.device)
+            print(f"[INFO] Collected iteration {iter} in {time.perf_counter() - collect_start:.1f}s")
+            while True:
+                self._raise_trainer_error(trainer_errors)
+                try:
+                    shard_queue.put(shard, timeout=1.0)
+                    break
+                except queue.Full:
+                    pass
+
+        trainer.join()
+        self._raise_trainer_error(trainer_errors)
+        if self.start_iteration < self.max_iterations:
+            self.evaluate_student()
+        self.close_logger()
+
+    def _student_state_dict(self):
+        return {key: value.detach().clone() for key, value in self.student.state_dict().items()}
+
+    @staticmethod
+    def _raise_trainer_error(trainer_errors: list):
+        if trainer_errors:
+            raise RuntimeError("The distillation trainer thread failed.") from trainer_errors[0]
+
+    def evaluate_student(self):
+        self.replay_buffer.clear_buffer()
+        rewards, lengths = self.replay_buffer.evaluate(self.student, self.evaluation_trajs_num)
+        self.log_trajectory_rewards_and_lengths(rewards, lengths)
+        print("Log dir: ", self.student.log_dir)
+
+    def close_logger(self):
         if self.use_wandb:
             self.logger.finish()
         elif self.use_tensorboard:
@@ -175,11 +326,13 @@ class Distillation:
     def log_trajectory_rewards_and_lengths(self, rewards: list, lengths: list):
         rewards = np.array(rewards)
         lengths = np.array(lengths)
-        self.logger.log({"collect/trj_num": len(rewards)}, commit=False) if self.use_wandb else None
-        self.logger.log({"collect/trj_less_half_len_num": (lengths < 0.5 * max(lengths)).sum()}, commit=False) if self.use_wandb else None
-        self.logger.log({"collect/step_reward_mean": np.mean(rewards / lengths)}, commit=False) if self.use_wandb else None
-        self.logger.log({"collect/trj_rwd_mean": rewards.mean(), "collect/trj_rwd_std": rewards.std()}, commit=False) if self.use_wandb else None
-        self.logger.log({"collect/trj_len_mean": lengths.mean(), "collect/trj_len_std": lengths.std()}, commit=False) if self.use_wandb else None
+        # the collection statistics are logged together, so the trainer thread can not commit a step in between
+        with self.logger_lock:
+            self.logger.log({"collect/trj_num": len(rewards)}, commit=False) if self.use_wandb else None
+            self.logger.log({"collect/trj_less_half_len_num": (lengths < 0.5 * max(lengths)).sum()}, commit=False) if self.use_wandb else None
+            self.logger.log({"collect/step_reward_mean": np.mean(rewards / lengths)}, commit=False) if self.use_wandb else None
+            self.logger.log({"collect/trj_rwd_mean": rewards.mean(), "collect/trj_rwd_std": rewards.std()}, commit=False) if self.use_wandb else None
+            self.logger.log({"collect/trj_len_mean": lengths.mean(), "collect/trj_len_std": lengths.std()}, commit=False) if self.use_wandb else None
         print(f"Collected {len(rewards)} trajectories:")
         print(f"Trajectories less than half length: {(lengths < 0.5 * max(lengths)).sum()}")
         print(f"Mean step reward: {np.mean(rewards / lengths)}")
@@ -215,6 +368,8 @@ class Distillation:
                 # obs, rwd, dones, extras = self.env.step(action)
                 next_obs, _, dones, extras = self.env.step(action)
                 extras = {"observations": {k: v for k, v in next_obs.items()}}
+                if self.tactile_map_recorder is not None:
+                    self.tactile_map_recorder.record()
                 if dones.any():
                     # reset tactile recorder
                     done_idx = dones.nonzero(as_tuple=False).flatten()
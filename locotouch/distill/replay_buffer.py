@@ -1,33 +1,65 @@
+import time
 import torch
 from isaaclab.envs import ManagerBasedRLEnv
 import numpy as np
 from typing import Optional
 from tqdm import tqdm
 from .tactile_recorder import TactileRecorder
+from .trajectory_store import TrajectoryStore
+from .disk_trajectory_store import DiskTrajectoryStore
+from .tactile_codec import TactileCodec
 
 
 class ReplayBuffer:
-    def __init__(self, env: ManagerBasedRLEnv, tactile_recorder: TactileRecorder, proprioception_dim: int):
+    def __init__(self, env: ManagerBasedRLEnv, tactile_recorder: TactileRecorder, proprioception_dim: int, capacity: int = 0,
+                 tactile_codec: Optional[TactileCodec] = None, dataset_dir: Optional[str] = None, eviction: str = "fifo"):
         self._env = env
         self._num_envs = env.num_envs
         self._device = env.device
-        self._proprioceptions, self._teacher_encoder_obses, self._tactile_signals, self._actions = [], [], [], []  # each data is a tensor for a full trajectory for one env, shape: (trajectory_length, obs_dim)
+        # tactile signals are stored in a compact format (e.g. bit-packed binary maps) and decoded batch-wise for training
+        self._tactile_codec = tactile_codec if tactile_codec is not None else TactileCodec(scheme="float")
+        if dataset_dir is None:
+            # all trajectories are stored in flat preallocated tensors with an offset/length index, see TrajectoryStore
+            self._store = TrajectoryStore(self._device, capacity)
+        else:
+            # one memory-mapped shard per collection, capacity is the maximum number of kept steps, see DiskTrajectoryStore
+            self._store = DiskTrajectoryStore(self._device, dataset_dir, capacity, eviction)
+            if "tactile_codec" in self._store.metadata:
+                self._tactile_codec.load_state_dict(self._store.metadata["tactile_codec"], self._device)
+        self._collecting_bc = False
         self._proprioception_dim = proprioception_dim
         self._tactile_recorder = tactile_recorder
-        self._steps_count = 0
         self._reward_sums = torch.zeros(self._num_envs, device=self._device)
 
-    def collect_data(self, teacher_policy, student_policy: Optional[torch.nn.Module], num_steps: int):
+        # ring buffers holding the running trajectories of all envs, shape: (staging_length, num_envs, obs_dim)
+        # an episode never exceeds max_episode_length steps, so a slot is only overwritten after its trajectory is recorded
+        self._staging_length = int(env.max_episode_length) + 1
+        self._staging: dict[str, torch.Tensor] = {}
+
+        # teacher target cache counters
+        self._teacher_compute_time = 0.0  # seconds spent in teacher forward passes during collection
+        self._teacher_compute_calls = 0  # number of teacher forward passes (one per env step)
+        self._is_cuda = torch.device(self._device).type == "cuda"
+        self._teacher_events: list[tuple[torch.cuda.Event, torch.cuda.Event]] = []  # pending cuda timings of the teacher
+        self._teacher_cache_hits = 0  # number of padded batches served with cached teacher targets (teacher passes avoided)
+
+        # valid and padded steps of the batches generated in the last pass over the buffer
+        self._valid_steps = 0
+        self._padded_steps = 0
+
+    def collect_data(self, teacher_policy, student_policy: Optional[torch.nn.Module], num_steps: int, teacher_encoder=None):
+        # teacher actions (and teacher embeddings for RMA) are computed once per step here and cached with the trajectories,
+        # so the student training does not need to query the teacher again in every epoch
         if student_policy is not None:  # when resetting the environment for two continuous times, the observations have some problems
             self._env.reset()
         self._tactile_recorder.reset()
         pbar = tqdm(total=num_steps, desc="Collecting Data", leave=True)
         trajectory_rewards = []
         trajectory_lengths = []
-        proprioceptions, teacher_encoder_obses, tactile_signals, actions = [], [], [], []  # each data is a tensor for a single step for all envs, shape: (num_envs, obs_dim)
         steps_count = 0
         start_indices = torch.zeros(self._num_envs, device=self._device, dtype=torch.int64)
-        start_count = self._steps_count
+        start_count = self._store.num_steps
+        self._collecting_bc = student_policy is None
 
         with torch.no_grad():
         # with torch.inference_mode():
@@ -35,17 +67,27 @@ class ReplayBuffer:
             env_obs = self._env.get_observations()
             proprioception_object_state = env_obs["policy"]
             extras = {"observations": {k: v for k, v in env_obs.items()}}
-            while self._steps_count - start_count < num_steps:
+            while self._store.num_steps - start_count < num_steps:
                 # get observations and actions, then take a step
                 proprioception = proprioception_object_state[:, :self._proprioception_dim]
                 teacher_encoder_obs = proprioception_object_state[:, self._proprioception_dim:]
                 tactile_signal = extras["observations"]["tactile"]
-                action = teacher_policy(proprioception_object_state) if student_policy is None else student_policy(proprioception, tactile_signal)
+                # the teacher targets are always needed for training, query them once here
+                teacher_timer = self._start_teacher_timer()
+                teacher_action = teacher_policy(proprioception_object_state)
+                teacher_embedding = teacher_encoder(teacher_encoder_obs) if teacher_encoder is not None else None
+                self._stop_teacher_timer(teacher_timer)
+                action = teacher_action if student_policy is None else student_policy(proprioception, tactile_signal)
                 # store the data before the proprioception_object_state is updated!!
-                proprioceptions.append(proprioception)
-                teacher_encoder_obses.append(teacher_encoder_obs)
                 self._tactile_recorder.record_new_tactile_signals(tactile_signal)
-                tactile_signals.append(self._tactile_recorder.get_tactile_signals())
+                step_data = dict(proprioceptions=proprioception,
+                                 teacher_encoder_obses=teacher_encoder_obs,
+                                 tactile_signals=self._tactile_recorder.get_tactile_signals(),
+                                 teacher_actions=teacher_action,
+                                 disagreements=((action - teacher_action) ** 2).mean(dim=-1))
+                if teacher_embedding is not None:
+                    step_data["teacher_embeddings"] = teacher_embedding
+                self._stage_step(step_data, steps_count)
                 # take a step
                 # proprioception_object_state, reward, dones, extras = self._env.step(action)
                 next_obs, reward, dones, extras = self._env.step(action)
@@ -60,60 +102,145 @@ class ReplayBuffer:
                     done_idx = dones.nonzero(as_tuple=False).flatten()
                     self._tactile_recorder.reset(done_idx)
                     trajectory_rewards.extend(self._reward_sums[done_idx].cpu().tolist())
-                    trajectory_lengths.extend((steps_count - start_indices[done_idx]).cpu().tolist())
+                    done_lengths = (steps_count - start_indices[done_idx]).cpu().numpy()
+                    trajectory_lengths.extend(done_lengths.tolist())
                     self._reward_sums[done_idx] = 0
-                    for env_id in done_idx:
-                        if self._steps_count - start_count < num_steps:
-                            self._record_new_traj(proprioceptions, teacher_encoder_obses, tactile_signals, actions, start_indices[env_id].item(), steps_count, env_id)
-                            pbar.update(steps_count - start_indices[env_id].item())
-                            start_indices[env_id] = steps_count
-                        else:
-                            break
+                    remaining_steps = num_steps - (self._store.num_steps - start_count)
+                    pbar.update(self._record_done_trajs(done_idx, done_lengths, steps_count, remaining_steps))
+                    start_indices[done_idx] = steps_count
+        self._sum_teacher_timers()
+        if isinstance(self._store, DiskTrajectoryStore):
+            self._store.metadata["tactile_codec"] = self._tactile_codec.state_dict()
+        self._store.flush(is_bc=self._collecting_bc)
         return trajectory_rewards, trajectory_lengths
 
-    def _record_new_traj(self, proprioceptions, teacher_encoder_obses, tactile_signals, actions, start_idx, end_idx, env_id):
-        if start_idx < end_idx:
-            self._steps_count += (end_idx - start_idx)
-            self._proprioceptions.append(torch.stack([p[env_id] for p in proprioceptions[start_idx:end_idx]]))
-            self._teacher_encoder_obses.append(torch.stack([t[env_id] for t in teacher_encoder_obses[start_idx:end_idx]]))
-            self._tactile_signals.append(torch.stack([t[env_id] for t in tactile_signals[start_idx:end_idx]]))
-            # self._actions.append(torch.stack([a[env_id] for a in actions[start_idx:end_idx]]))
+    def _start_teacher_timer(self):
+        # the teacher runs asynchronously on cuda, so its time is measured with cuda events that are only read once the
+        # collection is finished (see _sum_teacher_timers) instead of synchronizing at every step
+        if self._is_cuda:
+            start_event = torch.cuda.Event(enable_timing=True)
+            start_event.record()
+            return start_event
+        return time.perf_counter()
+
+    def _stop_teacher_timer(self, teacher_timer):
+        self._teacher_compute_calls += 1
+        if self._is_cuda:
+            end_event = torch.cuda.Event(enable_timing=True)
+            end_event.record()
+            self._teacher_events.append((teacher_timer, end_event))
+        else:
+            self._teacher_compute_time += time.perf_counter() - teacher_timer
+
+    def _sum_teacher_timers(self):
+        if self._teacher_events:
+            self._teacher_events[-1][1].synchronize()
+            self._teacher_compute_time += sum(start.elapsed_time(end) for start, end in self._teacher_events) / 1000.0
+            self._teacher_events = []
 
-    def to_recurrent_generator(self, batch_size: int):
-        num_trajs = len(self._proprioceptions)
+    def _stage_step(self, step_data: dict, steps_count: int):
+        if not self._staging:
+            self._staging = {name: torch.zeros((self._staging_length, *data.shape), dtype=data.dtype, device=self._device)
+                             for name, data in step_data.items()}
+        slot = steps_count % self._staging_length
+        for name, data in step_data.items():
+            self._staging[name][slot].copy_(data)
+
+    def _record_done_trajs(self, done_idx: torch.Tensor, done_lengths: np.ndarray, end_idx: int, remaining_steps: int):
+        # only keep the finished trajectories that start before the step budget of this collection is used up
+        done_lengths = np.minimum(done_lengths, self._staging_length)
+        keep = np.logical_and(np.cumsum(done_lengths) - done_lengths < remaining_steps, done_lengths > 0)
+        lengths = done_lengths[keep]
+        num_new_steps = int(lengths.sum())
+        if num_new_steps == 0:
+            return 0
+        # a single vectorized gather of all finished trajectories from the ring buffers, ordered trajectory by trajectory
+        env_ids = done_idx[torch.from_numpy(keep).to(self._device)]
+        lengths_device = torch.from_numpy(lengths).to(self._device)
+        traj_offsets = torch.cumsum(lengths_device, dim=0) - lengths_device
+        step_env_ids = torch.repeat_interleave(env_ids, lengths_device, output_size=num_new_steps)
+        step_in_traj = torch.arange(num_new_steps, device=self._device) - torch.repeat_interleave(traj_offsets, lengths_device, output_size=num_new_steps)
+        step_start = torch.repeat_interleave(end_idx - lengths_device, lengths_device, output_size=num_new_steps)
+        step_slots = (step_start + step_in_traj) % self._staging_length
+        new_steps = {name: data[step_slots, step_env_ids] for name, data in self._staging.items()}
+        new_steps["tactile_signals"] = self._encode_tactile_signals(new_steps["tactile_signals"])
+        # mean student-teacher action disagreement of each trajectory for the eviction, bc trajectories are ranked last
+        step_disagreements = new_steps.pop("disagreements")
+        if self._collecting_bc:
+            traj_scores = np.full(len(lengths), np.inf)
+        else:
+            step_trajs = torch.repeat_interleave(torch.arange(len(lengths), device=self._device), lengths_device, output_size=num_new_steps)
+            traj_scores = torch.zeros(len(lengths), device=self._device).index_add_(0, step_trajs, step_disagreements) / lengths_device
+            traj_scores = traj_scores.cpu().numpy()
+        self._store.append(new_steps, lengths, traj_scores)
+        return num_new_steps
+
+    def _encode_tactile_signals(self, tactile_signals: torch.Tensor):
+        if not self._tactile_codec.fitted:
+            # the storage scheme is configured, it is only checked once on the first recorded signals
+            self._tactile_codec.fit(tactile_signals)
+            tactile_codes = self._tactile_codec.encode(tactile_signals)
+            self._tactile_codec.check(tactile_signals, tactile_codes)
+            return tactile_codes
+        return self._tactile_codec.encode(tactile_signals)
+
+    def to_recurrent_generator(self, batch_size: int, length_bucketing: bool = False, bucket_window: int = 32):
+        # every trajectory is still visited exactly once per pass, bucketing only changes how they are grouped into batches
+        num_trajs = self._store.num_trajs
         traj_indices = np.arange(num_trajs)
         traj_indices = np.random.permutation(traj_indices)
-        for start_idx in range(0, num_trajs, batch_size):
-            end_idx = np.minimum(start_idx + batch_size, num_trajs)
-            yield self._prepare_padded_sequence(traj_indices[start_idx:end_idx])
+        self._valid_steps, self._padded_steps = 0, 0
+        if length_bucketing:
+            batches = self._length_bucketed_batches(traj_indices, batch_size, bucket_window)
+        else:
+            batches = [traj_indices[start_idx:start_idx + batch_size] for start_idx in range(0, num_trajs, batch_size)]
+        for batch_traj_indices in batches:
+            yield self._prepare_padded_sequence(batch_traj_indices)
 
-    def _prepare_padded_sequence(self, traj_indices):
-        traj_lengths = [self._proprioceptions[idx].shape[0] for idx in traj_indices]
-        max_length = max(traj_lengths)
-        num_trajs = len(traj_indices)
+    def _length_bucketed_batches(self, traj_indices: np.ndarray, batch_size: int, bucket_window: int):
+        # sort the shuffled trajectories by length within windows of bucket_window batches,
+        # so that each batch contains trajectories of similar lengths, then shuffle the order of the batches
+        traj_lengths = self._store.traj_lengths
+        window_size = batch_size * max(bucket_window, 1)
+        batches = []
+        for window_start in range(0, len(traj_indices), window_size):
+            window = traj_indices[window_start:window_start + window_size]
+            window = window[np.argsort(traj_lengths[window], kind="stable")]
+            batches.extend(window[start_idx:start_idx + batch_size] for start_idx in range(0, len(window), batch_size))
+        return [batches[batch_idx] for batch_idx in np.random.permutation(len(batches))]
 
+    def _prepare_padded_sequence(self, traj_indices):
         # shape: (max_length, num_trajs, obs_dim)
-        proprioceptions = torch.zeros((max_length, num_trajs, self._proprioceptions[0].shape[1]), device=self._device)
-        teacher_encoder_obses = torch.zeros((max_length, num_trajs, self._teacher_encoder_obses[0].shape[1]), device=self._device)
-        tactile_signals = torch.zeros((max_length, num_trajs, *self._tactile_signals[0].shape[1:]), device=self._device)
-        # actions = torch.zeros((max_length, num_trajs, self._actions[0].shape[1]), device=self._device)
-        masks = torch.zeros((max_length, num_trajs), dtype=torch.bool, device=self._device)
-        for output_idx, traj_idx in enumerate(traj_indices):
-            proprioceptions[:traj_lengths[output_idx], output_idx] = self._proprioceptions[traj_idx]
-            tactile_signals[:traj_lengths[output_idx], output_idx] = self._tactile_signals[traj_idx]
-            teacher_encoder_obses[:traj_lengths[output_idx], output_idx] = self._teacher_encoder_obses[traj_idx]
-            # actions[:traj_lengths[output_idx], output_idx] = self._actions[traj_idx]
-            masks[:traj_lengths[output_idx], output_idx] = 1
-
-        return dict(proprioceptions=proprioceptions,
-                    teacher_encoder_obses=teacher_encoder_obses,
-                    tactile_signals=tactile_signals,
-                    # actions=actions,
-                    masks=masks)
+        batch, masks, lengths = self._store.gather(traj_indices)
+        batch["tactile_signals"] = self._tactile_codec.decode(batch["tactile_signals"])
+        batch["masks"] = masks
+        batch["lengths"] = lengths  # on cpu, as required by packed sequences
+        self._teacher_cache_hits += 1
+        self._valid_steps += int(lengths.sum())
+        self._padded_steps += int(lengths.max()) * len(lengths)
+        return batch
+
+    def export_shard(self):
+        # hand the collected trajectories over to another replay buffer (see add_shard) and clear this one
+        fields, lengths, traj_scores = self._store.export()
+        shard = dict(fields=fields, lengths=lengths, traj_scores=traj_scores, is_bc=self._collecting_bc,
+                     teacher_compute_time=self._teacher_compute_time, teacher_compute_calls=self._teacher_compute_calls)
+        self._teacher_compute_time, self._teacher_compute_calls = 0.0, 0
+        self.clear_buffer()
+        return shard
+
+    def add_shard(self, shard: dict):
+        # the tactile signals of the shard are already encoded with the tactile codec shared by both replay buffers
+        self._store.append(shard["fields"], shard["lengths"], shard["traj_scores"])
+        self._sum_teacher_timers()
+        if isinstance(self._store, DiskTrajectoryStore):
+            self._store.metadata["tactile_codec"] = self._tactile_codec.state_dict()
+        self._store.flush(is_bc=shard["is_bc"])
+        self._teacher_compute_time += shard["teacher_compute_time"]
+        self._teacher_compute_calls += shard["teacher_compute_calls"]
 
     def clear_buffer(self):
-        self._proprioceptions, self._teacher_encoder_obses, self._tactile_signals, self._actions = [], [], [], []
-        self._steps_count = 0
+        self._store.clear()
         self._reward_sums[:] = 0
 
     def evaluate(self, student_policy, num_trajs: int):
@@ -138,11 +265,30 @@ class ReplayBuffer:
                     env_steps_count[done_idx] = 0
         return rewards, lengths
 
+    def teacher_cache_stats(self):
+        return dict(teacher_compute_time=self._teacher_compute_time,
+                    teacher_compute_calls=self._teacher_compute_calls,
+                    teacher_cache_hits=self._teacher_cache_hits)
+
+    def reset_teacher_cache_stats(self):
+        # the counters cover one distillation iteration: the collection(s) and the training pass since the last reset
+        self._teacher_compute_time, self._teacher_compute_calls, self._teacher_cache_hits = 0.0, 0, 0
+
+    @property
+    def padding_efficiency(self):
+        # ratio of valid steps to all (valid + padded) steps processed in the last pass over the buffer
+        return self._valid_steps / max(self._padded_steps, 1)
+
+    @property
+    def num_collections(self):
+        # number of collections stored in an on-disk dataset, used to resume a distillation run
+        return self._store.num_shards if isinstance(self._store, DiskTrajectoryStore) else 0
+
     @property
     def num_trajs(self):
-        return len(self._proprioceptions)
+        return self._store.num_trajs
 
     @property
     def num_steps(self):
-        return self._steps_count
+        return self._store.num_steps
 
@@ -1,3 +1,4 @@
+import contextlib
 import torch
 import torch.nn as nn
 import numpy as np
@@ -5,6 +6,7 @@ from tqdm import tqdm
 import os
 from loco_rl.models.model_generation import generate_model
 from loco_rl.models import MLP, RNN, CNN2d, CNN2dHead
+from loco_rl.utils import apply_on_valid_steps
 from locotouch.config.locotouch.agents.distillation_cfg import DistillationCfg
 from locotouch.distill.replay_buffer import ReplayBuffer
 
@@ -19,11 +21,13 @@ class Student(nn.Module):
         teacher_policy_inference=None,  # for training
         teacher_encoder_inference=None,  # for RMA distillation
         teacher_backbone_weights=None,  # for RMA distillation
-        logger=None):
+        logger=None,
+        logger_lock=None):  # shared with the collection thread in the pipelined mode
         super().__init__()
         # parameters
         self.cfg = cfg
         self.logger = logger
+        self.logger_lock = logger_lock if logger_lock is not None else contextlib.nullcontext()
         self.device = self.cfg.device
         self.log_dir = self.cfg.log_dir
         self.proprioception_dim = proprioception_dim
@@ -74,6 +78,9 @@ class Student(nn.Module):
         self.incremental_epoches = self.cfg.incremental_epoches
         self.final_epoches = self.cfg.final_epoches
         self.batch_steps = self.cfg.batch_steps
+        self.packed_sequence = self.cfg.packed_sequence
+        self.length_bucketing = self.cfg.length_bucketing
+        self.bucket_window = self.cfg.bucket_window
 
         # optimizer and criterion
         self._criterion = nn.MSELoss(reduction='none')
@@ -85,25 +92,37 @@ class Student(nn.Module):
         self.clip_range = cfg.clip_range
         self.action_scale_within_env = cfg.action_scale_within_env
 
-    def encoder_forward(self, tactile_signal, hidden_states=None):
+    def encoder_forward(self, tactile_signal, hidden_states=None, lengths=None, masks=None):
+        # lengths and masks (LxB) enable the packed-sequence mode for padded trajectories: only the valid steps are computed
         if self.use_pre_encoder:
             original_tactile_shape = tactile_signal.shape  # NxCxHxW or LxBxCxHxW
             if len(tactile_signal.shape) <=3:
                 flatten_tactile_shape = tactile_signal.shape  # NxD or LxBxD
                 tactile_signal = tactile_signal.reshape(*flatten_tactile_shape[:-1], *self.tactile_signal_img_shape)  # NxCxHxW or LxBxCxHxW
                 original_tactile_shape = tactile_signal.shape  # NxCxHxW or LxBxCxHxW
-            cnn_tactile_signals = tactile_signal.reshape(-1, *original_tactile_shape[-3:])  # NxCxHxW
-            tactile_signal = self.pre_encoder(cnn_tactile_signals).reshape(*original_tactile_shape[:-3], -1)  # NxD
-        return self.student_encoder(tactile_signal, hidden_states)
+            if masks is not None:
+                tactile_signal = apply_on_valid_steps(
+                    lambda cnn_tactile_signals: self.pre_encoder(cnn_tactile_signals).reshape(cnn_tactile_signals.shape[0], -1),
+                    tactile_signal, masks)  # LxBxD
+            else:
+                cnn_tactile_signals = tactile_signal.reshape(-1, *original_tactile_shape[-3:])  # NxCxHxW
+                tactile_signal = self.pre_encoder(cnn_tactile_signals).reshape(*original_tactile_shape[:-3], -1)  # NxD
+        return self._sequence_forward(self.student_encoder, tactile_signal, hidden_states, lengths, masks)
     
-    def backbone_forward(self, proprioception, tactile_embedding):
+    def backbone_forward(self, proprioception, tactile_embedding, lengths=None, masks=None):
         policy_input = torch.cat((proprioception, tactile_embedding), dim=-1)
-        return self.student_backbone(policy_input)
+        return self._sequence_forward(self.student_backbone, policy_input, None, lengths, masks)
 
-    def forward(self, proprioception, tactile_signal, hidden_states=None):
-        tactile_embedding = self.encoder_forward(tactile_signal, hidden_states)
-        policy_input = torch.cat((proprioception, tactile_embedding), dim=-1)
-        return self.student_backbone(policy_input)
+    def forward(self, proprioception, tactile_signal, hidden_states=None, lengths=None, masks=None):
+        tactile_embedding = self.encoder_forward(tactile_signal, hidden_states, lengths, masks)
+        return self.backbone_forward(proprioception, tactile_embedding, lengths, masks)
+
+    def _sequence_forward(self, model, model_input, hidden_states=None, lengths=None, masks=None):
+        if masks is None:
+            return model(model_input, hidden_states) if hidden_states is not None else model(model_input)
+        if isinstance(model, RNN):
+            return model(model_input, hidden_states, lengths=lengths, masks=masks)
+        return apply_on_valid_steps(model, model_input, masks)
 
     def train_on_data(self, replay_buffer: ReplayBuffer, num_iter: int):
         self.train()
@@ -116,25 +135,26 @@ class Student(nn.Module):
             losses = []
             action_mses = []
             action_maes = []
-            dataloader = replay_buffer.to_recurrent_generator(batch_size=batch_trajs)
+            dataloader = replay_buffer.to_recurrent_generator(batch_size=batch_trajs, length_bucketing=self.length_bucketing, bucket_window=self.bucket_window)
             for batch in dataloader:
                 self._optimizer.zero_grad()
                 proprioceptions = batch['proprioceptions']
                 teacher_encoder_obses = batch['teacher_encoder_obses']
                 tactile_signals = batch['tactile_signals']
                 masks = batch['masks']
+                # teacher targets are cached by the replay buffer at collection time
+                teacher_actions = batch['teacher_actions']
+                # packed-sequence mode: padded steps are skipped by the networks (their outputs are zeros and masked in the loss)
+                lengths = batch['lengths'] if self.packed_sequence else None
+                valid_masks = masks if self.packed_sequence else None
                 if self.MonolithicDistillation:
-                    student_actions = self.forward(proprioceptions, tactile_signals)
-                    teacher_obses = torch.cat((proprioceptions, teacher_encoder_obses), dim=-1)
-                    teacher_actions = self.teacher_policy_inference(teacher_obses)
+                    student_actions = self.forward(proprioceptions, tactile_signals, lengths=lengths, masks=valid_masks)
                     loss = self._criterion(student_actions, teacher_actions).mean(dim=-1)
                 else:
-                    student_embeddings = self.encoder_forward(tactile_signals)
-                    teacher_embeddings = self.teacher_encoder_inference(teacher_encoder_obses) if self.teacher_encoder_inference is not None else teacher_encoder_obses
+                    student_embeddings = self.encoder_forward(tactile_signals, lengths=lengths, masks=valid_masks)
+                    teacher_embeddings = batch['teacher_embeddings'] if 'teacher_embeddings' in batch else teacher_encoder_obses
                     loss = self._criterion(student_embeddings, teacher_embeddings).mean(dim=-1)
-                    student_actions = self.backbone_forward(proprioceptions, student_embeddings)
-                    teacher_obses = torch.cat((proprioceptions, teacher_encoder_obses), dim=-1)
-                    teacher_actions = self.teacher_policy_inference(teacher_obses)
+                    student_actions = self.backbone_forward(proprioceptions, student_embeddings, lengths=lengths, masks=valid_masks)
                     action_mse = ((student_actions - teacher_actions) ** 2).mean(dim=-1)
                     action_mse = (action_mse * masks).sum() / masks.sum()
                     action_mses.append(action_mse.item())
@@ -149,20 +169,32 @@ class Student(nn.Module):
                 action_mae = torch.abs(student_actions - teacher_actions).mean(dim=-1)
                 action_mae = (action_mae * masks).sum() / masks.sum() * self.action_scale_within_env
                 action_maes.append(action_mae.item())
-            # logging
+            # logging (the logger is shared with the collection thread in the pipelined mode)
             if self.logger is not None:
-                if self.MonolithicDistillation:
-                    self.logger.log({"train/Action MSE": np.mean(losses),
-                                    "train/Action MAE": np.mean(action_maes)}) if self.cfg.logger == "wandb" else None
-                else:
-                    self.logger.log({"train/Action MSE": np.mean(action_mses),
-                                    "train/Action MAE": np.mean(action_maes),
-                                    "train/Encoder MSE": np.mean(losses)}) if self.cfg.logger == "wandb" else None
-            pbar.set_postfix({f"Avg Loss": f"{np.mean(losses):.4f}"})
+                with self.logger_lock:
+                    if self.MonolithicDistillation:
+                        self.logger.log({"train/Action MSE": np.mean(losses),
+                                        "train/Action MAE": np.mean(action_maes),
+                                        "train/Padding efficiency": replay_buffer.padding_efficiency}) if self.cfg.logger == "wandb" else None
+                    else:
+                        self.logger.log({"train/Action MSE": np.mean(action_mses),
+                                        "train/Action MAE": np.mean(action_maes),
+                                        "train/Encoder MSE": np.mean(losses),
+                                        "train/Padding efficiency": replay_buffer.padding_efficiency}) if self.cfg.logger == "wandb" else None
+            pbar.set_postfix({f"Avg Loss": f"{np.mean(losses):.4f}", "Pad Eff": f"{replay_buffer.padding_efficiency:.2f}"})
         pbar.close()
         print(f"[Distillation iteration {num_iter}] Action MSE: {np.mean(losses if self.MonolithicDistillation else action_mses)}")
         print(f"[Distillation iteration {num_iter}] Action MAE: {np.mean(action_maes)}")
         if not self.MonolithicDistillation: print(f"[Distillation iteration {num_iter}] Encoder MSE: {np.mean(losses)}")
+        print(f"[Distillation iteration {num_iter}] Padding efficiency: {replay_buffer.padding_efficiency:.3f}")
+        # teacher forward passes avoided (cache hits) vs performed during the collection of this iteration
+        if self.logger is not None:
+            teacher_cache_stats = replay_buffer.teacher_cache_stats()
+            with self.logger_lock:
+                self.logger.log({"train/Teacher cache hits": teacher_cache_stats["teacher_cache_hits"],
+                                 "train/Teacher forward passes": teacher_cache_stats["teacher_compute_calls"],
+                                 "train/Teacher compute time": teacher_cache_stats["teacher_compute_time"]}) if self.cfg.logger == "wandb" else None
+        replay_buffer.reset_teacher_cache_stats()
         self.save_model(num_iter)
 
     def save_model(self, iteration):
@@ -0,0 +1,101 @@
+import math
+import torch
+
+
+class TactileCodec:
+    # compact storage format of the tactile signals in the replay buffer, set by 'tactile_storage' in the distillation configuration:
+    # - "binary": binary maps are bit-packed into uint8
+    # - "binary_shared": binary maps with identical channels (e.g. BinaryTactileSignals) are bit-packed and stored once
+    # - "levels": signals on a uniform grid k / num_levels in [0, 1] (e.g. DiscreteTactileSignals) are stored as uint8 levels
+    # - "float": the signals are stored verbatim
+    schemes = ("float", "binary", "binary_shared", "levels")
+
+    def __init__(self, num_channels: int = 1, scheme: str = "float", num_levels: int | None = None, tolerance: float = 1.0e-5):
+        assert scheme in self.schemes, f"Unknown tactile storage scheme: {scheme}. Should be one of {self.schemes}"
+        if scheme == "levels":
+            assert num_levels is not None and 1 <= num_levels <= 255, "The 'levels' tactile storage requires 1 <= num_levels <= 255"
+        self.num_channels = num_channels
+        self.scheme = scheme
+        self.num_levels = num_levels
+        self.tolerance = tolerance
+        self.tactile_dim = None
+        self.stored_channels = None
+        self._bit_weights = None
+
+    def fit(self, tactile_signals: torch.Tensor):
+        # tactile_signals: (num_steps, tactile_dim) first recorded signals, only their dimension is used
+        self.tactile_dim = tactile_signals.shape[-1]
+        if self.tactile_dim % self.num_channels != 0:
+            self.num_channels = 1
+        self.stored_channels = 1 if self.scheme == "binary_shared" else self.num_channels
+        if self.scheme in ("binary", "binary_shared"):
+            self._bit_weights = torch.tensor([128, 64, 32, 16, 8, 4, 2, 1], dtype=torch.uint8, device=tactile_signals.device)
+        print(f"[INFO] Tactile storage: {self.scheme} ({self.encoded_bytes_per_step} bytes per step, "
+              f"{self.compression_ratio:.1f}x smaller than float32)")
+
+    def encode(self, tactile_signals: torch.Tensor) -> torch.Tensor:
+        # (num_steps, tactile_dim) float -> (num_steps, encoded_dim) codes
+        if self.scheme in ("binary", "binary_shared"):
+            channels = tactile_signals.reshape(tactile_signals.shape[0], self.num_channels, -1)[:, :self.stored_channels]
+            bits = (channels.reshape(tactile_signals.shape[0], -1) > 0.5).to(torch.uint8)
+            bits = torch.nn.functional.pad(bits, (0, self.num_bytes * 8 - bits.shape[-1]))
+            packed = (bits.reshape(bits.shape[0], self.num_bytes, 8) * self._bit_weights).sum(dim=-1)
+            return packed.to(torch.uint8)
+        elif self.scheme == "levels":
+            return torch.round(tactile_signals * self.num_levels).to(torch.uint8)
+        return tactile_signals
+
+    def decode(self, codes: torch.Tensor) -> torch.Tensor:
+        # (..., encoded_dim) codes -> (..., tactile_dim) float, works on whole padded batches
+        if self.scheme in ("binary", "binary_shared"):
+            bits = (codes.unsqueeze(-1) & self._bit_weights) != 0
+            bits = bits.reshape(*codes.shape[:-1], -1)[..., :self.stored_channels * self.channel_dim].float()
+            if self.stored_channels != self.num_channels:
+                bits = bits.unsqueeze(-2).expand(*codes.shape[:-1], self.num_channels, self.channel_dim)
+            return bits.reshape(*codes.shape[:-1], self.tactile_dim)
+        elif self.scheme == "levels":
+            # same rounding as the discretization in the observation term: level * (1 / num_levels)
+            return codes.float() * (1.0 / self.num_levels)
+        return codes
+
+    def check(self, tactile_signals: torch.Tensor, codes: torch.Tensor):
+        # makes sure that the configured scheme stores the signals losslessly (synchronizes, so it is not run at every step)
+        if self.scheme != "float" and not torch.allclose(self.decode(codes), tactile_signals, rtol=0.0, atol=self.tolerance):
+            raise ValueError(
+                f"Tactile signals can not be stored losslessly with the '{self.scheme}' scheme."
+                " Set 'tactile_storage' in the distillation configuration to match the tactile observation, or to 'float'.")
+
+    def state_dict(self):
+        # saved with on-disk datasets, which are decoded with the same scheme when they are loaded again
+        return dict(scheme=self.scheme, num_channels=self.num_channels, tactile_dim=self.tactile_dim,
+                    num_levels=self.num_levels, stored_channels=self.stored_channels)
+
+    def load_state_dict(self, state_dict: dict, device=None):
+        for key, value in state_dict.items():
+            setattr(self, key, value)
+        if self.scheme in ("binary", "binary_shared"):
+            self._bit_weights = torch.tensor([128, 64, 32, 16, 8, 4, 2, 1], dtype=torch.uint8, device=device)
+
+    @property
+    def fitted(self):
+        return self.tactile_dim is not None
+
+    @property
+    def channel_dim(self):
+        return self.tactile_dim // self.num_channels
+
+    @property
+    def num_bytes(self):
+        return math.ceil(self.stored_channels * self.channel_dim / 8)
+
+    @property
+    def encoded_bytes_per_step(self):
+        if self.scheme in ("binary", "binary_shared"):
+            return self.num_bytes
+        elif self.scheme == "levels":
+            return self.tactile_dim
+        return self.tactile_dim * 4
+
+    @property
+    def compression_ratio(self):
+        return self.tactile_dim * 4 / self.encoded_bytes_per_step
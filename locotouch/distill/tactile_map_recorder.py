@@ -0,0 +1,71 @@
+import torch
+from isaaclab.utils.math import quat_apply_inverse, quat_inv, quat_mul
+from locotouch.mdp.observations import object_geometry
+
+
+class TactileMapRecorder:
+    # records the normal-force maps of the per-taxel contact sensors with the pose and the net contact force of the object,
+    # all in the frame of the sensor plate body (trunk), and saves them in the format read by
+    # locotouch/scripts/evaluate_tactile_surrogate.py. The samples of the recorded envs are stacked along the first dim.
+    def __init__(
+        self,
+        env,
+        path: str,
+        num_steps: int = 500,
+        num_envs: int = 16,
+        tactile_signal_shape: tuple = (17, 13),
+        robot_name: str = "robot",
+        plate_body_name: str = "trunk",
+        tactile_sensor_name: str = "tactile_contact_sensor",
+        object_name: str = "object",
+        object_sensor_name: str = "object_contact_sensor",
+        ):
+        scene = env.unwrapped.scene
+        self.path = path
+        self.num_steps = num_steps
+        self.tactile_signal_shape = tuple(tactile_signal_shape)
+        self.robot = scene[robot_name]
+        self.plate_id = self.robot.find_bodies(plate_body_name)[0][0]
+        if tactile_sensor_name not in scene.sensors.keys():
+            raise ValueError(f"Recording the tactile maps requires the per-taxel contact sensors '{tactile_sensor_name}'.")
+        self.tactile_sensor = scene.sensors[tactile_sensor_name]
+        self.sensor_taxel_ids = self.tactile_sensor.find_bodies("sensor_.*")[0]
+        self.taxel_ids = self.robot.find_bodies("sensor_.*")[0]
+        self.object = scene[object_name]
+        self.object_sensor = scene.sensors[object_sensor_name]
+        self.env_ids = torch.arange(min(num_envs, scene.num_envs), device=scene.device)
+        object_shape, object_size, cylinder_axis = object_geometry(getattr(env.unwrapped.cfg.scene, object_name).spawn, scene.num_envs)
+        self.geometry = dict(object_shape=object_shape, object_size=object_size[self.env_ids.cpu()], cylinder_axis=cylinder_axis)
+        self.samples = dict(normal_forces=[], object_pos=[], object_quat=[], object_force=[])
+        self.recorded_steps = 0
+
+    @property
+    def done(self):
+        return self.recorded_steps >= self.num_steps
+
+    def record(self):
+        # called after each env step until num_steps are recorded, then the recording is saved
+        if self.done:
+            return
+        env_ids = self.env_ids
+        # the normal forces of the taxels as in TactileSignals.compute_normal_forces
+        taxel_forces_w = self.tactile_sensor.data.net_forces_w[env_ids][:, self.sensor_taxel_ids]
+        taxel_quat_w = self.robot.data.body_quat_w[env_ids][:, self.taxel_ids]
+        normal_forces = -quat_apply_inverse(taxel_quat_w, taxel_forces_w)[..., 2]
+        plate_pos_w = self.robot.data.body_pos_w[env_ids, self.plate_id]
+        plate_quat_w = self.robot.data.body_quat_w[env_ids, self.plate_id]
+        object_force_w = self.object_sensor.data.net_forces_w[env_ids].sum(dim=1)
+        self.samples["normal_forces"].append(normal_forces.view(-1, *self.tactile_signal_shape).cpu())
+        self.samples["object_pos"].append(quat_apply_inverse(plate_quat_w, self.object.data.root_pos_w[env_ids] - plate_pos_w).cpu())
+        self.samples["object_quat"].append(quat_mul(quat_inv(plate_quat_w), self.object.data.root_quat_w[env_ids]).cpu())
+        self.samples["object_force"].append(quat_apply_inverse(plate_quat_w, object_force_w).cpu())
+        self.recorded_steps += 1
+        if self.done:
+            self.save()
+
+    def save(self):
+        recording = {key: torch.cat(values) for key, values in self.samples.items()}
+        recording.update(self.geometry)
+        recording["object_size"] = recording["object_size"].repeat(self.recorded_steps, 1)
+        torch.save(recording, self.path)
+        print(f"[INFO] Saved {recording['normal_forces'].shape[0]} tactile maps to: {self.path}")
@@ -2,15 +2,18 @@ import torch
 
 
 class TactileRecorder:
+    # circular buffer of the latest max_delay tactile signals per env with a shared write head, nothing is shifted per step:
+    # the signal recorded delay steps ago is at slot (head - delay) % max_delay. Right after a reset, the delay is clamped
+    # to the number of recorded signals, which returns the first signal exactly as back-filling the whole buffer would.
     def __init__(self, device, env_num, tactile_shape, min_delay=3, max_delay=7):
         self.device = device
         self.env_num = env_num
         self.tactile_shape = (tactile_shape,) if isinstance(tactile_shape, int) else tactile_shape
         self.min_delay = min_delay
         self.max_delay = max_delay
-        self.tactile_expand_shape = (-1, self.max_delay, *self.tactile_shape)
         self.tactile_buffer = torch.zeros((self.env_num, self.max_delay, *self.tactile_shape), dtype=torch.float32, device=self.device)
-        self.first_signal_recorded = torch.ones((self.env_num,), dtype=torch.bool, device=self.device)
+        self.head = self.max_delay - 1  # slot of the latest signal
+        self.recorded_steps = torch.zeros((self.env_num,), dtype=torch.long, device=self.device)  # saturates at max_delay
         self.delay_steps = torch.zeros((self.env_num,), dtype=torch.long, device=self.device)
         self.env_idx = torch.arange(env_num, device=self.device)
         self.reset()
@@ -18,18 +21,14 @@ class TactileRecorder:
     def reset(self, env_idx=None):
         env_idx = env_idx if env_idx is not None else self.env_idx
         self.tactile_buffer[env_idx] = 0.0
-        self.first_signal_recorded[env_idx] = True
+        self.recorded_steps[env_idx] = 0
         self.delay_steps[env_idx] = torch.randint(low=self.min_delay, high=self.max_delay, size=(env_idx.shape), device=self.device)
 
     def record_new_tactile_signals(self, tactile_signals: torch.Tensor):
-        self.tactile_buffer[:, 1:] = self.tactile_buffer[:, :-1].clone()
-        self.tactile_buffer[:, 0] = tactile_signals.clone()
-        
-        if self.first_signal_recorded.any():
-            first_signal_idx = self.first_signal_recorded.nonzero(as_tuple=False).flatten()
-            self.tactile_buffer[first_signal_idx] = tactile_signals[first_signal_idx].unsqueeze(1).expand(self.tactile_expand_shape).clone()
-            self.first_signal_recorded[first_signal_idx] = False
+        self.head = (self.head + 1) % self.max_delay
+        self.tactile_buffer[:, self.head].copy_(tactile_signals)
+        self.recorded_steps.add_(1).clamp_(max=self.max_delay)
 
     def get_tactile_signals(self):
-        return self.tactile_buffer[self.env_idx, self.delay_steps]
-
+        delay_steps = torch.minimum(self.delay_steps, (self.recorded_steps - 1).clamp_(min=0))
+        return self.tactile_buffer[self.env_idx, (self.head - delay_steps) % self.max_delay]
@@ -0,0 +1,101 @@
+import numpy as np
+import torch
+
+
+class TrajectoryStore:
+    # contiguous storage of variable-length trajectories:
+    # each field is a flat (capacity, *field_shape) tensor in which the steps of one trajectory are stored consecutively,
+    # and the trajectories are located by an offset/length index
+    def __init__(self, device, capacity: int = 0, growth_factor: float = 1.5):
+        self._device = device
+        self._capacity = capacity
+        self._growth_factor = growth_factor
+        self._fields: dict[str, torch.Tensor] = {}
+        self._traj_starts = np.zeros(0, dtype=np.int64)
+        self._traj_lengths = np.zeros(0, dtype=np.int64)
+        self._traj_scores = np.zeros(0, dtype=np.float64)
+        self._num_trajs = 0
+        self._num_steps = 0
+
+    def append(self, fields: dict[str, torch.Tensor], lengths: np.ndarray, traj_scores: np.ndarray = None):
+        # fields: flat tensors of shape (lengths.sum(), *field_shape), trajectories concatenated in the order of lengths
+        # traj_scores are only used for the eviction of DiskTrajectoryStore, all trajectories are kept in memory
+        lengths = np.asarray(lengths, dtype=np.int64)
+        num_new_steps = int(lengths.sum())
+        if num_new_steps == 0:
+            return
+        self._reserve_steps(self._num_steps + num_new_steps, fields)
+        for name, data in fields.items():
+            self._fields[name][self._num_steps:self._num_steps + num_new_steps] = data
+        self._reserve_trajs(self._num_trajs + len(lengths))
+        self._traj_starts[self._num_trajs:self._num_trajs + len(lengths)] = self._num_steps + np.cumsum(lengths) - lengths
+        self._traj_lengths[self._num_trajs:self._num_trajs + len(lengths)] = lengths
+        self._traj_scores[self._num_trajs:self._num_trajs + len(lengths)] = 0.0 if traj_scores is None else traj_scores
+        self._num_trajs += len(lengths)
+        self._num_steps += num_new_steps
+
+    def gather(self, traj_indices: np.ndarray):
+        # returns padded fields of shape (max_length, num_trajs, *field_shape), valid-step masks and the lengths (on cpu)
+        lengths = self._traj_lengths[traj_indices]
+        max_length = int(lengths.max())
+        starts = torch.as_tensor(self._traj_starts[traj_indices], device=self._device)
+        lengths_device = torch.as_tensor(lengths, device=self._device)
+        time_idx = torch.arange(max_length, device=self._device).unsqueeze(1)  # (max_length, 1)
+        masks = time_idx < lengths_device.unsqueeze(0)  # (max_length, num_trajs)
+        # padded steps read the last valid step of the trajectory and are zeroed afterwards
+        step_idx = starts.unsqueeze(0) + torch.minimum(time_idx, lengths_device.unsqueeze(0) - 1)
+        padded_fields = {}
+        for name, data in self._fields.items():
+            padded = data[step_idx]
+            padded.masked_fill_(~masks.view(*masks.shape, *([1] * (padded.dim() - 2))), 0)
+            padded_fields[name] = padded
+        return padded_fields, masks, torch.from_numpy(lengths)
+
+    def flush(self, is_bc: bool = False):
+        # appended trajectories are readable immediately, nothing to write
+        pass
+
+    def export(self):
+        # copies of all stored steps and the trajectory index, in the format of append()
+        fields = {name: data[:self._num_steps].clone() for name, data in self._fields.items()}
+        return fields, self.traj_lengths.copy(), self._traj_scores[:self._num_trajs].copy()
+
+    def clear(self):
+        # keep the allocated memory for the next collection
+        self._num_trajs = 0
+        self._num_steps = 0
+
+    def _reserve_steps(self, num_steps: int, fields: dict[str, torch.Tensor]):
+        if not self._fields:
+            self._capacity = max(self._capacity, num_steps)
+            for name, data in fields.items():
+                self._fields[name] = torch.zeros((self._capacity, *data.shape[1:]), dtype=data.dtype, device=self._device)
+        elif num_steps > self._capacity:
+            self._capacity = max(num_steps, int(self._capacity * self._growth_factor))
+            for name, data in self._fields.items():
+                grown = torch.zeros((self._capacity, *data.shape[1:]), dtype=data.dtype, device=self._device)
+                grown[:self._num_steps] = data[:self._num_steps]
+                self._fields[name] = grown
+
+    def _reserve_trajs(self, num_trajs: int):
+        if num_trajs > len(self._traj_lengths):
+            new_size = max(num_trajs, int(len(self._traj_lengths) * self._growth_factor), 1024)
+            self._traj_starts = np.resize(self._traj_starts, new_size)
+            self._traj_lengths = np.resize(self._traj_lengths, new_size)
+            self._traj_scores = np.resize(self._traj_scores, new_size)
+
+    @property
+    def traj_lengths(self):
+        return self._traj_lengths[:self._num_trajs]
+
+    @property
+    def field_names(self):
+        return list(self._fields.keys())
+
+    @property
+    def num_trajs(self):
+        return self._num_trajs
+
+    @property
+    def num_steps(self):
+        return self._num_steps
@@ -2,73 +2,124 @@ from __future__ import annotations
 import torch
 import torch.nn.functional as F
 from typing import TYPE_CHECKING
+import isaaclab.sim as sim_utils
 from isaaclab.assets import RigidObject
 from isaaclab.managers import SceneEntityCfg, ManagerTermBase, ObservationTermCfg
 from isaaclab.sensors import ContactSensor
-from isaaclab.utils.math import quat_inv, quat_mul, quat_apply_inverse, quat_from_euler_xyz
+from isaaclab.utils.math import quat_inv, quat_mul, quat_apply, quat_apply_inverse, quat_from_euler_xyz, quat_error_magnitude
+from locotouch.utils.urdf_processor.generate_locotouch_urdf import URDFCfg
+from .tactile_noise import apply_tactile_noise
+from .tactile_surrogate import AnalyticTactileSurrogate
 if TYPE_CHECKING:
     from isaaclab.envs import ManagerBasedEnv, ManagerBasedRLEnv
 
 
 # ----------------- Object State -----------------
-def object_state_in_robot_frame(
-    env: ManagerBasedRLEnv,
-    robot_cfg: SceneEntityCfg = SceneEntityCfg("robot"),
-    object_cfg: SceneEntityCfg = SceneEntityCfg("object"),
-    sensor_cfg: SceneEntityCfg = SceneEntityCfg("object_contact_sensor", body_names="Object"),
-    last_contact_time_threshold: float = 0.00001,
-    current_contact_time_threshold: float = 0.00001,
-    non_contact_obs: list = [0.0]*13,
-    add_uniform_noise: bool = False,
-    n_min = -0.03,
-    n_max = 0.03,
-    scale = 1.0,
-    ) -> torch.Tensor:
-    # compute the state of the object in the robot frame
-    robot: RigidObject = env.scene[robot_cfg.name]
-    obj: RigidObject = env.scene[object_cfg.name]
-    robot_quat_w = robot.data.root_quat_w
-    pos_in_robot_frame = quat_apply_inverse(robot_quat_w, obj.data.root_pos_w - robot.data.root_pos_w)
-    lin_vel_in_robot_frame =  quat_apply_inverse(robot_quat_w, obj.data.root_lin_vel_w - robot.data.root_lin_vel_w)
-    quat_in_robot_frame = quat_mul(quat_inv(robot_quat_w), obj.data.root_quat_w)
-    ang_vel_in_robot_frame = quat_apply_inverse(robot_quat_w, obj.data.root_ang_vel_w - robot.data.root_ang_vel_w)
-    state_in_robot_frame = torch.cat([pos_in_robot_frame, lin_vel_in_robot_frame, quat_in_robot_frame, ang_vel_in_robot_frame], dim=-1)
-
-    # compute whether the object have made the first contact
-    object_contact_sensor: ContactSensor = env.scene.sensors[sensor_cfg.name]
-    last_contact_time = object_contact_sensor.data.last_contact_time
-    current_contact_time = object_contact_sensor.data.current_contact_time
-    non_first_contact = torch.logical_and(last_contact_time < last_contact_time_threshold, current_contact_time < current_contact_time_threshold)
-    non_contact_env_num = non_first_contact.sum()
-    non_first_contact_env_index = non_first_contact.nonzero(as_tuple=True)[0]
-    non_contact_obs = torch.tensor(non_contact_obs, device=robot_quat_w.device)
-    if non_contact_env_num > 0:
-        non_contact_obs = non_contact_obs.repeat(non_contact_env_num, 1)
-    if add_uniform_noise:
-        euler_angle_min = n_min if isinstance(n_min, float) else torch.tensor(n_min[6:9], device=robot_quat_w.device)
-        euler_angle_max = n_max if isinstance(n_max, float) else torch.tensor(n_max[6:9], device=robot_quat_w.device)
-        if not isinstance(n_min, float):
-            n_min = torch.tensor(n_min[0:6]+[0.0]*4+n_min[9::], device=robot_quat_w.device)  # mask euler angles
-            n_max = torch.tensor(n_max[0:6]+[0.0]*4+n_max[9::], device=robot_quat_w.device)  # mask euler angles
-        state_in_robot_frame += torch.rand_like(state_in_robot_frame) * (n_max - n_min) + n_min
-        delta_euler_xyz = torch.rand(size=(robot_quat_w.shape[0], 3), device=robot_quat_w.device) * (euler_angle_max - euler_angle_min) + euler_angle_min
-        noisy_quat = quat_from_euler_xyz(delta_euler_xyz[:, 0], delta_euler_xyz[:, 1], delta_euler_xyz[:, 2])
-        state_in_robot_frame[:, 6:10] = quat_mul(state_in_robot_frame[:, 6:10], noisy_quat)
-        if non_contact_env_num > 0:
-            non_contact_obs += torch.rand_like(non_contact_obs) * (n_max - n_min) + n_min
-            non_contact_obs[:, 6:10] = quat_mul(non_contact_obs[:, 6:10], noisy_quat[non_first_contact_env_index])
-
-    scale = scale if isinstance(scale, float) else torch.tensor(scale, device=robot_quat_w.device)
-    state_in_robot_frame *= scale
-    if non_contact_env_num > 0:
-        non_contact_obs *= scale
-        state_in_robot_frame[non_first_contact_env_index] = non_contact_obs
-
-    return state_in_robot_frame
+class ObjectStateInRobotFrame(ManagerTermBase):
+    def __init__(self, cfg: ObservationTermCfg, env: ManagerBasedEnv):
+        super().__init__(cfg, env)
+        self.robot_cfg: SceneEntityCfg = cfg.params.get("robot_cfg", SceneEntityCfg("robot"))
+        self.object_cfg: SceneEntityCfg = cfg.params.get("object_cfg", SceneEntityCfg("object"))
+        self.sensor_cfg: SceneEntityCfg = cfg.params.get("sensor_cfg", SceneEntityCfg("object_contact_sensor", body_names="Object"))
+        self.robot: RigidObject = env.scene[self.robot_cfg.name]
+        self.object: RigidObject = env.scene[self.object_cfg.name]
+        self.object_contact_sensor: ContactSensor = env.scene.sensors[self.sensor_cfg.name]
+        self.last_contact_time_threshold: float = cfg.params.get("last_contact_time_threshold", 0.00001)
+        self.current_contact_time_threshold: float = cfg.params.get("current_contact_time_threshold", 0.00001)
+        device = self.robot.device
+
+        # constant tensors, built once
+        scale = cfg.params.get("scale", 1.0)
+        self.scale = scale if isinstance(scale, float) else torch.tensor(scale, device=device)
+        self.non_contact_obs = torch.tensor(cfg.params.get("non_contact_obs", [0.0]*13), device=device)
+        self.scaled_non_contact_obs = self.non_contact_obs * self.scale
+        self.add_uniform_noise: bool = cfg.params.get("add_uniform_noise", False)
+        if self.add_uniform_noise:
+            n_min, n_max = cfg.params.get("n_min", -0.03), cfg.params.get("n_max", 0.03)
+            self.euler_angle_min = n_min if isinstance(n_min, float) else torch.tensor(n_min[6:9], device=device)
+            self.euler_angle_max = n_max if isinstance(n_max, float) else torch.tensor(n_max[6:9], device=device)
+            if not isinstance(n_min, float):
+                n_min = torch.tensor(n_min[0:6]+[0.0]*4+n_min[9::], device=device)  # mask euler angles
+                n_max = torch.tensor(n_max[0:6]+[0.0]*4+n_max[9::], device=device)  # mask euler angles
+            self.n_min, self.n_range = n_min, n_max - n_min
+            self.euler_angle_range = self.euler_angle_max - self.euler_angle_min
+
+    def __call__(
+        self,
+        env: ManagerBasedRLEnv,
+        robot_cfg: SceneEntityCfg = SceneEntityCfg("robot"),
+        object_cfg: SceneEntityCfg = SceneEntityCfg("object"),
+        sensor_cfg: SceneEntityCfg = SceneEntityCfg("object_contact_sensor", body_names="Object"),
+        last_contact_time_threshold: float = 0.00001,
+        current_contact_time_threshold: float = 0.00001,
+        non_contact_obs: list = [0.0]*13,
+        add_uniform_noise: bool = False,
+        n_min = -0.03,
+        n_max = 0.03,
+        scale = 1.0,
+        ) -> torch.Tensor:
+        # compute the state of the object in the robot frame
+        robot, obj = self.robot, self.object
+        robot_quat_w = robot.data.root_quat_w
+        pos_in_robot_frame = quat_apply_inverse(robot_quat_w, obj.data.root_pos_w - robot.data.root_pos_w)
+        lin_vel_in_robot_frame =  quat_apply_inverse(robot_quat_w, obj.data.root_lin_vel_w - robot.data.root_lin_vel_w)
+        quat_in_robot_frame = quat_mul(quat_inv(robot_quat_w), obj.data.root_quat_w)
+        ang_vel_in_robot_frame = quat_apply_inverse(robot_quat_w, obj.data.root_ang_vel_w - robot.data.root_ang_vel_w)
+        state_in_robot_frame = torch.cat([pos_in_robot_frame, lin_vel_in_robot_frame, quat_in_robot_frame, ang_vel_in_robot_frame], dim=-1)
+
+        # compute whether the object have made the first contact: (N, 1)
+        last_contact_time = self.object_contact_sensor.data.last_contact_time
+        current_contact_time = self.object_contact_sensor.data.current_contact_time
+        non_first_contact = torch.logical_and(last_contact_time < self.last_contact_time_threshold,
+                                              current_contact_time < self.current_contact_time_threshold).any(dim=-1, keepdim=True)
+
+        non_contact_state = self.scaled_non_contact_obs
+        if self.add_uniform_noise:
+            state_noise = torch.rand_like(state_in_robot_frame).mul_(self.n_range).add_(self.n_min)
+            state_in_robot_frame += state_noise
+            delta_euler_xyz = torch.rand(size=(robot_quat_w.shape[0], 3), device=robot_quat_w.device).mul_(self.euler_angle_range).add_(self.euler_angle_min)
+            noisy_quat = quat_from_euler_xyz(delta_euler_xyz[:, 0], delta_euler_xyz[:, 1], delta_euler_xyz[:, 2])
+            state_in_robot_frame[:, 6:10] = quat_mul(state_in_robot_frame[:, 6:10], noisy_quat)
+            # the placeholder reuses the noise of the (discarded) state of the non-contact envs
+            non_contact_state = self.non_contact_obs + state_noise
+            non_contact_state[:, 6:10] = quat_mul(non_contact_state[:, 6:10], noisy_quat)
+            non_contact_state *= self.scale
+
+        state_in_robot_frame *= self.scale
+        return torch.where(non_first_contact, non_contact_state, state_in_robot_frame)
 
 
 # ----------------- Tactile Signals -----------------
+# stages of the tactile pipeline, each stage is computed from the previous ones
+TACTILE_STAGES = ("contact", "normalized", "min_max", "discretized")
+# thickness of the taxel collision boxes in the urdf templates
+TAXEL_THICKNESS = 0.001
+
+
+def object_geometry(spawn_cfg, num_envs: int) -> tuple[str, torch.Tensor, int]:
+    # shape, size per env and cylinder axis of the spawned objects, for the analytic tactile surrogate
+    if isinstance(spawn_cfg, sim_utils.MultiAssetSpawnerCfg):
+        if spawn_cfg.random_choice:
+            raise ValueError("The analytic tactile surrogate requires the objects of the envs to be known (random_choice=False).")
+        assets_cfg = [spawn_cfg.assets_cfg[i % len(spawn_cfg.assets_cfg)] for i in range(num_envs)]
+    else:
+        assets_cfg = [spawn_cfg] * num_envs
+    if all(isinstance(asset_cfg, sim_utils.CylinderCfg) for asset_cfg in assets_cfg):
+        if len(set(asset_cfg.axis for asset_cfg in assets_cfg)) > 1:
+            raise ValueError("The analytic tactile surrogate requires the same axis for all the cylinders.")
+        sizes = [[asset_cfg.radius, asset_cfg.height] for asset_cfg in assets_cfg]
+        return "cylinder", torch.tensor(sizes), "XYZ".index(assets_cfg[0].axis)
+    if all(isinstance(asset_cfg, sim_utils.CuboidCfg) for asset_cfg in assets_cfg):
+        return "box", torch.tensor([list(asset_cfg.size) for asset_cfg in assets_cfg]), 1
+    raise ValueError("The analytic tactile surrogate only supports objects that are all cylinders or all cuboids.")
+
+
 class TactileSignals(ManagerTermBase):
+    # the stages returned as channels, and whether the sensor noise (dropout, addition, force noise) is applied
+    # the base term returns all the stages of the original signals, just for evaluation
+    channels: tuple = TACTILE_STAGES
+    noisy: bool = False
+
     def __init__(self, cfg: ObservationTermCfg, env: ManagerBasedEnv):
         super().__init__(cfg, env)
         self.asset_cfg: SceneEntityCfg = cfg.params.get("asset_cfg")
@@ -78,19 +129,46 @@ class TactileSignals(ManagerTermBase):
         tactile_signal_shape: tuple = cfg.params.get("tactile_signal_shape")
         self.tactile_signals_shape = (self.num_envs, tactile_signal_shape[0], tactile_signal_shape[1])
 
-        # Original signals
-        self.original_contact_taxels: torch.Tensor = torch.zeros(self.tactile_signals_shape, device=self.asset.device, dtype=torch.bool)
-        self.original_normal_forces: torch.Tensor = torch.zeros_like(self.original_contact_taxels, dtype=torch.float)
-        self.original_normalized_forces: torch.Tensor = torch.zeros_like(self.original_contact_taxels, dtype=torch.float)
-        self.original_min_max_normalized_signals: torch.Tensor = torch.zeros_like(self.original_contact_taxels, dtype=torch.float)
-        self.original_discretized_signals: torch.Tensor = torch.zeros_like(self.original_contact_taxels, dtype=torch.float)
-
-        # Processed signals
-        self.processed_contact_taxels: torch.Tensor = torch.zeros_like(self.original_contact_taxels, dtype=torch.bool)
-        self.processed_normal_forces: torch.Tensor = torch.zeros_like(self.original_contact_taxels, dtype=torch.float)
-        self.processed_normalized_forces: torch.Tensor = torch.zeros_like(self.original_contact_taxels, dtype=torch.float)
-        self.processed_min_max_normalized_signals: torch.Tensor = torch.zeros_like(self.original_contact_taxels, dtype=torch.float)
-        self.processed_discretized_signals: torch.Tensor = torch.zeros_like(self.original_contact_taxels, dtype=torch.float)
+        # Stages: the pipeline stops at the last stage of the returned channels
+        channel_ids = [TACTILE_STAGES.index(channel) for channel in self.channels]
+        self.last_stage: int = max(channel_ids)
+        self.returns_all_stages: bool = channel_ids == list(range(self.last_stage + 1))
+        self.channel_ids = torch.tensor(channel_ids, device=self.asset.device)
+
+        # Preallocated buffers: the stages are written in place into one (N, stages, rows, cols) tensor
+        self.stages: torch.Tensor = torch.zeros((self.num_envs, self.last_stage + 1, *tactile_signal_shape), device=self.asset.device)
+        self.output: torch.Tensor | None = None
+        if not self.returns_all_stages:
+            self.output = torch.zeros((self.num_envs, len(channel_ids), *tactile_signal_shape), device=self.asset.device)
+        self.contact_taxels: torch.Tensor = torch.zeros(self.tactile_signals_shape, device=self.asset.device, dtype=torch.bool)
+        self.normal_forces: torch.Tensor = torch.zeros(self.tactile_signals_shape, device=self.asset.device)
+        self.noise: torch.Tensor = torch.zeros(self.tactile_signals_shape, device=self.asset.device)
+        self.noise_mask: torch.Tensor = torch.zeros_like(self.contact_taxels)
+
+        # Normal Projection
+        self.single_rotation: bool = cfg.params.get("single_rotation", False)
+        if self.single_rotation:
+            self.check_single_rotation()
+            self.sensor_normal: torch.Tensor = torch.tensor([0.0, 0.0, -1.0], device=self.asset.device).repeat(self.num_envs, 1)
+
+        # Analytic Surrogate: for the robot without tactile sensors, the asset_cfg is the plate body (trunk) and
+        # the sensor_cfg is one contact sensor reading the force of the object (e.g. the object contact sensor)
+        self.analytic_surrogate: bool = cfg.params.get("analytic_surrogate", False)
+        if self.analytic_surrogate:
+            self.object_cfg: SceneEntityCfg = cfg.params.get("object_cfg")
+            self.object: RigidObject = env.scene[self.object_cfg.name]
+            object_shape, object_size, cylinder_axis = object_geometry(getattr(env.cfg.scene, self.object_cfg.name).spawn, self.num_envs)
+            self.surrogate = AnalyticTactileSurrogate(
+                self.num_envs,
+                tactile_signal_shape,
+                # the taxels are centered on the surface of the plate
+                URDFCfg.first_sensor_position[:2] + [URDFCfg.first_sensor_position[2] + 0.5 * TAXEL_THICKNESS],
+                URDFCfg.row_distance,
+                URDFCfg.column_distance,
+                object_shape,
+                object_size,
+                cylinder_axis=cylinder_axis,
+                device=self.asset.device)
 
         # Contact Taxels
         self.contact_threshold: float = cfg.params.get("contact_threshold")
@@ -127,99 +205,71 @@ class TactileSignals(ManagerTermBase):
             self.level_n_min: float = cfg.params.get("level_n_min")
             self.level_n_max: float = cfg.params.get("level_n_max")
 
-    def get_original_signals(self):
+    def check_single_rotation(self, max_angle: float = 1e-3):
+        # the taxels are attached to the same plate with the same orientation (see generate_locotouch_urdf.py),
+        # so the rotation of the first taxel can be used for all of them
+        sensor_quat_w = self.asset.data.body_quat_w[:, self.asset_cfg.body_ids]
+        angles = quat_error_magnitude(sensor_quat_w, sensor_quat_w[:, :1].expand_as(sensor_quat_w))
+        if angles.max().item() > max_angle:
+            raise ValueError(f"The tactile sensors of '{self.asset_cfg.name}' have different orientations (max angle: "
+                             f"{angles.max().item():.2e} rad), the single rotation projection cannot be used.")
+
+    def compute_normal_forces(self):
         # get the normal forces in local sensor frame
-        self.original_normal_forces[:] = -quat_apply_inverse(
-            self.asset.data.body_quat_w[:, self.asset_cfg.body_ids][:, :, :],
-            self.contact_sensor.data.net_forces_w[:, self.sensor_cfg.body_ids])[..., 2].reshape(self.tactile_signals_shape)
-        self.original_contact_taxels[:] = self.original_normal_forces > self.contact_threshold_envs_sensors
-
-    def process_original_signals(self):
-        self.original_normalized_forces[:] = torch.clamp(self.original_normal_forces / self.maximal_force, 0.0, 1.0)
-        _, self.original_min_max_normalized_signals[:] = self.compute_min_max_normalized_signals(self.original_contact_taxels, self.original_normalized_forces)
-        _, self.original_discretized_signals[:] = self.compute_discretized_signals(self.original_contact_taxels, self.original_min_max_normalized_signals)
-
-    def get_normal_forces(self):
-        self.get_original_signals()
-        contact_taxels, normal_forces = self.original_contact_taxels.clone(), self.original_normal_forces.clone()
-
-        # apply contact dropout:
-        # dropout some contact taxels, make their forces to be [0, contact_threshold]
-        if self.contact_dropout_prob > 0.0:
-            dropout_mask = torch.rand_like(contact_taxels.float()) < self.contact_dropout_prob
-            dropout_taxels = torch.logical_and(contact_taxels, dropout_mask)
-            normal_forces[dropout_taxels] = torch.rand_like(normal_forces[dropout_taxels]) * self.contact_threshold_envs_sensors[dropout_taxels]
-            contact_taxels[dropout_taxels] = False
-
-        # apply contact addition:
-        # add some non contact taxels, make their forces to be [contact_threshold, 1.2*contact_threshold]
-        if self.contact_addition_prob > 0.0:
-            addition_mask = torch.rand_like(contact_taxels.float()) < self.contact_addition_prob
-            addition_taxels = torch.logical_and(~contact_taxels, addition_mask)
-            # print(f"addition_taxels: {addition_taxels.sum()}")
-            normal_forces[addition_taxels] = self.contact_threshold_envs_sensors[addition_taxels] * (1.0 + 0.2*torch.rand_like(normal_forces[addition_taxels]))
-            contact_taxels[addition_taxels] = True
-
-        # apply force noise
-        if self.add_force_noise:
-            normal_forces[contact_taxels] *= 1.0 + (torch.rand_like(normal_forces[contact_taxels]) * (self.force_n_prop_max - self.force_n_prop_min) + self.force_n_prop_min)
-            normal_forces = torch.clamp(normal_forces, min=0.0)
-
-            too_small_forces = torch.logical_and(contact_taxels, normal_forces < self.contact_threshold_envs_sensors)
-            normal_forces[too_small_forces] = self.contact_threshold_envs_sensors[too_small_forces] * (1.0 + 0.2*torch.rand_like(normal_forces[too_small_forces]))
-
-        # save to processed signals
-        self.processed_contact_taxels = contact_taxels.clone()
-        self.processed_normal_forces = normal_forces
-
-        return contact_taxels, normal_forces
-
-    def get_normalized_forces(self):
-        contact_taxels, normal_forces = self.get_normal_forces()
-        normalized_forces = torch.clamp(normal_forces / self.maximal_force, 0.0, 1.0)
-        self.processed_normalized_forces = normalized_forces.clone()
-        return contact_taxels, normalized_forces
-
-    def compute_min_max_normalized_signals(self, contact_taxels, normalized_forces):
-        valid_normalized_forces = torch.where(contact_taxels, normalized_forces, torch.zeros_like(normalized_forces))
-        # Get the min and max forces for each env
-        flat_forces = valid_normalized_forces.view(valid_normalized_forces.shape[0], -1)
-        min_forces = flat_forces.min(dim=-1, keepdim=True)[0].unsqueeze(-1)  # (N, 1, 1)
-        max_forces = flat_forces.max(dim=-1, keepdim=True)[0].unsqueeze(-1)  # (N, 1, 1)
-
-        # Compute range and avoid division by zero
-        force_range = torch.where((max_forces - min_forces) > 0.0,
-                                max_forces - min_forces,
-                                torch.ones_like(max_forces))  # (N, 1, 1)
-
-        # Normalize and clamp
-        normalized_signals = (valid_normalized_forces - min_forces) / force_range
-        normalized_signals = torch.clamp(normalized_signals, 0.0, 1.0)
-        return contact_taxels, normalized_signals
-
-    def compute_discretized_signals(self, contact_taxels, normalized_signals):
-        # Uniform Discretization
-        discrete_bin = 1.0 / self.total_levels
-        discretized_signals = torch.round(normalized_signals / discrete_bin)
-        if self.add_level_noise:
-            level_noise = torch.rand_like(discretized_signals) * (self.level_n_max - self.level_n_min) + self.level_n_min
-            discretized_signals = discretized_signals + level_noise
-        discretized_signals *= discrete_bin
-        discretized_signals = torch.clamp(discretized_signals, 0.0, 1.0)
-        discretized_signals[~contact_taxels] = 0.0
-        return contact_taxels, discretized_signals
-
-    def get_min_max_normalized_signals(self):
-        contact_taxels, normalized_forces = self.get_normalized_forces()
-        contact_taxels, min_max_normalized_signals = self.compute_min_max_normalized_signals(contact_taxels, normalized_forces)
-        self.processed_min_max_normalized_signals = min_max_normalized_signals.clone()
-        return contact_taxels, min_max_normalized_signals
-
-    def get_discretized_signals(self):
-        contact_taxels, min_max_normalized_signals = self.get_min_max_normalized_signals()
-        contact_taxels, discretized_signals = self.compute_discretized_signals(contact_taxels, min_max_normalized_signals)
-        self.processed_discretized_signals = discretized_signals.clone()
-        return contact_taxels, discretized_signals
+        net_forces_w = self.contact_sensor.data.net_forces_w[:, self.sensor_cfg.body_ids]
+        if self.analytic_surrogate:
+            plate_id = self.asset_cfg.body_ids[0]
+            self.surrogate(
+                self.asset.data.body_pos_w[:, plate_id], self.asset.data.body_quat_w[:, plate_id],
+                self.object.data.root_pos_w, self.object.data.root_quat_w, net_forces_w.sum(dim=1), out=self.normal_forces)
+        elif self.single_rotation:
+            # project the forces on the (negative) normal of the plate, rotated once per env
+            sensor_normal_w = quat_apply(self.asset.data.body_quat_w[:, self.asset_cfg.body_ids[0]], self.sensor_normal)
+            torch.bmm(net_forces_w, sensor_normal_w.unsqueeze(-1), out=self.normal_forces.view(self.num_envs, -1, 1))
+        else:
+            torch.neg(quat_apply_inverse(
+                self.asset.data.body_quat_w[:, self.asset_cfg.body_ids], net_forces_w)[..., 2],
+                out=self.normal_forces.view(self.num_envs, -1))
+
+    def compute_signals(self):
+        # get the normal forces and the contact taxels
+        self.compute_normal_forces()
+        torch.gt(self.normal_forces, self.contact_threshold_envs_sensors, out=self.contact_taxels)
+        if self.noisy:
+            self.apply_noise()
+        self.stages[:, 0] = self.contact_taxels
+
+        if self.last_stage >= 1:
+            normalized_forces = self.stages[:, 1]
+            torch.div(self.normal_forces, self.maximal_force, out=normalized_forces).clamp_(0.0, 1.0)
+
+        if self.last_stage >= 2:
+            # min-max normalization of the forces of the contact taxels in each env
+            min_max_normalized_signals = self.stages[:, 2]
+            torch.mul(normalized_forces, self.stages[:, 0], out=min_max_normalized_signals)
+            min_forces, max_forces = torch.aminmax(min_max_normalized_signals.flatten(start_dim=1), dim=-1, keepdim=True)
+            min_forces, force_range = min_forces.unsqueeze(-1), (max_forces - min_forces).unsqueeze(-1)  # (N, 1, 1)
+            force_range.masked_fill_(force_range <= 0.0, 1.0)  # avoid division by zero
+            min_max_normalized_signals.sub_(min_forces).div_(force_range).clamp_(0.0, 1.0)
+
+        if self.last_stage >= 3:
+            # uniform discretization
+            discretized_signals = self.stages[:, 3]
+            discrete_bin = 1.0 / self.total_levels
+            torch.div(min_max_normalized_signals, discrete_bin, out=discretized_signals).round_()
+            if self.add_level_noise:
+                torch.rand(self.tactile_signals_shape, out=self.noise)
+                discretized_signals.add_(self.noise.mul_(self.level_n_max - self.level_n_min).add_(self.level_n_min))
+            discretized_signals.mul_(discrete_bin).clamp_(0.0, 1.0).mul_(self.stages[:, 0])
+
+    def apply_noise(self):
+        # the forces are only perturbed when a later stage uses them
+        apply_tactile_noise(
+            self.contact_taxels, self.normal_forces, self.contact_threshold_envs_sensors, self.noise, self.noise_mask,
+            contact_dropout_prob=self.contact_dropout_prob,
+            contact_addition_prob=self.contact_addition_prob,
+            force_noise_range=(self.force_n_prop_min, self.force_n_prop_max) if self.add_force_noise else None,
+            update_forces=self.last_stage >= 1)
 
     def __call__(
         self,
@@ -244,164 +294,37 @@ class TactileSignals(ManagerTermBase):
         add_level_noise: bool = False,
         level_n_min = -3,
         level_n_max: float = 3,
+        single_rotation: bool = False,
+        analytic_surrogate: bool = False,
+        object_cfg: SceneEntityCfg = SceneEntityCfg("object"),
         ) -> torch.Tensor:
-        self.get_original_signals()
-        self.process_original_signals()
-        return torch.stack([
-            self.original_contact_taxels.float(),
-            self.original_normalized_forces,
-            self.original_min_max_normalized_signals,
-            self.original_discretized_signals], dim=1).flatten(start_dim=1)
+        # the returned buffers are overwritten at the next call (the observation manager clones the term outputs)
+        self.compute_signals()
+        if self.returns_all_stages:
+            return self.stages.flatten(start_dim=1)
+        torch.index_select(self.stages, 1, self.channel_ids, out=self.output)
+        return self.output.flatten(start_dim=1)
 
 
 class BinaryTactileSignals(TactileSignals):
-    def __call__(
-        self,
-        env: ManagerBasedEnv,
-        asset_cfg: SceneEntityCfg = SceneEntityCfg("robot", body_names="sensor_.*"),
-        sensor_cfg: SceneEntityCfg = SceneEntityCfg("tactile_contact_sensor", body_names="sensor_.*"),
-        tactile_signal_shape: tuple = (17, 13),
-        contact_threshold = 0.1,
-        add_threshold_noise: bool = False,
-        threshold_n_min = -0.03,
-        threshold_n_max = 0.03,
-        contact_dropout_prob: float = 0.0,
-        contact_addition_prob: float = 0.0,
-        add_continuous_artifact: float = 0.0,
-        artifact_taxel_num_min: int = 0,
-        artifact_taxel_num_max: int = 3,
-        add_force_noise: bool = False,
-        force_n_prop_min = -0.03,
-        force_n_prop_max = 0.03,
-        maximal_force: float = 1.0,
-        total_levels: int = 20,
-        add_level_noise: bool = False,
-        level_n_min = -3,
-        level_n_max: float = 3,
-        ) -> torch.Tensor:
-        contact_taxels, _ = self.get_normal_forces()
-        # why two channels of binary maps? --> we wanted to keep one channel with contact_taxels and the other channel with different tactile signals (Though this is not reported in the paper)
-        return torch.stack([contact_taxels.float(), contact_taxels.float()], dim=1).flatten(start_dim=1)
+    # why two channels of binary maps? --> we wanted to keep one channel with contact_taxels and the other channel with different tactile signals (Though this is not reported in the paper)
+    channels = ("contact", "contact")
+    noisy = True
 
 
 class NormalizedTactileSignals(BinaryTactileSignals):
-    def __call__(
-        self,
-        env: ManagerBasedEnv,
-        asset_cfg: SceneEntityCfg = SceneEntityCfg("robot", body_names="sensor_.*"),
-        sensor_cfg: SceneEntityCfg = SceneEntityCfg("tactile_contact_sensor", body_names="sensor_.*"),
-        tactile_signal_shape: tuple = (17, 13),
-        contact_threshold = 0.1,
-        add_threshold_noise: bool = False,
-        threshold_n_min = -0.03,
-        threshold_n_max = 0.03,
-        contact_dropout_prob: float = 0.0,
-        contact_addition_prob: float = 0.0,
-        add_continuous_artifact: float = 0.0,
-        artifact_taxel_num_min: int = 0,
-        artifact_taxel_num_max: int = 3,
-        add_force_noise: bool = False,
-        force_n_prop_min = -0.03,
-        force_n_prop_max = 0.03,
-        maximal_force: float = 1.0,
-        total_levels: int = 20,
-        add_level_noise: bool = False,
-        level_n_min = -3,
-        level_n_max: float = 3,
-        ) -> torch.Tensor:
-        contact_taxels, normalized_signals = self.get_min_max_normalized_signals()
-        return torch.stack([contact_taxels.float(), normalized_signals], dim=1).flatten(start_dim=1)
+    channels = ("contact", "min_max")
 
 
 class DiscreteTactileSignals(NormalizedTactileSignals):
-    def __call__(
-        self,
-        env: ManagerBasedEnv,
-        asset_cfg: SceneEntityCfg = SceneEntityCfg("robot", body_names="sensor_.*"),
-        sensor_cfg: SceneEntityCfg = SceneEntityCfg("tactile_contact_sensor", body_names="sensor_.*"),
-        tactile_signal_shape: tuple = (17, 13),
-        contact_threshold = 0.1,
-        add_threshold_noise: bool = False,
-        threshold_n_min = -0.03,
-        threshold_n_max = 0.03,
-        contact_dropout_prob: float = 0.0,
-        contact_addition_prob: float = 0.0,
-        add_continuous_artifact: float = 0.0,
-        artifact_taxel_num_min: int = 0,
-        artifact_taxel_num_max: int = 3,
-        add_force_noise: bool = False,
-        force_n_prop_min = -0.03,
-        force_n_prop_max = 0.03,
-        maximal_force: float = 1.0,
-        total_levels: int = 20,
-        add_level_noise: bool = False,
-        level_n_min = -3,
-        level_n_max: float = 3,
-        ) -> torch.Tensor:
-        contact_taxels, discretized_signals = self.get_discretized_signals()
-        return torch.stack([contact_taxels.float(), discretized_signals], dim=1).flatten(start_dim=1)
+    channels = ("contact", "discretized")
 
 
 class CotinuousTactileSignals(TactileSignals):
-    def __call__(
-        self,
-        env: ManagerBasedEnv,
-        asset_cfg: SceneEntityCfg = SceneEntityCfg("robot", body_names="sensor_.*"),
-        sensor_cfg: SceneEntityCfg = SceneEntityCfg("tactile_contact_sensor", body_names="sensor_.*"),
-        tactile_signal_shape: tuple = (17, 13),
-        contact_threshold = 0.1,
-        add_threshold_noise: bool = False,
-        threshold_n_min = -0.03,
-        threshold_n_max = 0.03,
-        contact_dropout_prob: float = 0.0,
-        contact_addition_prob: float = 0.0,
-        add_continuous_artifact: float = 0.0,
-        artifact_taxel_num_min: int = 0,
-        artifact_taxel_num_max: int = 3,
-        add_force_noise: bool = False,
-        force_n_prop_min = -0.03,
-        force_n_prop_max = 0.03,
-        maximal_force: float = 1.0,
-        total_levels: int = 20,
-        add_level_noise: bool = False,
-        level_n_min = -3,
-        level_n_max: float = 3,
-        ) -> torch.Tensor:
-        contact_taxels, normalized_forces = self.get_normalized_forces()
-        return torch.stack([contact_taxels.float(), normalized_forces], dim=1).flatten(start_dim=1)
-        # return normalized_forces
+    channels = ("contact", "normalized")
+    noisy = True
 
 
 class ProcessedTactileSignals(TactileSignals):
-    def __call__(
-        self,
-        env: ManagerBasedEnv,
-        asset_cfg: SceneEntityCfg = SceneEntityCfg("robot", body_names="sensor_.*"),
-        sensor_cfg: SceneEntityCfg = SceneEntityCfg("tactile_contact_sensor", body_names="sensor_.*"),
-        tactile_signal_shape: tuple = (17, 13),
-        contact_threshold = 0.1,
-        add_threshold_noise: bool = False,
-        threshold_n_min = -0.03,
-        threshold_n_max = 0.03,
-        contact_dropout_prob: float = 0.0,
-        contact_addition_prob: float = 0.0,
-        add_continuous_artifact: float = 0.0,
-        artifact_taxel_num_min: int = 0,
-        artifact_taxel_num_max: int = 3,
-        add_force_noise: bool = False,
-        force_n_prop_min = -0.03,
-        force_n_prop_max = 0.03,
-        maximal_force: float = 1.0,
-        total_levels: int = 20,
-        add_level_noise: bool = False,
-        level_n_min = -3,
-        level_n_max: float = 3,
-        ) -> torch.Tensor:
-        contact_taxels, _ = self.get_discretized_signals()
-        return torch.stack([
-            self.processed_contact_taxels.float(),
-            self.processed_normalized_forces,
-            self.processed_min_max_normalized_signals,
-            self.processed_discretized_signals], dim=1).flatten(start_dim=1)
-
-
+    # all the stages of the noisy signals, just for evaluation
+    noisy = True
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import math
+import re
+import torch
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from isaaclab.envs import ManagerBasedRLEnv
+
+
+# ----------------- Left-Right Symmetry -----------------
+# mirroring about the x-z plane of the robot base frame, used by the symmetry augmentation and the mirror loss of PPO:
+#   symmetry_cfg.data_augmentation_func = "locotouch.mdp.symmetry:compute_symmetric_states"
+
+# sign of each component of the (single-step) observation terms under the mirroring
+MIRROR_SIGNS = {
+    "velocity_commands": [1.0, -1.0, -1.0],  # (lin_vel_x, lin_vel_y, ang_vel_z)
+    "base_lin_vel": [1.0, -1.0, 1.0],
+    "base_ang_vel": [-1.0, 1.0, -1.0],  # angular velocities are pseudo vectors
+    "projected_gravity": [1.0, -1.0, 1.0],
+    # position, linear velocity, quaternion (w, x, y, z) and angular velocity of the object in the robot frame
+    "object_state": [1.0, -1.0, 1.0] + [1.0, -1.0, 1.0] + [1.0, -1.0, 1.0, -1.0] + [-1.0, 1.0, -1.0],
+}
+# terms ordered like the robot joints: the legs are swapped and the hip ab/ad joints change sign
+JOINT_TERMS = ("joint_pos", "joint_vel", "last_action")
+# terms of (channels, rows, columns) tactile grids: the columns are reversed
+TACTILE_TERMS = ("tactile_signals",)
+LEG_MIRRORS = {"FR": "FL", "FL": "FR", "RR": "RL", "RL": "RR"}
+
+# (indices, signs) of the mirrored components per environment, observation group and device
+_mirror_cache: dict[tuple, tuple[torch.Tensor, torch.Tensor]] = {}
+
+
+@torch.no_grad()
+def compute_symmetric_states(
+    obs: torch.Tensor | None = None,
+    actions: torch.Tensor | None = None,
+    env=None,
+    is_critic: bool = False,
+) -> tuple[torch.Tensor | None, torch.Tensor | None]:
+    # returns the original and the mirrored samples concatenated along the batch dimension: [batch_size * 2, ...]
+    env: ManagerBasedRLEnv = env.unwrapped
+    obs_aug, actions_aug = None, None
+    if obs is not None:
+        group = "critic" if is_critic and "critic" in env.observation_manager.active_terms else "policy"
+        indices, signs = _get_observation_mirror(env, group, obs.device)
+        if obs.shape[-1] != indices.shape[0]:
+            raise ValueError(f"The observations have {obs.shape[-1]} dimensions but the group '{group}' has {indices.shape[0]}.")
+        obs_aug = torch.cat([obs, obs[..., indices] * signs], dim=0)
+    if actions is not None:
+        indices, signs = _get_action_mirror(env, actions.device)
+        actions_aug = torch.cat([actions, actions[..., indices] * signs], dim=0)
+    return obs_aug, actions_aug
+
+
+def _get_observation_mirror(env: ManagerBasedRLEnv, group: str, device) -> tuple[torch.Tensor, torch.Tensor]:
+    key = (id(env), group, str(device))
+    if key not in _mirror_cache:
+        obs_manager = env.observation_manager
+        joint_indices, joint_signs = _joint_mirror(env.scene["robot"].joint_names)
+        indices, signs = [], []
+        start = 0
+        for name, dims, term_cfg in zip(
+            obs_manager.active_terms[group], obs_manager.group_obs_term_dim[group], obs_manager._group_obs_term_cfgs[group]
+        ):
+            # history-stacked terms are flattened as [oldest step, ..., newest step]
+            term_dim = math.prod(dims)
+            history_length = max(term_cfg.history_length, 1)
+            step_dim = term_dim // history_length
+            if name in JOINT_TERMS:
+                step_indices, step_signs = joint_indices, joint_signs
+            elif name in TACTILE_TERMS:
+                rows, cols = term_cfg.params["tactile_signal_shape"]
+                step_indices = torch.arange(step_dim).view(-1, rows, cols).flip(-1).flatten().tolist()
+                step_signs = [1.0] * step_dim
+            elif name in MIRROR_SIGNS:
+                step_indices, step_signs = list(range(step_dim)), MIRROR_SIGNS[name]
+            else:
+                raise ValueError(f"No left-right mirror is defined for the observation term '{name}' of the group '{group}'.")
+            if len(step_indices) != step_dim:
+                raise ValueError(f"The mirror of the observation term '{name}' has {len(step_indices)} dimensions instead of {step_dim}.")
+            for step in range(history_length):
+                indices += [start + step * step_dim + index for index in step_indices]
+                signs += step_signs
+            start += term_dim
+        _mirror_cache[key] = (torch.tensor(indices, device=device), torch.tensor(signs, device=device))
+    return _mirror_cache[key]
+
+
+def _get_action_mirror(env: ManagerBasedRLEnv, device) -> tuple[torch.Tensor, torch.Tensor]:
+    # the joint position actions are ordered like the robot joints
+    key = (id(env), "actions", str(device))
+    if key not in _mirror_cache:
+        indices, signs = _joint_mirror(env.scene["robot"].joint_names)
+        if len(indices) != env.action_manager.total_action_dim:
+            raise ValueError("The left-right mirror of the actions requires one joint position action per robot joint.")
+        _mirror_cache[key] = (torch.tensor(indices, device=device), torch.tensor(signs, device=device))
+    return _mirror_cache[key]
+
+
+def _joint_mirror(joint_names: list[str]) -> tuple[list[int], list[float]]:
+    # joints are matched by their leg (FR, FL, RR, RL) and the part of the name after it, e.g. "_hip_joint"
+    leg_pattern = re.compile("|".join(LEG_MIRRORS))
+    joint_keys = []
+    for name in joint_names:
+        match = leg_pattern.search(name)
+        if match is None:
+            raise ValueError(f"Cannot find the leg of the joint '{name}'.")
+        joint_keys.append((match.group(), name[match.end():]))
+    indices = [joint_keys.index((LEG_MIRRORS[leg], suffix)) for leg, suffix in joint_keys]
+    signs = [-1.0 if "hip" in suffix else 1.0 for _, suffix in joint_keys]
+    return indices, signs
@@ -0,0 +1,50 @@
+from __future__ import annotations
+import torch
+
+
+# ----------------- Tactile Noise -----------------
+# shape-static noise of the tactile signals: every operation runs on the full (N, rows, cols) grids with torch.where and
+# multiplicative masks instead of boolean-mask indexing, so there are no data-dependent shapes or host syncs and the
+# noise can be captured in a CUDA graph / torch.compile
+def apply_tactile_noise(
+    contact_taxels: torch.Tensor,
+    normal_forces: torch.Tensor,
+    thresholds: torch.Tensor,
+    noise: torch.Tensor,
+    noise_mask: torch.Tensor,
+    contact_dropout_prob: float = 0.0,
+    contact_addition_prob: float = 0.0,
+    force_noise_range: tuple[float, float] | None = None,
+    update_forces: bool = True,
+):
+    # contact_taxels (bool) and normal_forces are modified in place, noise (float) and noise_mask (bool) are work buffers
+    # the forces are only perturbed with update_forces, e.g. not when only the binary contact maps are used
+    shape = noise.shape
+
+    # apply contact dropout:
+    # dropout some contact taxels, make their forces to be [0, contact_threshold]
+    if contact_dropout_prob > 0.0:
+        torch.lt(torch.rand(shape, out=noise), contact_dropout_prob, out=noise_mask).logical_and_(contact_taxels)
+        contact_taxels.logical_xor_(noise_mask)
+        if update_forces:
+            torch.rand(shape, out=noise).mul_(thresholds)
+            torch.where(noise_mask, noise, normal_forces, out=normal_forces)
+
+    # apply contact addition:
+    # add some non contact taxels, make their forces to be [contact_threshold, 1.2*contact_threshold]
+    if contact_addition_prob > 0.0:
+        torch.lt(torch.rand(shape, out=noise), contact_addition_prob, out=noise_mask).logical_or_(contact_taxels).logical_xor_(contact_taxels)
+        contact_taxels.logical_or_(noise_mask)
+        if update_forces:
+            torch.rand(shape, out=noise).mul_(0.2).add_(1.0).mul_(thresholds)
+            torch.where(noise_mask, noise, normal_forces, out=normal_forces)
+
+    # apply force noise (the contact taxels are unchanged):
+    # scale the forces of the contact taxels, and repair the ones that fall below the threshold to [contact_threshold, 1.2*contact_threshold]
+    if force_noise_range is not None and update_forces:
+        torch.rand(shape, out=noise).mul_(force_noise_range[1] - force_noise_range[0]).add_(force_noise_range[0])
+        normal_forces.mul_(noise.mul_(contact_taxels).add_(1.0)).clamp_(min=0.0)
+
+        torch.lt(normal_forces, thresholds, out=noise_mask).logical_and_(contact_taxels)
+        torch.rand(shape, out=noise).mul_(0.2).add_(1.0).mul_(thresholds)
+        torch.where(noise_mask, noise, normal_forces, out=normal_forces)
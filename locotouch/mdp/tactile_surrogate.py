@@ -0,0 +1,139 @@
+from __future__ import annotations
+import torch
+
+
+# ----------------- Analytic Tactile Surrogate -----------------
+# the normal-force map of the taxel grid is computed from the pose and the shape of the object and one contact force,
+# instead of one PhysX contact sensor per taxel. Pure torch geometry (quaternions are (w, x, y, z) as in isaaclab), so the
+# model can be checked on CPU against recorded sensor maps (see locotouch/scripts/evaluate_tactile_surrogate.py)
+OBJECT_SHAPES = ("cylinder", "box")
+
+
+class AnalyticTactileSurrogate:
+    def __init__(
+        self,
+        num_envs: int,
+        grid_shape: tuple,
+        first_taxel_position: list,
+        row_distance: float,
+        column_distance: float,
+        object_shape: str,
+        object_size: torch.Tensor,
+        cylinder_axis: int = 1,
+        contact_margin: float = 0.003,  # not tuned against the contact sensors yet
+        samples_per_taxel: int = 3,  # not tuned against the contact sensors yet
+        device: str = "cpu",
+        ):
+        # first_taxel_position: the center of the surface of the first taxel in the plate body frame, the rows go along -x
+        # and the columns along -y as in generate_locotouch_urdf.py
+        # object_size: (radius, height) of the cylinders or (x, y, z) edge lengths of the boxes, (N, 2 or 3) or a single size
+        if object_shape not in OBJECT_SHAPES:
+            raise ValueError(f"Unknown object shape '{object_shape}' for the analytic tactile surrogate, expected one of {OBJECT_SHAPES}.")
+        self.num_envs = num_envs
+        self.grid_shape = tuple(grid_shape)
+        self.object_shape = object_shape
+        self.object_size = torch.as_tensor(object_size, dtype=torch.float, device=device).expand(num_envs, -1).clone()
+        self.cylinder_axis = cylinder_axis
+        self.radial_axes = [axis for axis in range(3) if axis != cylinder_axis]
+        self.contact_margin = contact_margin
+        self.samples_per_taxel = samples_per_taxel
+        self.eps = 1e-8
+
+        # sub-samples of each taxel cell on the plate surface: (rows * cols * samples^2, 3)
+        rows, cols = self.grid_shape
+        offsets = (torch.arange(samples_per_taxel, device=device) + 0.5) / samples_per_taxel - 0.5
+        x = first_taxel_position[0] - row_distance * (torch.arange(rows, device=device).view(-1, 1) + offsets)  # (rows, samples)
+        y = first_taxel_position[1] - column_distance * (torch.arange(cols, device=device).view(-1, 1) + offsets)  # (cols, samples)
+        x = x.view(rows, 1, samples_per_taxel, 1).expand(rows, cols, samples_per_taxel, samples_per_taxel)
+        y = y.view(1, cols, 1, samples_per_taxel).expand(rows, cols, samples_per_taxel, samples_per_taxel)
+        z = torch.full_like(x, first_taxel_position[2])
+        self.sample_points = torch.stack([x, y, z], dim=-1).reshape(-1, 3)
+        self.plate_normal = torch.tensor([0.0, 0.0, 1.0], device=device).repeat(num_envs, 1)
+
+    def __call__(
+        self,
+        plate_pos_w: torch.Tensor,
+        plate_quat_w: torch.Tensor,
+        object_pos_w: torch.Tensor,
+        object_quat_w: torch.Tensor,
+        object_force_w: torch.Tensor,
+        out: torch.Tensor | None = None,
+        ) -> torch.Tensor:
+        # object_force_w: the net contact force on the object, which pushes the plate along its negative normal
+        object_pos = _quat_apply_inverse(plate_quat_w, object_pos_w - plate_pos_w)
+        object_quat = _quat_mul(_quat_conjugate(plate_quat_w), object_quat_w)
+        normal_force = _quat_apply_inverse(plate_quat_w, object_force_w)[:, 2]
+        return self.compute_normal_forces(object_pos, object_quat, normal_force, out=out)
+
+    def compute_normal_forces(
+        self, object_pos: torch.Tensor, object_quat: torch.Tensor, normal_force: torch.Tensor, out: torch.Tensor | None = None
+        ) -> torch.Tensor:
+        # the normal force (N,) is distributed over the taxels proportionally to their contact area: (N, rows, cols)
+        contact_area = self.compute_contact_area(object_pos, object_quat)
+        total_area = contact_area.sum(dim=(1, 2), keepdim=True)
+        force_per_area = normal_force.clamp(min=0.0).view(-1, 1, 1) / total_area.clamp(min=self.eps)
+        return torch.mul(contact_area, force_per_area, out=out)
+
+    def compute_contact_area(self, object_pos: torch.Tensor, object_quat: torch.Tensor) -> torch.Tensor:
+        # fraction of each taxel cell covered by the footprint of the object (pose in the plate frame): (N, rows, cols)
+        # a sample point is covered when the object crosses the plate surface within the contact margin above it
+        origins = _quat_apply_inverse(object_quat.unsqueeze(1), self.sample_points.unsqueeze(0) - object_pos.unsqueeze(1))
+        directions = _quat_apply_inverse(object_quat, self.plate_normal[: object_quat.shape[0]]).unsqueeze(1)
+        entry, exit = self.intersect_normal_rays(origins, directions, self.object_size[: object_quat.shape[0]])
+        covered = (entry <= exit) & (entry <= self.contact_margin) & (exit >= 0.0)
+        return covered.view(-1, *self.grid_shape, self.samples_per_taxel**2).float().mean(dim=-1)
+
+    def intersect_normal_rays(self, origins: torch.Tensor, directions: torch.Tensor, object_size: torch.Tensor):
+        # entry and exit distances of the lines origins + t * directions through the object (in the object frame),
+        # the entry is larger than the exit if a line misses the object
+        if self.object_shape == "box":
+            return self._intersect_slabs(origins, directions, 0.5 * object_size.unsqueeze(1))
+        radius, half_height = object_size[:, 0:1], 0.5 * object_size[:, 1:2]
+        axial_entry, axial_exit = self._intersect_slabs(
+            origins[..., self.cylinder_axis:self.cylinder_axis + 1], directions[..., self.cylinder_axis:self.cylinder_axis + 1],
+            half_height.unsqueeze(1))
+        # radial distance: a t^2 + b t + c <= 0
+        radial_origins, radial_directions = origins[..., self.radial_axes], directions[..., self.radial_axes]
+        a = radial_directions.square().sum(dim=-1)
+        b = 2.0 * (radial_origins * radial_directions).sum(dim=-1)
+        c = radial_origins.square().sum(dim=-1) - radius.square()
+        discriminant = b.square() - 4.0 * a * c
+        sqrt_discriminant = discriminant.clamp(min=0.0).sqrt()
+        radial_entry = (-b - sqrt_discriminant) / (2.0 * a).clamp(min=self.eps)
+        radial_exit = (-b + sqrt_discriminant) / (2.0 * a).clamp(min=self.eps)
+        # lines parallel to the cylinder axis are inside or outside for all t
+        parallel = (a < self.eps).expand_as(c)
+        inside = c <= 0.0
+        infinity = torch.full_like(c, float("inf"))
+        radial_entry = torch.where(parallel, torch.where(inside, -infinity, infinity), radial_entry)
+        radial_exit = torch.where(parallel, torch.where(inside, infinity, -infinity), radial_exit)
+        radial_entry = torch.where(~parallel & (discriminant < 0.0), infinity, radial_entry)
+        return torch.maximum(axial_entry, radial_entry), torch.minimum(axial_exit, radial_exit)
+
+    def _intersect_slabs(self, origins: torch.Tensor, directions: torch.Tensor, half_extents: torch.Tensor):
+        # lines through the axis-aligned box [-half_extents, half_extents]
+        safe_directions = torch.where(directions >= 0.0, directions.clamp(min=self.eps), directions.clamp(max=-self.eps))
+        t1 = (-half_extents - origins) / safe_directions
+        t2 = (half_extents - origins) / safe_directions
+        return torch.minimum(t1, t2).amax(dim=-1), torch.maximum(t1, t2).amin(dim=-1)
+
+
+def _quat_conjugate(quat: torch.Tensor) -> torch.Tensor:
+    return torch.cat([quat[..., :1], -quat[..., 1:]], dim=-1)
+
+
+def _quat_mul(q1: torch.Tensor, q2: torch.Tensor) -> torch.Tensor:
+    w1, x1, y1, z1 = q1.unbind(dim=-1)
+    w2, x2, y2, z2 = q2.unbind(dim=-1)
+    return torch.stack([
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2], dim=-1)
+
+
+def _quat_apply_inverse(quat: torch.Tensor, vec: torch.Tensor) -> torch.Tensor:
+    # rotate the vectors by the inverse of the quaternions (broadcast over the leading dimensions)
+    xyz = quat[..., 1:]
+    t = 2.0 * torch.cross(xyz.expand_as(vec), vec, dim=-1)
+    return vec - quat[..., :1] * t + torch.cross(xyz.expand_as(t), t, dim=-1)
@@ -0,0 +1,219 @@
+"""Distribution check and micro-benchmark of the shape-static tactile noise against the previous boolean-mask implementation.
+
+Both implementations perturb the same random normal forces (contact dropout, contact addition, force noise and the repair of
+the too small forces). The statistics of their outputs (contact rate, flipped contacts, mean forces and the histogram of the
+forces) are compared, and the script exits with an error when they differ by more than the tolerances. The time per control
+step is reported for several numbers of envs. On CUDA, the shape-static noise is also replayed from a captured CUDA graph.
+Isaac Sim is not required.
+
+    python locotouch/scripts/benchmark_tactile_noise.py --device cuda:0 --num_envs 1024 4096
+"""
+
+import argparse
+import os
+import sys
+import time
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "mdp"))
+from tactile_noise import apply_tactile_noise  # noqa: E402  (imported directly to avoid loading isaaclab)
+
+
+def masked_tactile_noise(contact_taxels, normal_forces, thresholds, contact_dropout_prob, contact_addition_prob, force_noise_range):
+    # the previous implementation: boolean-mask writes with data-dependent shapes
+    contact_taxels, normal_forces = contact_taxels.clone(), normal_forces.clone()
+    if contact_dropout_prob > 0.0:
+        dropout_mask = torch.rand_like(contact_taxels.float()) < contact_dropout_prob
+        dropout_taxels = torch.logical_and(contact_taxels, dropout_mask)
+        normal_forces[dropout_taxels] = torch.rand_like(normal_forces[dropout_taxels]) * thresholds[dropout_taxels]
+        contact_taxels[dropout_taxels] = False
+    if contact_addition_prob > 0.0:
+        addition_mask = torch.rand_like(contact_taxels.float()) < contact_addition_prob
+        addition_taxels = torch.logical_and(~contact_taxels, addition_mask)
+        normal_forces[addition_taxels] = thresholds[addition_taxels] * (1.0 + 0.2*torch.rand_like(normal_forces[addition_taxels]))
+        contact_taxels[addition_taxels] = True
+    if force_noise_range is not None:
+        normal_forces[contact_taxels] *= 1.0 + (torch.rand_like(normal_forces[contact_taxels]) * (force_noise_range[1] - force_noise_range[0]) + force_noise_range[0])
+        normal_forces = torch.clamp(normal_forces, min=0.0)
+        too_small_forces = torch.logical_and(contact_taxels, normal_forces < thresholds)
+        normal_forces[too_small_forces] = thresholds[too_small_forces] * (1.0 + 0.2*torch.rand_like(normal_forces[too_small_forces]))
+    return contact_taxels, normal_forces
+
+
+class StaticTactileNoise:
+    # the shape-static noise on preallocated buffers, as used by TactileSignals
+    def __init__(self, shape, thresholds, contact_dropout_prob, contact_addition_prob, force_noise_range):
+        self.thresholds = thresholds
+        self.contact_taxels = torch.zeros(shape, dtype=torch.bool, device=thresholds.device)
+        self.normal_forces = torch.zeros(shape, device=thresholds.device)
+        self.noise = torch.zeros(shape, device=thresholds.device)
+        self.noise_mask = torch.zeros(shape, dtype=torch.bool, device=thresholds.device)
+        self.noise_kwargs = dict(contact_dropout_prob=contact_dropout_prob, contact_addition_prob=contact_addition_prob,
+                                 force_noise_range=force_noise_range)
+
+    def __call__(self):
+        apply_tactile_noise(self.contact_taxels, self.normal_forces, self.thresholds, self.noise, self.noise_mask, **self.noise_kwargs)
+
+
+def synchronize(device):
+    if "cuda" in str(device):
+        torch.cuda.synchronize(device)
+
+
+def sample_forces(shape, thresholds, contact_prob, maximal_force, generator):
+    # contact taxels have forces in [contact_threshold, maximal_force], the others in [0, contact_threshold]
+    uniform = torch.rand(shape, generator=generator, device=thresholds.device)
+    contact = torch.rand(shape, generator=generator, device=thresholds.device) < contact_prob
+    forces = torch.where(contact, thresholds + uniform * (maximal_force - thresholds), uniform * thresholds)
+    return forces > thresholds, forces
+
+
+class Statistics:
+    def __init__(self, maximal_force, num_bins):
+        self.bins = torch.linspace(0.0, maximal_force, num_bins + 1)
+        self.histogram = torch.zeros(num_bins + 2, dtype=torch.float64)  # with the under- and overflow bins
+        self.sums = dict(taxels=0.0, contact=0.0, flipped=0.0, contact_force=0.0, non_contact_force=0.0)
+
+    def update(self, input_contact, contact_taxels, normal_forces):
+        contact_taxels, normal_forces, input_contact = contact_taxels.cpu(), normal_forces.cpu(), input_contact.cpu()
+        self.sums["taxels"] += contact_taxels.numel()
+        self.sums["contact"] += contact_taxels.sum().item()
+        self.sums["flipped"] += (contact_taxels != input_contact).sum().item()
+        self.sums["contact_force"] += normal_forces[contact_taxels].sum().item()
+        self.sums["non_contact_force"] += normal_forces[~contact_taxels].sum().item()
+        self.histogram += torch.bincount(torch.bucketize(normal_forces.flatten(), self.bins), minlength=self.histogram.shape[0]).double()
+
+    def summary(self):
+        contacts = self.sums["contact"]
+        return dict(
+            contact_rate=contacts / self.sums["taxels"],
+            flip_rate=self.sums["flipped"] / self.sums["taxels"],
+            mean_contact_force=self.sums["contact_force"] / max(contacts, 1.0),
+            mean_non_contact_force=self.sums["non_contact_force"] / max(self.sums["taxels"] - contacts, 1.0),
+            histogram=self.histogram / self.histogram.sum())
+
+
+def check_distributions(args, num_envs):
+    shape = (num_envs, *args.tactile_shape)
+    thresholds = torch.full(shape, args.contact_threshold, device=args.device)
+    force_noise_range = (args.force_n_prop_min, args.force_n_prop_max)
+    static_noise = StaticTactileNoise(shape, thresholds, args.contact_dropout_prob, args.contact_addition_prob, force_noise_range)
+    statistics = {"masked": Statistics(args.maximal_force, args.num_bins), "static": Statistics(args.maximal_force, args.num_bins)}
+    generator = torch.Generator(device=args.device)
+    generator.manual_seed(0)
+    for _ in range(args.num_steps):
+        contact_taxels, normal_forces = sample_forces(shape, thresholds, args.contact_prob, args.maximal_force, generator)
+        statistics["masked"].update(contact_taxels, *masked_tactile_noise(
+            contact_taxels, normal_forces, thresholds, args.contact_dropout_prob, args.contact_addition_prob, force_noise_range))
+        static_noise.contact_taxels.copy_(contact_taxels)
+        static_noise.normal_forces.copy_(normal_forces)
+        static_noise()
+        statistics["static"].update(contact_taxels, static_noise.contact_taxels, static_noise.normal_forces)
+    masked, static = statistics["masked"].summary(), statistics["static"].summary()
+    # total variation distance between the histograms of the forces
+    total_variation = 0.5 * (masked.pop("histogram") - static.pop("histogram")).abs().sum().item()
+    return masked, static, total_variation
+
+
+def compare_distributions(args, masked, static, total_variation):
+    # the statistics that exceed their tolerance: absolute for the contact rate, relative for the flip rate and the forces
+    failures = []
+    if abs(static["contact_rate"] - masked["contact_rate"]) > args.contact_rate_atol:
+        failures.append("contact_rate")
+    if abs(static["flip_rate"] - masked["flip_rate"]) > args.flip_rate_rtol * masked["flip_rate"]:
+        failures.append("flip_rate")
+    for name in ("mean_contact_force", "mean_non_contact_force"):
+        if abs(static[name] - masked[name]) > args.force_rtol * masked[name]:
+            failures.append(name)
+    if total_variation > args.max_total_variation:
+        failures.append("total_variation")
+    return failures
+
+
+def time_step(function, num_steps, device):
+    for _ in range(10):  # warm up
+        function()
+    synchronize(device)
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        function()
+    synchronize(device)
+    return (time.perf_counter() - start) / num_steps
+
+
+def benchmark(args, num_envs):
+    shape = (num_envs, *args.tactile_shape)
+    thresholds = torch.full(shape, args.contact_threshold, device=args.device)
+    force_noise_range = (args.force_n_prop_min, args.force_n_prop_max)
+    contact_taxels, normal_forces = sample_forces(shape, thresholds, args.contact_prob, args.maximal_force, None)
+    times = {}
+    times["masked"] = time_step(lambda: masked_tactile_noise(
+        contact_taxels, normal_forces, thresholds, args.contact_dropout_prob, args.contact_addition_prob, force_noise_range),
+        args.num_steps, args.device)
+
+    static_noise = StaticTactileNoise(shape, thresholds, args.contact_dropout_prob, args.contact_addition_prob, force_noise_range)
+
+    def static_step():
+        # the inputs are copied as in the masked implementation
+        static_noise.contact_taxels.copy_(contact_taxels)
+        static_noise.normal_forces.copy_(normal_forces)
+        static_noise()
+
+    times["static"] = time_step(static_step, args.num_steps, args.device)
+    times["graph"] = None
+    if "cuda" in args.device:
+        stream = torch.cuda.Stream(args.device)
+        stream.wait_stream(torch.cuda.current_stream(args.device))
+        with torch.cuda.stream(stream):
+            static_step()  # warm up on a side stream before the capture
+        torch.cuda.current_stream(args.device).wait_stream(stream)
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            static_step()
+        times["graph"] = time_step(graph.replay, args.num_steps, args.device)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shape-static tactile noise.")
+    parser.add_argument("--device", type=str, default="cuda:0" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--num_envs", type=int, nargs="+", default=[256, 1024, 4096])
+    parser.add_argument("--tactile_shape", type=int, nargs=2, default=[17, 13])
+    parser.add_argument("--num_steps", type=int, default=200)
+    parser.add_argument("--contact_prob", type=float, default=0.3)
+    # the noise of NoisyTactileCfg
+    parser.add_argument("--contact_threshold", type=float, default=0.05)
+    parser.add_argument("--contact_dropout_prob", type=float, default=0.005)
+    parser.add_argument("--contact_addition_prob", type=float, default=0.005)
+    parser.add_argument("--force_n_prop_min", type=float, default=-0.1)
+    parser.add_argument("--force_n_prop_max", type=float, default=0.1)
+    parser.add_argument("--maximal_force", type=float, default=3.0)
+    parser.add_argument("--num_bins", type=int, default=100)
+    # tolerances of the distribution check
+    parser.add_argument("--contact_rate_atol", type=float, default=1e-3)
+    parser.add_argument("--flip_rate_rtol", type=float, default=0.05)
+    parser.add_argument("--force_rtol", type=float, default=0.01)
+    parser.add_argument("--max_total_variation", type=float, default=0.01)
+    args = parser.parse_args()
+
+    masked, static, total_variation = check_distributions(args, args.num_envs[-1])
+    print(f"{'statistic':>24} {'masked':>12} {'static':>12}")
+    for name in masked:
+        print(f"{name:>24} {masked[name]:>12.5f} {static[name]:>12.5f}")
+    print(f"total variation distance of the force histograms: {total_variation:.5f}")
+    failures = compare_distributions(args, masked, static, total_variation)
+    if failures:
+        sys.exit(f"The shape-static noise differs from the boolean-mask noise in: {', '.join(failures)}.")
+    print("The distributions of the shape-static and the boolean-mask noise match.\n")
+
+    print(f"{'num_envs':>10} {'masked [us]':>12} {'static [us]':>12} {'graph [us]':>12} {'speedup':>8}")
+    for num_envs in args.num_envs:
+        times = benchmark(args, num_envs)
+        best_time = times["graph"] if times["graph"] is not None else times["static"]
+        graph_time = f"{times['graph'] * 1e6:>12.1f}" if times["graph"] is not None else f"{'-':>12}"
+        print(f"{num_envs:>10} {times['masked'] * 1e6:>12.1f} {times['static'] * 1e6:>12.1f} {graph_time} "
+              f"{times['masked'] / best_time:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
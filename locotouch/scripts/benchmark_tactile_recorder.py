@@ -0,0 +1,108 @@
+"""Micro-benchmark of the delayed TactileRecorder against the previous shifting implementation.
+
+Both recorders are driven with the same random signals and resets, their outputs are checked to be identical, and the time
+per control step (record + read) is reported for several numbers of envs and maximum delays. Isaac Sim is not required.
+
+    python locotouch/scripts/benchmark_tactile_recorder.py --device cuda:0 --num_envs 1024 4096 --max_delays 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "distill"))
+from tactile_recorder import TactileRecorder  # noqa: E402  (imported directly to avoid loading isaaclab)
+
+
+class ShiftTactileRecorder:
+    # the previous implementation: the whole buffer is shifted by one slot at every step
+    def __init__(self, device, env_num, tactile_shape, min_delay=3, max_delay=7):
+        self.device = device
+        self.env_num = env_num
+        self.tactile_shape = (tactile_shape,) if isinstance(tactile_shape, int) else tactile_shape
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.tactile_expand_shape = (-1, self.max_delay, *self.tactile_shape)
+        self.tactile_buffer = torch.zeros((self.env_num, self.max_delay, *self.tactile_shape), dtype=torch.float32, device=self.device)
+        self.first_signal_recorded = torch.ones((self.env_num,), dtype=torch.bool, device=self.device)
+        self.delay_steps = torch.zeros((self.env_num,), dtype=torch.long, device=self.device)
+        self.env_idx = torch.arange(env_num, device=self.device)
+        self.reset()
+
+    def reset(self, env_idx=None):
+        env_idx = env_idx if env_idx is not None else self.env_idx
+        self.tactile_buffer[env_idx] = 0.0
+        self.first_signal_recorded[env_idx] = True
+        self.delay_steps[env_idx] = torch.randint(low=self.min_delay, high=self.max_delay, size=(env_idx.shape), device=self.device)
+
+    def record_new_tactile_signals(self, tactile_signals: torch.Tensor):
+        self.tactile_buffer[:, 1:] = self.tactile_buffer[:, :-1].clone()
+        self.tactile_buffer[:, 0] = tactile_signals.clone()
+        if self.first_signal_recorded.any():
+            first_signal_idx = self.first_signal_recorded.nonzero(as_tuple=False).flatten()
+            self.tactile_buffer[first_signal_idx] = tactile_signals[first_signal_idx].unsqueeze(1).expand(self.tactile_expand_shape).clone()
+            self.first_signal_recorded[first_signal_idx] = False
+
+    def get_tactile_signals(self):
+        return self.tactile_buffer[self.env_idx, self.delay_steps]
+
+
+def synchronize(device):
+    if "cuda" in str(device):
+        torch.cuda.synchronize(device)
+
+
+def run(recorder, signals, resets, device):
+    outputs = []
+    synchronize(device)
+    start = time.perf_counter()
+    for step in range(signals.shape[0]):
+        recorder.record_new_tactile_signals(signals[step])
+        outputs.append(recorder.get_tactile_signals())
+        if resets[step] is not None:
+            recorder.reset(resets[step])
+    synchronize(device)
+    return (time.perf_counter() - start) / signals.shape[0], outputs
+
+
+def benchmark(device, num_envs, max_delay, tactile_dim, num_steps, reset_prob):
+    signals = torch.rand((num_steps, num_envs, tactile_dim), device=device)
+    resets = []
+    for _ in range(num_steps):
+        done_idx = (torch.rand(num_envs, device=device) < reset_prob).nonzero(as_tuple=False).flatten()
+        resets.append(done_idx if len(done_idx) else None)
+    results = {}
+    for name, recorder_class in (("shift", ShiftTactileRecorder), ("ring", TactileRecorder)):
+        torch.manual_seed(0)  # same random delays
+        recorder = recorder_class(device, num_envs, tactile_dim, min_delay=1, max_delay=max_delay)
+        run(recorder, signals[:10], resets[:10], device)  # warm up
+        torch.manual_seed(0)
+        recorder = recorder_class(device, num_envs, tactile_dim, min_delay=1, max_delay=max_delay)
+        results[name] = run(recorder, signals, resets, device)
+    identical = all(torch.equal(shift, ring) for shift, ring in zip(results["shift"][1], results["ring"][1]))
+    return results["shift"][0], results["ring"][0], identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the delayed tactile recorder.")
+    parser.add_argument("--device", type=str, default="cuda:0" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--num_envs", type=int, nargs="+", default=[256, 1024, 4096])
+    parser.add_argument("--max_delays", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--tactile_dim", type=int, default=17 * 13 * 2)
+    parser.add_argument("--num_steps", type=int, default=500)
+    parser.add_argument("--reset_prob", type=float, default=0.005)
+    args = parser.parse_args()
+
+    print(f"{'num_envs':>10} {'max_delay':>10} {'shift [us]':>12} {'ring [us]':>12} {'speedup':>8} {'identical':>10}")
+    for num_envs in args.num_envs:
+        for max_delay in args.max_delays:
+            shift_time, ring_time, identical = benchmark(
+                args.device, num_envs, max_delay, args.tactile_dim, args.num_steps, args.reset_prob)
+            print(f"{num_envs:>10} {max_delay:>10} {shift_time * 1e6:>12.1f} {ring_time * 1e6:>12.1f} "
+                  f"{shift_time / ring_time:>8.2f} {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
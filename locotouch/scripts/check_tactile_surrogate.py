@@ -0,0 +1,128 @@
+"""Geometry checks of the analytic tactile surrogate on CPU, with the taxel grid of the LocoTouch sensor plate.
+
+    flat box:       a box lying on the plate and aligned with the taxel cells covers exactly the expected cells
+    total force:    the normal force is conserved by the maps of random box and cylinder poses in contact (and zero otherwise)
+    cylinder (Y):   a cylinder lying along the columns (axis="Y") has a line footprint: a band of at most a few rows, covering
+                    the columns within its height and none outside
+
+The script exits with an error when a check fails. Only torch is required (Isaac Sim is not).
+
+    python locotouch/scripts/check_tactile_surrogate.py
+"""
+
+import argparse
+import math
+import os
+import sys
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "mdp"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "utils", "urdf_processor"))
+from tactile_surrogate import AnalyticTactileSurrogate  # noqa: E402  (imported directly to avoid loading isaaclab)
+from generate_locotouch_urdf import URDFCfg  # noqa: E402
+
+TAXEL_THICKNESS = 0.001  # as in locotouch/mdp/observations.py
+GRID_SHAPE = (17, 13)
+FIRST_TAXEL_POSITION = URDFCfg.first_sensor_position[:2] + [URDFCfg.first_sensor_position[2] + 0.5 * TAXEL_THICKNESS]
+SURFACE_HEIGHT = FIRST_TAXEL_POSITION[2]
+
+
+def make_surrogate(args, num_envs, object_shape, object_size):
+    return AnalyticTactileSurrogate(
+        num_envs, GRID_SHAPE, FIRST_TAXEL_POSITION, URDFCfg.row_distance, URDFCfg.column_distance, object_shape, object_size,
+        cylinder_axis=1, contact_margin=args.contact_margin, samples_per_taxel=args.samples_per_taxel, device=args.device)
+
+
+def taxel_center(row, col):
+    return FIRST_TAXEL_POSITION[0] - URDFCfg.row_distance * row, FIRST_TAXEL_POSITION[1] - URDFCfg.column_distance * col
+
+
+def yaw_quat(yaw):
+    # (N,) -> (N, 4) rotations about the normal of the plate (w, x, y, z)
+    zeros = torch.zeros_like(yaw)
+    return torch.stack([torch.cos(0.5 * yaw), zeros, zeros, torch.sin(0.5 * yaw)], dim=-1)
+
+
+def check_flat_box(args):
+    # the footprint of the box spans the cells of the rows 4..9 and the columns 2..7, the box slightly presses into the plate
+    rows, cols, height = (4, 9), (2, 7), 0.05
+    size_x = URDFCfg.row_distance * (rows[1] - rows[0] + 1)
+    size_y = URDFCfg.column_distance * (cols[1] - cols[0] + 1)
+    center_x = 0.5 * (taxel_center(rows[0], 0)[0] + taxel_center(rows[1], 0)[0])
+    center_y = 0.5 * (taxel_center(0, cols[0])[1] + taxel_center(0, cols[1])[1])
+    surrogate = make_surrogate(args, 1, "box", [size_x, size_y, height])
+    object_pos = torch.tensor([[center_x, center_y, SURFACE_HEIGHT + 0.5 * height - 0.0005]], device=args.device)
+    contact_area = surrogate.compute_contact_area(object_pos, yaw_quat(torch.zeros(1, device=args.device)))[0]
+    expected_area = torch.zeros(GRID_SHAPE, device=args.device)
+    expected_area[rows[0]:rows[1] + 1, cols[0]:cols[1] + 1] = 1.0
+    error = (contact_area - expected_area).abs().max().item()
+    return error <= args.atol, f"max. area error {error:.2e}"
+
+
+def check_total_force(args):
+    # random poses over the plate, half of them lifted out of contact
+    generator = torch.Generator(device=args.device).manual_seed(0)
+    num_samples = args.num_samples
+    max_error = 0.0
+    for object_shape, object_size, contact_height in (("box", [0.08, 0.06, 0.05], 0.025), ("cylinder", [0.04, 0.1], 0.04)):
+        surrogate = make_surrogate(args, num_samples, object_shape, object_size)
+        center_x, center_y = taxel_center(0.5 * (GRID_SHAPE[0] - 1), 0.5 * (GRID_SHAPE[1] - 1))
+        offsets = (torch.rand(num_samples, 2, generator=generator, device=args.device) - 0.5) * 0.1
+        lifted = torch.rand(num_samples, generator=generator, device=args.device) < 0.5
+        object_pos = torch.stack([
+            center_x + offsets[:, 0], center_y + offsets[:, 1],
+            SURFACE_HEIGHT + contact_height - 0.001 + lifted.float() * 0.05], dim=-1)
+        object_quat = yaw_quat(torch.rand(num_samples, generator=generator, device=args.device) * 2.0 * math.pi)
+        normal_force = torch.rand(num_samples, generator=generator, device=args.device) * 20.0
+        total_force = surrogate.compute_normal_forces(object_pos, object_quat, normal_force).sum(dim=(1, 2))
+        expected_force = torch.where(lifted, torch.zeros_like(normal_force), normal_force)
+        max_error = max(max_error, (total_force - expected_force).abs().max().item())
+    return max_error <= args.atol * 20.0, f"max. force error {max_error:.2e} N"
+
+
+def check_cylinder_line(args):
+    # a cylinder along Y centered on the taxel (8, 6), touching the plate with its side
+    radius, height, row, col = 0.04, 0.08, 8, 6
+    surrogate = make_surrogate(args, 1, "cylinder", [radius, height])
+    center_x, center_y = taxel_center(row, col)
+    object_pos = torch.tensor([[center_x, center_y, SURFACE_HEIGHT + radius - 0.0005]], device=args.device)
+    contact = surrogate.compute_contact_area(object_pos, yaw_quat(torch.zeros(1, device=args.device)))[0] > 0.0
+    contact_rows = contact.any(dim=1).nonzero().flatten().tolist()
+    contact_cols = contact.any(dim=0).nonzero().flatten().tolist()
+    # the band of the rows within the contact margin around the line of contact
+    half_width = math.sqrt(radius**2 - (radius - args.contact_margin - 0.0005) ** 2)
+    max_rows = math.ceil(2.0 * half_width / URDFCfg.row_distance) + 1
+    band = 0 < len(contact_rows) <= max_rows and contact_rows == list(range(contact_rows[0], contact_rows[-1] + 1)) \
+        and row in contact_rows
+    # the columns whose centers are within the height are covered, the ones whose cells are outside are not
+    col_offsets = (torch.arange(GRID_SHAPE[1]) - col).abs() * URDFCfg.column_distance
+    inside = (col_offsets < 0.5 * height).nonzero().flatten().tolist()
+    outside = (col_offsets - 0.5 * URDFCfg.column_distance > 0.5 * height).nonzero().flatten().tolist()
+    length = set(inside) <= set(contact_cols) and not set(outside) & set(contact_cols)
+    # the contact taxels of each covered column are the same (a line along the columns)
+    line = all(torch.equal(contact[:, c], contact[:, contact_cols[0]]) for c in contact_cols)
+    return band and length and line, f"rows {contact_rows} (at most {max_rows}), columns {contact_cols}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the geometry of the analytic tactile surrogate.")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--contact_margin", type=float, default=0.003)
+    parser.add_argument("--samples_per_taxel", type=int, default=3)
+    parser.add_argument("--num_samples", type=int, default=1000)
+    parser.add_argument("--atol", type=float, default=1e-5)
+    args = parser.parse_args()
+
+    failed = []
+    for name, check in (("flat box", check_flat_box), ("total force", check_total_force), ("cylinder (Y)", check_cylinder_line)):
+        passed, details = check(args)
+        print(f"{name:>14}: {'passed' if passed else 'FAILED'} ({details})")
+        if not passed:
+            failed.append(name)
+    if failed:
+        sys.exit(f"The analytic tactile surrogate failed the checks: {', '.join(failed)}.")
+    print("The analytic tactile surrogate passed all the checks.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Evaluation of the analytic tactile surrogate against tactile maps recorded with the per-taxel PhysX contact sensors.
+
+The recording is a torch file (torch.save), e.g. written by TactileMapRecorder when playing a student with the tactile
+sensors and 'record_tactile_maps' in the distillation configuration. It holds the following tensors, all in the frame of
+the sensor plate body (trunk):
+
+    normal_forces: (T, rows, cols) normal forces of the taxels
+    object_pos:    (T, 3) position of the object
+    object_quat:   (T, 4) orientation of the object (w, x, y, z)
+    object_force:  (T, 3) net contact force on the object (optional, the total of the recorded maps is used otherwise)
+    object_shape:  "cylinder" or "box"
+    object_size:   (T, 2) or (2,) radius and height of the cylinder, (T, 3) or (3,) edge lengths of the box
+    cylinder_axis: axis of the cylinder in the object frame (optional, 1 as for the CylinderCfg(axis="Y") objects)
+
+The surrogate maps are compared with the recorded maps: the IoU of the contact taxels, the mean absolute error of the
+forces, the error of the total force and the distance between the centers of pressure. The time of one surrogate step is
+reported for the number of recorded samples. Only torch is required (Isaac Sim is not). The geometry of the surrogate
+itself is checked by locotouch/scripts/check_tactile_surrogate.py.
+
+    python locotouch/scripts/evaluate_tactile_surrogate.py --recording tactile_maps.pt --device cpu
+"""
+
+import argparse
+import os
+import sys
+import time
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "mdp"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "utils", "urdf_processor"))
+from tactile_surrogate import AnalyticTactileSurrogate  # noqa: E402  (imported directly to avoid loading isaaclab)
+from generate_locotouch_urdf import URDFCfg  # noqa: E402
+
+TAXEL_THICKNESS = 0.001  # as in locotouch/mdp/observations.py
+
+
+def center_of_pressure(normal_forces, taxel_positions):
+    # (T, 2) force-weighted mean of the taxel positions, nan without any force
+    weights = normal_forces.flatten(start_dim=1)
+    return (weights @ taxel_positions) / weights.sum(dim=-1, keepdim=True)
+
+
+def evaluate(args):
+    recording = torch.load(args.recording, map_location=args.device)
+    recorded_forces = recording["normal_forces"].float()
+    num_samples, rows, cols = recorded_forces.shape
+    first_taxel_position = URDFCfg.first_sensor_position[:2] + [URDFCfg.first_sensor_position[2] + 0.5 * TAXEL_THICKNESS]
+    surrogate = AnalyticTactileSurrogate(
+        num_samples,
+        (rows, cols),
+        first_taxel_position,
+        URDFCfg.row_distance,
+        URDFCfg.column_distance,
+        recording["object_shape"],
+        recording["object_size"],
+        cylinder_axis=int(recording.get("cylinder_axis", 1)),
+        contact_margin=args.contact_margin,
+        samples_per_taxel=args.samples_per_taxel,
+        device=args.device)
+    if "object_force" in recording:
+        normal_force = recording["object_force"].float()[:, 2]
+    else:
+        normal_force = recorded_forces.sum(dim=(1, 2))
+
+    object_pos, object_quat = recording["object_pos"].float(), recording["object_quat"].float()
+    surrogate_forces = surrogate.compute_normal_forces(object_pos, object_quat, normal_force)
+    for _ in range(args.repeats):  # warm up
+        surrogate.compute_normal_forces(object_pos, object_quat, normal_force)
+    if "cuda" in args.device:
+        torch.cuda.synchronize(args.device)
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        surrogate.compute_normal_forces(object_pos, object_quat, normal_force)
+    if "cuda" in args.device:
+        torch.cuda.synchronize(args.device)
+    step_time = (time.perf_counter() - start) / args.repeats
+
+    recorded_contact = recorded_forces > args.contact_threshold
+    surrogate_contact = surrogate_forces > args.contact_threshold
+    union = (recorded_contact | surrogate_contact).sum(dim=(1, 2))
+    intersection = (recorded_contact & surrogate_contact).sum(dim=(1, 2))
+    valid = union > 0
+    taxel_x = first_taxel_position[0] - URDFCfg.row_distance * torch.arange(rows, device=args.device)
+    taxel_y = first_taxel_position[1] - URDFCfg.column_distance * torch.arange(cols, device=args.device)
+    taxel_positions = torch.stack(torch.meshgrid(taxel_x, taxel_y, indexing="ij"), dim=-1).view(-1, 2)
+    cop_distance = (center_of_pressure(recorded_forces, taxel_positions) - center_of_pressure(surrogate_forces, taxel_positions)).norm(dim=-1)
+    return dict(
+        samples=num_samples,
+        samples_with_contact=int(valid.sum().item()),
+        contact_iou=(intersection[valid].float() / union[valid].float()).mean().item(),
+        force_mae=(surrogate_forces - recorded_forces).abs().mean().item(),
+        total_force_error=(surrogate_forces.sum(dim=(1, 2)) - recorded_forces.sum(dim=(1, 2))).abs().mean().item(),
+        center_of_pressure_error=cop_distance[~cop_distance.isnan()].mean().item(),
+        step_time_us=step_time * 1e6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the analytic tactile surrogate against recorded tactile maps.")
+    parser.add_argument("--recording", type=str, required=True)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--contact_threshold", type=float, default=0.05)
+    parser.add_argument("--contact_margin", type=float, default=0.003)
+    parser.add_argument("--samples_per_taxel", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    results = evaluate(args)
+    for name, value in results.items():
+        print(f"{name:>26}: {value:.5g}" if isinstance(value, float) else f"{name:>26}: {value}")
+
+
+if __name__ == "__main__":
+    main()
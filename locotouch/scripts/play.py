@@ -112,14 +112,11 @@ def main():
     # obtain the trained policy for inference
     policy = ppo_runner.get_inference_policy(device=env.unwrapped.device)
 
-    # export policy to onnx/jit
+    # export policy to onnx/jit (the observation normalization is folded into the first layers of the exported actor)
     # export_model_dir = os.path.join(os.path.dirname(resume_path), "exported")
-    # export_policy_as_jit(
-    #     ppo_runner.alg.actor_critic, ppo_runner.obs_normalizer, path=export_model_dir, filename="policy.pt"
-    # )
-    # export_policy_as_onnx(
-    #     ppo_runner.alg.actor_critic, normalizer=ppo_runner.obs_normalizer, path=export_model_dir, filename="policy.onnx"
-    # )
+    # export_actor_critic = ppo_runner.get_inference_actor_critic(device=env.unwrapped.device)
+    # export_policy_as_jit(export_actor_critic, None, path=export_model_dir, filename="policy.pt")
+    # export_policy_as_onnx(export_actor_critic, normalizer=None, path=export_model_dir, filename="policy.onnx")
 
     # reset environment
     # obs, extras = env.get_observations()